@@ -0,0 +1,131 @@
+"""Asynchronous access to the sqlalchemy_models database, for the card server.
+
+Built on SQLAlchemy's asyncio extension. Locally and in tests the database is
+SQLite through aiosqlite, which runs each connection's I/O on its own thread
+so the event loop never waits on the disk.
+
+SQLite connections are set up in WAL mode so that readers don't block on a
+writer, and the pool keeps a handful of connections open so that concurrent
+requests don't pay to open the file each time.
+
+Queries and bulk loading run repository.py and bulkload.py themselves,
+through run_sync, so there is only one implementation of each.
+
+Usual workflow:
+    engine = asyncdb.create_engine()
+    await asyncdb.create_schema(engine)
+    await asyncdb.load_cards(engine, cards)
+    async with asyncdb.session_factory(engine)() as session:
+        page = await asyncdb.AsyncCardRepository(session).cards_in_set('TOKS')
+"""
+from __future__ import absolute_import
+
+import sqlalchemy as sa
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import bulkload
+import repository
+import sqlalchemy_models as models
+
+
+DEFAULT_URL = 'sqlite+aiosqlite:///cards.db'
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT_SECONDS = 30
+# How long SQLite waits for another connection's write lock before failing.
+BUSY_TIMEOUT_MS = 5000
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # Safe with WAL; only the last transactions can be lost on power failure.
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout={}'.format(BUSY_TIMEOUT_MS))
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def create_engine(
+        url=DEFAULT_URL,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT_SECONDS,
+        **kwargs):
+    """Create an AsyncEngine with a connection pool.
+
+    Args:
+        url: Database URL with an async driver, e.g. sqlite+aiosqlite:///cards.db.
+        pool_size: Connections kept open.
+        max_overflow: Extra connections allowed under load.
+        pool_timeout: Seconds to wait for a free connection.
+        kwargs: Passed on to create_async_engine.
+    """
+    parsed = sa.engine.make_url(url)
+    sqlite = parsed.get_backend_name() == 'sqlite'
+    if sqlite and parsed.database in (None, '', ':memory:'):
+        # Every connection to :memory: is a new database, so share one.
+        kwargs.setdefault('poolclass', pool.StaticPool)
+    else:
+        kwargs.setdefault('poolclass', pool.AsyncAdaptedQueuePool)
+        kwargs.setdefault('pool_size', pool_size)
+        kwargs.setdefault('max_overflow', max_overflow)
+        kwargs.setdefault('pool_timeout', pool_timeout)
+        kwargs.setdefault('pool_pre_ping', not sqlite)
+    engine = create_async_engine(url, **kwargs)
+    if sqlite:
+        sa.event.listen(engine.sync_engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
+
+def session_factory(engine):
+    """Make AsyncSessions on engine.
+
+    Objects stay usable after commit, since reloading them lazily would need
+    I/O outside an await.
+    """
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def create_schema(engine):
+    async with engine.begin() as connection:
+        await connection.run_sync(models.Base.metadata.create_all)
+
+
+async def load_cards(engine, cards, chunk_size=bulkload.DEFAULT_CHUNK_SIZE):
+    """Async version of bulkload.load_cards.
+
+    Row building runs on the event loop between queries, so a large load
+    holds up other requests for as long as it takes to build a chunk.
+
+    Returns the new card ids, in card order.
+    """
+    async with engine.connect() as connection:
+        return await connection.run_sync(bulkload.load_cards_on, cards, chunk_size)
+
+
+class AsyncCardRepository(object):
+    """repository.CardRepository on an AsyncSession.
+
+    Each call runs the synchronous repository through AsyncSession.run_sync.
+    """
+
+    def __init__(self, session, as_core=False):
+        self.session = session
+        self.as_core = as_core
+
+    async def _run(self, method, *args, **kwargs):
+        def call(session):
+            repo = repository.CardRepository(session, as_core=self.as_core)
+            return getattr(repo, method)(*args, **kwargs)
+        return await self.session.run_sync(call)
+
+    async def cards_in_set(self, set_name, after_id=None, limit=repository.DEFAULT_PAGE_SIZE):
+        return await self._run('cards_in_set', set_name, after_id=after_id, limit=limit)
+
+    async def search(self, after_id=None, limit=repository.DEFAULT_PAGE_SIZE, **filters):
+        return await self._run('search', after_id=after_id, limit=limit, **filters)
+
+    async def get_many(self, ids):
+        return await self._run('get_many', ids)
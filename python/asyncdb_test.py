@@ -0,0 +1,40 @@
+import asyncio
+import os
+import tempfile
+
+import asyncdb
+from testcards import make_card
+
+
+async def load_and_query(url):
+    engine = asyncdb.create_engine(url)
+    try:
+        await asyncdb.create_schema(engine)
+        cards = [make_card('Card {}'.format(i)) for i in range(30)]
+        assert await asyncdb.load_cards(engine, cards, chunk_size=7) == list(range(1, 31))
+
+        async def list_set(after_id):
+            async with asyncdb.session_factory(engine)() as session:
+                return await asyncdb.AsyncCardRepository(session).cards_in_set('TST', after_id=after_id, limit=10)
+
+        pages = await asyncio.gather(*[list_set(after_id) for after_id in (None, 10, 20)])
+        assert [[card.id for card in page.items] for page in pages] == [
+                list(range(1, 11)), list(range(11, 21)), list(range(21, 31))]
+        assert [rule.text for rule in pages[0].items[0].rules] == [
+                'Flying & <stuff>', 'When ~ enters, dräw a card.']
+
+        async with asyncdb.session_factory(engine)() as session:
+            repo = asyncdb.AsyncCardRepository(session, as_core=True)
+            assert [card.name for card in await repo.get_many([2, 1])] == ['Card 1', 'Card 0']
+            assert len((await repo.search(colors='U', limit=None)).items) == 30
+    finally:
+        await engine.dispose()
+
+
+def test_memory_database():
+    asyncio.run(load_and_query('sqlite+aiosqlite://'))
+
+
+def test_file_database():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(load_and_query('sqlite+aiosqlite:///' + os.path.join(directory, 'cards.db')))
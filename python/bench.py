@@ -0,0 +1,216 @@
+"""Benchmarks for the export pipeline on synthetic sets.
+
+Sets of any size are generated as the rows the Sheets API would return, so
+everything runs offline. Each benchmark is timed (best of several runs) and
+run once more under tracemalloc for its peak memory. Results are written as
+JSON, tagged with the current commit, so runs can be compared.
+
+Usage:
+    python bench.py                                  # 1k, 10k and 100k cards
+    python bench.py --sizes 1000 --output new.json
+    python bench.py --compare old.json               # flag slowdowns against old.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import cockatrice
+import core
+import gsheets_new
+import print_orders
+import tracing
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench_output.json")
+REGRESSION_THRESHOLD = 1.10  # Flag benchmarks that got slower by more than this factor
+
+HEADER = ["Name", "Cost", "Rarity", "Legendary", "Type", "Type", "Subtypes", "Classes", "P", "T", "Rules", "Flavor", "Image"]
+TYPES = ["Creature", "Instant", "Sorcery", "Enchantment", "Artifact", "Land"]
+SUBTYPES = ["Pirate", "Merfolk", "Aura", "Equipment", "Wizard", ""]
+COSTS = ["", "1", "W", "1U", "2B", "3R", "GG", "2WU", "XRR", "4", "1{W/U}", "{U/P}B", "3UU", "5G"]
+RULES = [
+        "Flying",
+        "When ~ enters, draw a card.",
+        "{T}: Add {G}.",
+        "~ deals 3 damage to any target.",
+        "Whenever ~ attacks, create a Treasure token.",
+        "Counter target spell unless its controller pays {2}.",
+]
+
+
+def synthetic_rows(n: int, seed: int = 0) -> list[list[str]]:
+    """A header row and n card rows, shaped like a design spreadsheet tab."""
+    rng = random.Random(seed)
+    rows = [HEADER]
+    for i in range(n):
+        ttype = rng.choice(TYPES)
+        creature = ttype == "Creature"
+        rows.append([
+                f"Card {i}",
+                "" if ttype == "Land" else rng.choice(COSTS),
+                rng.choice("CCCCUUURM"),
+                "TRUE" if rng.random() < 0.1 else "FALSE",
+                ttype,
+                "Creature" if ttype == "Artifact" and rng.random() < 0.3 else "",
+                rng.choice(SUBTYPES),
+                "",
+                str(rng.randint(0, 6)) if creature else "",
+                str(rng.randint(1, 6)) if creature else "",
+                "\n".join(rng.sample(RULES, rng.randint(1, 3))),
+                "Some flavor text." if rng.random() < 0.3 else "",
+                f"https://example.com/art/{i}.jpg",
+        ])
+    return rows
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    size: int
+    seconds: float  # Best of the timed runs
+    peak_bytes: int  # Peak traced memory of one run
+
+
+def measure(name: str, size: int, func: Callable[[], object], repeat: int) -> Result:
+    # Start from an empty tracer, so that earlier benchmarks' span totals
+    # don't count towards this one's memory.
+    tracing.reset()
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+    tracing.reset()
+    # Tracing slows everything down, so measure memory in a separate run.
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Result(name=name, size=size, seconds=seconds, peak_bytes=peak_bytes)
+
+
+def run_benchmarks(size: int, repeat: int, directory: str) -> list[Result]:
+    rows = synthetic_rows(size)
+    cards = gsheets_new.parse_gsheet_rows(rows, "BEN")
+    cost_strings = [row[1] for row in rows[1:]]
+    renders = {cockatrice.render_filename(card): f"https://example.com/{i}" for i, card in enumerate(cards)}
+    order_cards = [print_orders.Card(drive_id=f"id{i}", filename=name) for i, name in enumerate(renders)]
+
+    def parse_costs():
+        # Clear the parser's cache so parsing, not lookups, is measured.
+        core._parse_cost.cache_clear()
+        for s in cost_strings:
+            core.Cost.from_str(s)
+
+    def expand_rules():
+        for card in cards:
+            card.expand_rules()
+
+    def card_to_xml_element():
+        for card in cards:
+            cockatrice.card_to_xml_element(card, renders[cockatrice.render_filename(card)])
+
+    def export_cockatrice_xml():
+        # Remove the last export so the file is written every time.
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        with contextlib.redirect_stdout(io.StringIO()):
+            cockatrice.export_cockatrice_xml(
+                    cards=cards,
+                    renders=renders,
+                    set_filename="bench.xml",
+                    set_code="BEN",
+                    set_long_name="Benchmark",
+                    date_string="2024-01-01",
+                    directory=directory,
+            )
+
+    def print_orders_xml():
+        print_orders.xml(lambda card: 1, order_cards, os.path.join(directory, "order.xml"))
+
+    benchmarks = {
+            "gsheets_new.parse_gsheet_rows": lambda: gsheets_new.parse_gsheet_rows(rows, "BEN"),
+            "core.Cost.from_str": parse_costs,
+            "core.Card.expand_rules": expand_rules,
+            "cockatrice.card_to_xml_element": card_to_xml_element,
+            "cockatrice.export_cockatrice_xml": export_cockatrice_xml,
+            "print_orders.xml": print_orders_xml,
+    }
+    return [measure(name, size, func, repeat) for name, func in benchmarks.items()]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True,
+                text=True,
+                check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """Lines comparing two result files. Slowdowns beyond threshold are marked."""
+    old_results = {(r["name"], r["size"]): r for r in old["results"]}
+    lines = [f"Comparing {old.get('commit')} -> {new.get('commit')}"]
+    for r in new["results"]:
+        before = old_results.get((r["name"], r["size"]))
+        if before is None:
+            continue
+        ratio = r["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        memory_ratio = r["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] else float("inf")
+        mark = "  REGRESSION" if ratio > threshold else ""
+        lines.append(f"{r['name']:34} {r['size']:>7} time x{ratio:.2f} memory x{memory_ratio:.2f}{mark}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of cards.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the results JSON.")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier results JSON to compare against.")
+    args = parser.parse_args(argv)
+
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            for result in run_benchmarks(size, args.repeat, directory):
+                print(f"{result.name:34} {result.size:>7} {result.seconds * 1000:10.1f} ms {result.peak_bytes / 2**20:8.1f} MiB")
+                results.append(result)
+
+    output = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": [dataclasses.asdict(result) for result in results],
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(output, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print("\n".join(compare(json.load(file), output)))
+
+
+if __name__ == "__main__":
+    main()
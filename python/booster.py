@@ -0,0 +1,242 @@
+"""Simulate opening booster packs of a set to check its balance.
+
+Usual workflow would be to get a list of core.Card, build a
+cardtable.CardTable from it, and then call simulate() with the set's
+Collation. The result holds how often each card was opened and how many
+cards of each color land in a pack, from which color and cmc balance can be
+read off.
+
+Packs are drawn in chunks as NumPy index arrays, one row per pack, so no
+Python code runs per pack or per card.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import os
+
+import numpy as np
+
+import core
+from cardtable import RARITIES, CardTable
+
+
+# Per-pack color statistics use these columns: one per color, then colorless.
+COLOR_COLUMNS = core.COLORS + ("C",)
+DEFAULT_CHUNK_SIZE = 20_000
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class Collation:
+    """What goes in a pack.
+
+    Each rare slot holds a mythic with probability mythic_rate. Cards are not
+    repeated within a pack unless duplicates is True or there are too few of
+    their rarity.
+    """
+    commons: int = 10
+    uncommons: int = 3
+    rares: int = 1
+    mythic_rate: float = 1 / 8
+    duplicates: bool = False
+
+    def pack_size(self) -> int:
+        return self.commons + self.uncommons + self.rares
+
+
+@dataclasses.dataclass
+class BoosterStats:
+    packs: int
+    opened: np.ndarray  # int64, times each card of the table was opened
+    color_histogram: np.ndarray  # int64, shape (len(COLOR_COLUMNS), pack size + 1): packs with k cards of each color
+
+    def merge(self, other: BoosterStats) -> BoosterStats:
+        return BoosterStats(
+                packs=self.packs + other.packs,
+                opened=self.opened + other.opened,
+                color_histogram=self.color_histogram + other.color_histogram,
+        )
+
+    def color_counts(self, table: CardTable) -> dict[str, int]:
+        """Cards opened with each color. Multicolor cards count for each of their colors."""
+        counts = self.opened @ _color_flags(table)
+        return {color: int(count) for color, count in zip(COLOR_COLUMNS, counts)}
+
+    def color_per_pack(self) -> dict[str, float]:
+        """Mean number of cards of each color in a pack."""
+        k = np.arange(self.color_histogram.shape[1])
+        means = (self.color_histogram @ k) / max(self.packs, 1)
+        return {color: float(mean) for color, mean in zip(COLOR_COLUMNS, means)}
+
+    def cmc_counts(self, table: CardTable, max_cmc: int = 7) -> np.ndarray:
+        """Cards opened by cmc. The last bucket holds cmc >= max_cmc."""
+        return np.bincount(
+                np.minimum(table.cmc, max_cmc),
+                weights=self.opened,
+                minlength=max_cmc + 1,
+        ).astype(np.int64)
+
+    def rarity_counts(self, table: CardTable) -> dict[core.Rarity, int]:
+        counts = np.bincount(table.rarity, weights=self.opened, minlength=len(RARITIES))
+        return {rarity: int(count) for rarity, count in zip(RARITIES, counts)}
+
+    def report(self, table: CardTable) -> str:
+        lines = [f"{self.packs} packs."]
+        per_pack = self.color_per_pack()
+        for color, count in self.color_counts(table).items():
+            lines.append(f"{color}: {count} opened, {per_pack[color]:.3f} per pack")
+        for cmc, count in enumerate(self.cmc_counts(table)):
+            lines.append(f"cmc {cmc}: {count / max(self.packs, 1):.3f} per pack")
+        for rarity, count in self.rarity_counts(table).items():
+            lines.append(f"{rarity.long_name()}: {count / max(self.packs, 1):.3f} per pack")
+        return "\n".join(lines)
+
+
+def _color_flags(table: CardTable) -> np.ndarray:
+    """Shape (n, len(COLOR_COLUMNS)) int8: the card's colors, or colorless."""
+    colored = table.pips > 0
+    return np.column_stack([colored, ~colored.any(axis=1)]).astype(np.int8)
+
+
+class BoosterSimulator:
+    """Draws packs from a table of cards.
+
+    Args:
+        table: The cards that can be opened.
+        collation: What goes in a pack.
+    """
+
+    def __init__(self, table: CardTable, collation: Collation = Collation()):
+        self.table = table
+        self.collation = collation
+        self.buckets = {
+                rarity: np.flatnonzero(table.rarity == code).astype(np.int32)
+                for code, rarity in enumerate(RARITIES)
+        }
+        self.color_flags = _color_flags(table)
+        if collation.commons and not len(self.buckets[core.Rarity.COMMON]):
+            raise ValueError("Collation has commons, but there are no common cards.")
+        if collation.uncommons and not len(self.buckets[core.Rarity.UNCOMMON]):
+            raise ValueError("Collation has uncommons, but there are no uncommon cards.")
+        if collation.rares and not (len(self.buckets[core.Rarity.RARE]) or len(self.buckets[core.Rarity.MYTHIC])):
+            raise ValueError("Collation has rares, but there are no rare or mythic cards.")
+
+    def _draw(self, rng: np.random.Generator, bucket: np.ndarray, packs: int, count: int) -> np.ndarray:
+        """Pick count cards of bucket for each pack. Shape (packs, count)."""
+        if count == 0:
+            return np.empty((packs, 0), dtype=np.int32)
+        if self.collation.duplicates or count > len(bucket):
+            return bucket[rng.integers(len(bucket), size=(packs, count))]
+        # The count smallest of uniform keys are a uniform sample without
+        # replacement; argpartition finds them without a full sort.
+        keys = rng.random((packs, len(bucket)), dtype=np.float32)
+        picks = np.argpartition(keys, count - 1, axis=1)[:, :count]
+        return bucket[picks]
+
+    def _draw_rares(self, rng: np.random.Generator, packs: int) -> np.ndarray:
+        count = self.collation.rares
+        rares = self.buckets[core.Rarity.RARE]
+        mythics = self.buckets[core.Rarity.MYTHIC]
+        if not len(mythics):
+            return self._draw(rng, rares, packs, count)
+        if not len(rares):
+            return self._draw(rng, mythics, packs, count)
+        # Each row of either draw has no repeats, so taking slot j from one
+        # or the other can't repeat a card either.
+        is_mythic = rng.random((packs, count)) < self.collation.mythic_rate
+        return np.where(
+                is_mythic,
+                self._draw(rng, mythics, packs, count),
+                self._draw(rng, rares, packs, count),
+        )
+
+    def open_packs(self, packs: int, rng: np.random.Generator) -> np.ndarray:
+        """Open packs. Returns card indices into the table, shape (packs, pack size)."""
+        return np.concatenate([
+                self._draw(rng, self.buckets[core.Rarity.COMMON], packs, self.collation.commons),
+                self._draw(rng, self.buckets[core.Rarity.UNCOMMON], packs, self.collation.uncommons),
+                self._draw_rares(rng, packs),
+        ], axis=1)
+
+    def simulate(
+            self,
+            packs: int,
+            seed: int | np.random.SeedSequence | None = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> BoosterStats:
+        """Open packs and aggregate what came out, a chunk of packs at a time."""
+        rng = np.random.default_rng(seed)
+        n = len(self.table)
+        pack_size = self.collation.pack_size()
+        opened = np.zeros(n, dtype=np.int64)
+        # Flattened (color, k) histogram so each chunk is one bincount.
+        histogram = np.zeros(len(COLOR_COLUMNS) * (pack_size + 1), dtype=np.int64)
+        offsets = np.arange(len(COLOR_COLUMNS)) * (pack_size + 1)
+
+        remaining = packs
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            cards = self.open_packs(size, rng)
+            opened += np.bincount(cards.ravel(), minlength=n)
+            per_pack = self.color_flags[cards].sum(axis=1, dtype=np.int64)  # (size, colors)
+            histogram += np.bincount((per_pack + offsets).ravel(), minlength=len(histogram))
+            remaining -= size
+
+        return BoosterStats(
+                packs=packs,
+                opened=opened,
+                color_histogram=histogram.reshape(len(COLOR_COLUMNS), pack_size + 1),
+        )
+
+
+def _simulate_worker(
+        table: CardTable,
+        collation: Collation,
+        packs: int,
+        seed: np.random.SeedSequence,
+        chunk_size: int,
+) -> BoosterStats:
+    return BoosterSimulator(table, collation).simulate(packs, seed, chunk_size)
+
+
+def simulate(
+        table: CardTable,
+        packs: int,
+        collation: Collation = Collation(),
+        seed: int | None = None,
+        processes: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BoosterStats:
+    """Open packs across a process pool and merge the results.
+
+    Each process gets its own stream of random numbers spawned from seed, so
+    a run is reproducible for a given seed and number of processes.
+
+    Args:
+        table: The cards that can be opened.
+        packs: Total number of packs to open.
+        collation: What goes in a pack.
+        seed: Seed for the random numbers. Defaults to fresh entropy.
+        processes: Process pool size. Defaults to the number of CPUs. With
+            1, packs are opened in this process.
+        chunk_size: Packs drawn at once. Bigger is faster but uses more memory.
+    """
+    processes = processes or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    shares = [packs // processes + (i < packs % processes) for i in range(processes)]
+    if processes == 1:
+        return _simulate_worker(table, collation, packs, seeds[0], chunk_size)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(
+                _simulate_worker,
+                [table] * processes,
+                [collation] * processes,
+                shares,
+                seeds,
+                [chunk_size] * processes,
+        )
+        stats = next(results)
+        for result in results:
+            stats = stats.merge(result)
+    return stats
@@ -0,0 +1,81 @@
+import dataclasses
+
+import numpy as np
+
+import booster
+from booster import BoosterSimulator, Collation
+from cardtable import CardTable
+from core import Cost, Rarity
+from testcards import make_card
+
+
+def make_table():
+    cards = []
+    for rarity, count in ((Rarity.COMMON, 20), (Rarity.UNCOMMON, 10), (Rarity.RARE, 6), (Rarity.MYTHIC, 2)):
+        for i in range(count):
+            card = make_card(f"{rarity.value}{i}")
+            cost = Cost.from_str("1W" if i % 2 else "3")
+            cards.append(dataclasses.replace(card, rarity=rarity, cost=cost))
+    return CardTable.from_cards(cards)
+
+
+def test_packs_follow_collation():
+    table = make_table()
+    simulator = BoosterSimulator(table, Collation(commons=10, uncommons=3, rares=1, mythic_rate=0.25))
+    packs = simulator.open_packs(5000, np.random.default_rng(0))
+
+    assert packs.shape == (5000, 14)
+    rarity = table.rarity[packs]
+    assert (rarity[:, :10] == 0).all()
+    assert (rarity[:, 10:13] == 1).all()
+    assert np.isin(rarity[:, 13], (2, 3)).all()
+    assert abs((rarity[:, 13] == 3).mean() - 0.25) < 0.03
+    # No repeated commons within a pack.
+    commons = np.sort(packs[:, :10], axis=1)
+    assert (np.diff(commons, axis=1) > 0).all()
+
+
+def test_rare_slots_have_no_duplicates():
+    table = make_table()
+    simulator = BoosterSimulator(table, Collation(commons=0, uncommons=0, rares=2, mythic_rate=0.5))
+    packs = simulator.open_packs(5000, np.random.default_rng(0))
+
+    assert packs.shape == (5000, 2)
+    assert (packs[:, 0] != packs[:, 1]).all()
+    rarity = table.rarity[packs]
+    assert np.isin(rarity, (2, 3)).all()
+    assert abs((rarity == 3).mean() - 0.5) < 0.03
+    # Both mythics in one pack happens, as two different cards.
+    assert ((rarity == 3).all(axis=1)).any()
+
+
+def test_simulate_aggregates():
+    table = make_table()
+    stats = booster.simulate(table, packs=1001, seed=1, processes=1, chunk_size=100)
+
+    assert stats.packs == 1001
+    assert stats.opened.sum() == 1001 * 14
+    assert stats.color_histogram.sum(axis=1).tolist() == [1001] * len(booster.COLOR_COLUMNS)
+    assert stats.cmc_counts(table).sum() == 1001 * 14
+    per_pack = stats.color_per_pack()
+    assert abs(per_pack["W"] + per_pack["C"] - 14) < 1e-9
+    assert stats.color_counts(table)["W"] == stats.opened[table.has_color("W")].sum()
+
+    again = booster.simulate(table, packs=1001, seed=1, processes=1, chunk_size=100)
+    assert (again.opened == stats.opened).all()
+
+
+def test_hybrid_and_phyrexian_cards_have_colors():
+    cards = [
+            dataclasses.replace(make_card("Hybrid"), rarity=Rarity.COMMON, cost=Cost.from_str("{W/U}")),
+            dataclasses.replace(make_card("Phyrexian"), rarity=Rarity.COMMON, cost=Cost.from_str("1{B/P}")),
+            dataclasses.replace(make_card("Colorless"), rarity=Rarity.COMMON, cost=Cost.from_str("2")),
+    ]
+    table = CardTable.from_cards(cards)
+    flags = booster._color_flags(table)
+    assert dict(zip(booster.COLOR_COLUMNS, flags[0])) == {"W": 1, "U": 1, "B": 0, "R": 0, "G": 0, "D": 0, "C": 0}
+    assert dict(zip(booster.COLOR_COLUMNS, flags[1])) == {"W": 0, "U": 0, "B": 1, "R": 0, "G": 0, "D": 0, "C": 0}
+    assert flags[2].tolist() == [0, 0, 0, 0, 0, 0, 1]
+
+    stats = booster.simulate(table, packs=100, seed=0, processes=1, collation=Collation(commons=3, uncommons=0, rares=0))
+    assert stats.color_counts(table) == {"W": 100, "U": 100, "B": 100, "R": 0, "G": 0, "D": 0, "C": 100}
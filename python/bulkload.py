@@ -0,0 +1,215 @@
+"""Bulk loading of core.Card into the sqlalchemy_models tables.
+
+Instead of building ORM objects one card at a time, cards are turned into
+plain row dicts and inserted with one executemany per table. Secondary type
+and set ids are looked up once and cached, and card ids are allocated up
+front so rule and association rows can be built without a round trip per
+card. Each chunk of cards is loaded in its own transaction.
+
+Card ids are allocated from max(cards.id), so only one loader should write
+to a database at a time.
+"""
+from __future__ import absolute_import
+
+import dataclasses
+
+import sqlalchemy as sa
+
+import sqlalchemy_models as models
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Mana columns, by core.Cost attribute. The colorless column holds generic
+# mana plus {C} symbols. The rest of the cost (D, X, hybrid and phyrexian
+# symbols) only has a place in the mana_cost column, which holds it all.
+MANA_COLUMNS = {
+        'W': 'mana_w',
+        'U': 'mana_u',
+        'B': 'mana_b',
+        'R': 'mana_r',
+        'G': 'mana_g',
+}
+
+
+@dataclasses.dataclass
+class Rows:
+    """Rows to insert for a batch of cards, by table."""
+    cards: list
+    rules: list
+    cards_and_secondary_types: list
+    cards_and_sets: list
+
+
+def primary_type(card):
+    """The polymorphic identity of a card, e.g. 'creature' for an Artifact Creature.
+
+    Creature wins over the other types so that power and toughness have a
+    home; otherwise the first known type is used.
+    """
+    types = [t.lower() for t in card.types if t]
+    if 'creature' in types:
+        return 'creature'
+    for t in types:
+        if t in models.card_factories:
+            return t
+        if t.endswith(' land'):  # e.g. 'basic land'
+            return 'land'
+    raise ValueError('Card {!r} has no known primary type: {!r}'.format(card.name, card.types))
+
+
+def _pt(value):
+    return value if isinstance(value, int) else None
+
+
+def cost_columns(cost):
+    """Column values for a core.Cost, including cmc and color_mask."""
+    columns = {column: getattr(cost, color) or None for color, column in MANA_COLUMNS.items()}
+    colorless = (cost.generic or 0) + cost.colorless
+    columns['mana__'] = colorless or None
+    columns['mana_cost'] = cost.as_str()
+    columns['cmc'], columns['color_mask'] = models.core_cost_summary(cost)
+    return columns
+
+
+def card_row(card_id, card):
+    row = {
+            'id': card_id,
+            'name': card.name,
+            'primary_type': primary_type(card),
+            'flavor': card.flavor or None,
+            'rarity': card.rarity.long_name(),
+            'types': '\n'.join(card.types),
+            'classes': '\n'.join(card.classes),
+            'legendary': card.legendary,
+            'image_url': card.image_url,
+            'power': _pt(card.power),
+            'toughness': _pt(card.toughness),
+    }
+    row.update(cost_columns(card.cost))
+    return row
+
+
+def secondary_type_names(card):
+    return [name for name in card.subtypes if name]
+
+
+def build_rows(cards, first_card_id, secondary_type_ids, set_ids):
+    """Turn cards into rows, numbering cards from first_card_id.
+
+    Args:
+        cards: core.Card to load.
+        first_card_id: Id of the first card. The rest follow consecutively.
+        secondary_type_ids: Secondary type name -> id, for every subtype of cards.
+        set_ids: Set name -> id, for every set of cards.
+
+    Returns (Rows, list of card ids).
+    """
+    rows = Rows(cards=[], rules=[], cards_and_secondary_types=[], cards_and_sets=[])
+    card_ids = []
+    for card_id, card in enumerate(cards, start=first_card_id):
+        card_ids.append(card_id)
+        rows.cards.append(card_row(card_id, card))
+        # Rules are stored as written, with "~" for the card's name.
+        rows.rules.extend(
+                {'card_id': card_id, 'text': text}
+                for text in card.rules if text)
+        # A card can list the same subtype twice; link it once.
+        for name in dict.fromkeys(secondary_type_names(card)):
+            rows.cards_and_secondary_types.append(
+                    {'card_id': card_id, 'secondary_type_id': secondary_type_ids[name]})
+        rows.cards_and_sets.append({'card_id': card_id, 'set_id': set_ids[card.sset]})
+    return rows, card_ids
+
+
+def select_ids(table, names):
+    return sa.select(table.c.name, table.c.id).where(table.c.name.in_(names))
+
+
+def next_card_id_statement():
+    return sa.select(sa.func.coalesce(sa.func.max(models.Card.__table__.c.id), 0) + 1)
+
+
+def resolve_ids(connection, table, names, cache):
+    """Find ids of named rows, creating missing ones.
+
+    Args:
+        connection: Connection in a transaction.
+        table: Table with unique name and integer id columns, e.g. sets.
+        names: Names to resolve.
+        cache: Name -> id. Updated in place; names in it aren't looked up.
+    """
+    missing = sorted(set(name for name in names if name not in cache))
+    if not missing:
+        return
+    cache.update(connection.execute(select_ids(table, missing)).all())
+    to_insert = [name for name in missing if name not in cache]
+    if to_insert:
+        connection.execute(table.insert(), [{'name': name} for name in to_insert])
+        cache.update(connection.execute(select_ids(table, to_insert)).all())
+
+
+def insert_rows(connection, rows):
+    """Insert Rows with one executemany per table."""
+    for table, table_rows in (
+            (models.Card.__table__, rows.cards),
+            (models.Rule.__table__, rows.rules),
+            (models.cards_and_secondary_types, rows.cards_and_secondary_types),
+            (models.cards_and_sets, rows.cards_and_sets)):
+        if table_rows:
+            connection.execute(table.insert(), table_rows)
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def load_cards(engine, cards, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Insert cards, their rules, secondary types and sets.
+
+    Args:
+        engine: SQLAlchemy Engine of a database with the sqlalchemy_models
+            tables.
+        cards: core.Card to load.
+        chunk_size: Cards per transaction.
+
+    Returns the new card ids, in card order.
+    """
+    with engine.connect() as connection:
+        return load_cards_on(connection, cards, chunk_size)
+
+
+def load_cards_on(connection, cards, chunk_size=DEFAULT_CHUNK_SIZE):
+    """load_cards on a Connection that isn't in a transaction.
+
+    Each chunk is committed in a transaction of its own. Taking a Connection
+    lets asyncdb run this with AsyncConnection.run_sync.
+    """
+    cards = list(cards)
+    secondary_type_ids = {}
+    set_ids = {}
+    card_ids = []
+    for chunk in chunks(cards, chunk_size):
+        # Work on copies of the caches so that ids created by a transaction
+        # that rolls back aren't kept.
+        chunk_secondary_type_ids = dict(secondary_type_ids)
+        chunk_set_ids = dict(set_ids)
+        with connection.begin():
+            resolve_ids(
+                    connection,
+                    models.SecondaryType.__table__,
+                    [name for card in chunk for name in secondary_type_names(card)],
+                    chunk_secondary_type_ids)
+            resolve_ids(
+                    connection,
+                    models.Set.__table__,
+                    [card.sset for card in chunk],
+                    chunk_set_ids)
+            first_card_id = connection.execute(next_card_id_statement()).scalar_one()
+            rows, ids = build_rows(chunk, first_card_id, chunk_secondary_type_ids, chunk_set_ids)
+            insert_rows(connection, rows)
+        secondary_type_ids = chunk_secondary_type_ids
+        set_ids = chunk_set_ids
+        card_ids.extend(ids)
+    return card_ids
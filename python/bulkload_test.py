@@ -0,0 +1,63 @@
+import dataclasses
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+import bulkload
+import sqlalchemy_models as models
+from core import Cost
+from testcards import make_card
+
+
+def make_engine():
+    engine = sa.create_engine('sqlite://')
+    models.Base.metadata.create_all(engine)
+    return engine
+
+
+def test_load_cards():
+    engine = make_engine()
+    cards = [
+            make_card('Foo'),
+            dataclasses.replace(make_card('Bar'), types=('Instant',), power=None, toughness=None,
+                                subtypes=('Arcane', 'Arcane'), cost=Cost.from_str('3W')),
+            dataclasses.replace(make_card('Baz'), sset='OTH'),
+    ]
+    ids = bulkload.load_cards(engine, cards, chunk_size=2)
+    assert ids == [1, 2, 3]
+    assert bulkload.load_cards(engine, cards[:1]) == [4]
+
+    with Session(engine) as session:
+        foo = session.get(models.Card, 1)
+        assert isinstance(foo, models.Creature)
+        assert (foo.power, foo.toughness, foo.rarity) == (2, 2, 'rare')
+        assert foo.cost == {'_': 2, 'W': None, 'U': 1, 'B': None, 'R': 1, 'G': None}
+        assert [rule.text for rule in foo.rules] == ['Flying & <stuff>', 'When ~ enters, dräw a card.']
+        assert [t.name for t in foo.secondary_types] == ['Pirate']
+        assert [s.name for s in foo.sets] == ['TST']
+
+        bar = session.get(models.Card, 2)
+        assert isinstance(bar, models.Instant)
+        assert [t.name for t in bar.secondary_types] == ['Arcane']
+        assert session.get(models.Card, 3).sets[0].name == 'OTH'
+        assert session.query(models.SecondaryType).count() == 2
+        assert session.query(models.Set).count() == 2
+
+
+def test_load_cards_keeps_whole_cost():
+    engine = make_engine()
+    cost = Cost.from_str('{X}{W/U}{2/B}{R/P}D')
+    bulkload.load_cards(engine, [dataclasses.replace(make_card('Foo'), cost=cost)])
+
+    with Session(engine) as session:
+        foo = session.get(models.Card, 1)
+        assert Cost.from_str(foo.mana_cost) == cost
+        assert foo.cmc == cost.cmc() == 5
+        assert foo.color_mask == sum(models.COLOR_BITS[color] for color in 'WUBR')
+        # The plain columns hold only what they can represent.
+        assert foo.cost == {'_': None, 'W': None, 'U': None, 'B': None, 'R': None, 'G': None}
+
+        # An ORM update keeps the summary in line with the whole cost.
+        foo.mana_cost = '{G/P}'
+        session.commit()
+        assert (foo.cmc, foo.color_mask) == (1, models.COLOR_BITS['G'])
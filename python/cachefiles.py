@@ -0,0 +1,78 @@
+"""Helpers for the on-disk caches: atomic writes and LRU eviction.
+
+Entries are plain files. A read touches an entry's modification time, so
+evicting the oldest files first evicts the least recently used entries.
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import tempfile
+from typing import IO, Iterator
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO]:
+    """Write a file that replaces path only once it is complete.
+
+    Readers never see a partial file, and concurrent writers each get a
+    temporary file of their own. If the block raises, path is left as it was.
+    """
+    encoding = None if "b" in mode else "utf-8"
+    file = tempfile.NamedTemporaryFile(
+            mode,
+            encoding=encoding,
+            dir=os.path.dirname(path) or ".",
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            delete=False,
+    )
+    try:
+        with file:
+            yield file
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file.name)
+        raise
+
+
+def touch(path: str) -> bool:
+    """Mark an entry as recently used. Returns False if it doesn't exist."""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def evict_lru(directory: str, max_bytes: int, suffix: str) -> None:
+    """Remove the least recently used files until the rest fit in max_bytes.
+
+    Args:
+        directory: Cache directory, including its subdirectories.
+        max_bytes: Total size to stay within.
+        suffix: Only files ending with this are entries, e.g. ".png".
+    """
+    entries = []
+    total = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
@@ -0,0 +1,312 @@
+"""In-memory search over cards with a small Scryfall-style query language.
+
+Usual workflow would be to build a CardIndex from a list of core.Card once,
+then call search() for each query, e.g.
+
+    index = CardIndex(cards)
+    index.search("t:creature c:UR cmc<=3 o:draw")
+
+Every index maps a key to a bitset of matching cards, stored as a Python int
+whose bit i stands for cards[i]. Queries are then just bitwise ANDs and ORs.
+
+Query terms, all of which must match:
+    word        Card name contains a word starting with "word".
+    n:word      Same as above.
+    o:word      Rules text (with ~ expanded) contains the word.
+    o:"a b"     Rules text contains the phrase.
+    t:word      Type, subtype or class.
+    c:UR        Card is at least blue and red. c=UR means exactly blue and
+                red, c<=UR means no colors other than blue and red. C means
+                colorless.
+    cmc<=3      Converted mana cost. Also =, :, <, >, >= and !=.
+    r:u         Rarity, by letter or name. Also <, <=, > and >=.
+    s:toks      Set code.
+Prefix a term with "-" to negate it. Separate groups of terms with "or" to
+match any group.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+from typing import Any, Iterable, Iterator, Sequence
+
+import core
+
+
+re_word = re.compile(r"\w+")
+re_query_term = re.compile(
+        r'\s*(?P<negate>-)?'
+        r'(?:(?P<key>[a-zA-Z]+)(?P<op><=|>=|!=|[:=<>]))?'
+        r'(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s"]+))'
+)
+
+RARITY_ORDER = {rarity: i for i, rarity in enumerate(core.Rarity)}
+RARITY_NAMES = {rarity.long_name(): rarity for rarity in core.Rarity}
+
+
+def words(text: str) -> list[str]:
+    return re_word.findall(text.lower())
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Indices of the set bits, in increasing order."""
+    # Scanning the binary string is linear in the number of bits, whereas
+    # clearing bits one at a time would copy the whole int for each match.
+    digits = bin(bits)[:1:-1]
+    i = digits.find("1")
+    while i != -1:
+        yield i
+        i = digits.find("1", i + 1)
+
+
+def bits_from_indices(indices: Iterable[int], size: int) -> int:
+    """Bitset with the given bit indices set."""
+    indices = list(indices)
+    if len(indices) * 64 < size:
+        # Sparse, e.g. a rare name word: cheaper than filling a whole buffer.
+        bits = 0
+        for i in indices:
+            bits |= 1 << i
+        return bits
+    buffer = bytearray((size + 7) // 8)
+    for i in indices:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _to_bits(indices_by_key: dict[Any, list[int]], size: int) -> dict[Any, int]:
+    return {key: bits_from_indices(indices, size) for key, indices in indices_by_key.items()}
+
+
+class CardIndex:
+    """Inverted and bitmap indexes over a list of cards."""
+
+    def __init__(self, cards: Sequence[core.Card]):
+        self.cards = list(cards)
+        self.all = (1 << len(self.cards)) - 1
+
+        # Collect card indices per key first; setting bits one at a time in a
+        # big int would copy it for every card.
+        name: dict[str, list[int]] = {}
+        text: dict[str, list[int]] = {}
+        types: dict[str, list[int]] = {}
+        sets: dict[str, list[int]] = {}
+        rarity: dict[core.Rarity, list[int]] = {}
+        colors: dict[str, list[int]] = {c: [] for c in core.COLORS}
+        cmcs: dict[int, list[int]] = {}
+        self._rules_text: list[str] = []
+
+        for i, card in enumerate(self.cards):
+            for word in set(words(card.name)):
+                name.setdefault(word, []).append(i)
+            rules_text = "\n".join(card.expand_rules()).lower()
+            self._rules_text.append(rules_text)
+            for word in set(words(rules_text)):
+                text.setdefault(word, []).append(i)
+            type_words = set()
+            for t in (*card.types, *card.subtypes, *card.classes):
+                type_words.update(words(t))
+            for word in type_words:
+                types.setdefault(word, []).append(i)
+            sets.setdefault(card.sset.lower(), []).append(i)
+            rarity.setdefault(card.rarity, []).append(i)
+            for color in card.cost.colors():
+                colors[color].append(i)
+            cmcs.setdefault(card.cost.cmc(), []).append(i)
+
+        size = len(self.cards)
+        self._name = _to_bits(name, size)
+        self._text = _to_bits(text, size)
+        self._types = _to_bits(types, size)
+        self._sets = _to_bits(sets, size)
+        self._rarity = _to_bits(rarity, size)
+        self._colors = _to_bits(colors, size)
+        self._cmc = _to_bits(cmcs, size)
+
+        # Sorted keys allow prefix lookups on names and range lookups on cmc.
+        self._name_words = sorted(self._name)
+        self._cmc_values = sorted(self._cmc)
+        self._colorless = self.all
+        for bits in self._colors.values():
+            self._colorless &= ~bits
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def search(self, query: str, limit: int | None = None) -> list[core.Card]:
+        """Cards matching a query, in index order. See the module docstring."""
+        result: list[core.Card] = []
+        for i in iter_bits(self.match(query)):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self.cards[i])
+        return result
+
+    def match(self, query: str) -> int:
+        """Bitset of cards matching a query."""
+        matched = 0
+        for group in _split_or(_parse_query(query)):
+            bits = self.all
+            for negate, key, op, value in group:
+                term_bits = self._match_term(key, op, value)
+                bits &= ~term_bits if negate else term_bits
+                if not bits:
+                    break
+            matched |= bits
+        return matched
+
+    def _match_term(self, key: str | None, op: str | None, value: str) -> int:
+        key = key.lower() if key is not None else "n"
+        if key in ("n", "name"):
+            return self._match_name(value)
+        if key in ("o", "oracle"):
+            return self._match_text(value)
+        if key in ("t", "type"):
+            bits = self.all
+            for word in words(value):
+                bits &= self._types.get(word, 0)
+            return bits
+        if key in ("s", "set", "e"):
+            return self._sets.get(value.lower(), 0)
+        if key in ("c", "color"):
+            return self._match_colors(op, value)
+        if key in ("cmc", "mv"):
+            try:
+                cmc = int(value)
+            except ValueError:
+                raise ValueError(f"Bad cmc {value!r}")
+            return self._match_cmc(op, cmc)
+        if key in ("r", "rarity"):
+            return self._match_rarity(op, value)
+        raise ValueError(f"Unknown search key {key!r}")
+
+    def _match_name(self, value: str) -> int:
+        bits = self.all
+        for word in words(value):
+            # Prefix match so that partially typed words already find cards.
+            word_bits = 0
+            for j in range(bisect.bisect_left(self._name_words, word), len(self._name_words)):
+                name_word = self._name_words[j]
+                if not name_word.startswith(word):
+                    break
+                word_bits |= self._name[name_word]
+            bits &= word_bits
+        return bits
+
+    def _match_text(self, value: str) -> int:
+        phrase_words = words(value)
+        bits = self.all
+        for word in phrase_words:
+            bits &= self._text.get(word, 0)
+        if len(phrase_words) > 1:
+            phrase = value.lower()
+            bits = bits_from_indices(
+                    (i for i in iter_bits(bits) if phrase in self._rules_text[i]),
+                    len(self.cards),
+            )
+        return bits
+
+    def _match_colors(self, op: str | None, value: str) -> int:
+        value = value.upper()
+        wanted = {c for c in value if c in self._colors}
+        if set(value) - wanted - {"C"}:
+            raise ValueError(f"Bad colors {value!r}")
+        other = 0
+        for color, bits in self._colors.items():
+            if color not in wanted:
+                other |= bits
+        if op in (":", ">="):
+            bits = self.all
+            for color in wanted:
+                bits &= self._colors[color]
+            return bits & self._colorless if not wanted else bits
+        if op == "=":
+            bits = self.all & ~other
+            for color in wanted:
+                bits &= self._colors[color]
+            return bits
+        if op == "<=":
+            return self.all & ~other
+        raise ValueError(f"Bad color comparison {op!r}")
+
+    def _match_cmc(self, op: str | None, cmc: int) -> int:
+        values = self._cmc_values
+        if op in (":", "="):
+            return self._cmc.get(cmc, 0)
+        if op == "!=":
+            return self.all & ~self._cmc.get(cmc, 0)
+        if op == "<":
+            selected = values[:bisect.bisect_left(values, cmc)]
+        elif op == "<=":
+            selected = values[:bisect.bisect_right(values, cmc)]
+        elif op == ">":
+            selected = values[bisect.bisect_right(values, cmc):]
+        elif op == ">=":
+            selected = values[bisect.bisect_left(values, cmc):]
+        else:
+            raise ValueError(f"Bad cmc comparison {op!r}")
+        bits = 0
+        for value in selected:
+            bits |= self._cmc[value]
+        return bits
+
+    def _match_rarity(self, op: str | None, value: str) -> int:
+        value = value.lower()
+        if value in RARITY_NAMES:
+            rarity = RARITY_NAMES[value]
+        else:
+            try:
+                rarity = core.Rarity.from_string(value.upper())
+            except ValueError:
+                raise ValueError(f"Bad rarity {value!r}")
+        compare = {
+                ":": lambda r: r == rarity,
+                "=": lambda r: r == rarity,
+                "!=": lambda r: r != rarity,
+                "<": lambda r: RARITY_ORDER[r] < RARITY_ORDER[rarity],
+                "<=": lambda r: RARITY_ORDER[r] <= RARITY_ORDER[rarity],
+                ">": lambda r: RARITY_ORDER[r] > RARITY_ORDER[rarity],
+                ">=": lambda r: RARITY_ORDER[r] >= RARITY_ORDER[rarity],
+        }[op]
+        bits = 0
+        for r, r_bits in self._rarity.items():
+            if compare(r):
+                bits |= r_bits
+        return bits
+
+
+Term = tuple[bool, str | None, str | None, str]  # negate, key, op, value
+
+
+def _parse_query(query: str) -> list[Term]:
+    terms: list[Term] = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = re_query_term.match(query, position)
+        if match is None:
+            raise ValueError(f"Can't parse query at {query[position:]!r}")
+        position = match.end()
+        value = match.group("quoted")
+        if value is None:
+            value = match.group("value")
+        terms.append((
+                match.group("negate") is not None,
+                match.group("key"),
+                match.group("op"),
+                value,
+        ))
+        while position < len(query) and query[position].isspace():
+            position += 1
+    return terms
+
+
+def _split_or(terms: list[Term]) -> list[list[Term]]:
+    groups: list[list[Term]] = [[]]
+    for term in terms:
+        negate, key, _, value = term
+        if not negate and key is None and value.lower() == "or":
+            groups.append([])
+        else:
+            groups[-1].append(term)
+    return [group for group in groups if group] or [[]]
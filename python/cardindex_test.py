@@ -0,0 +1,129 @@
+import dataclasses
+
+import pytest
+
+import cardindex
+from cardindex import CardIndex
+from core import Cost, Rarity
+from testcards import make_card
+
+
+def card(name, cost, rarity=Rarity.COMMON, types=("Creature",), rules=(), sset="TST"):
+    return dataclasses.replace(
+            make_card(name),
+            cost=Cost.from_str(cost),
+            rarity=rarity,
+            types=types,
+            rules=rules,
+            sset=sset,
+    )
+
+
+CARDS = [
+        card("Storm Crow", "1U", rules=("Flying",)),
+        card("Lightning Bolt", "R", Rarity.UNCOMMON, ("Instant",), ("~ deals 3 damage to any target.",)),
+        card("Izzet Charm", "UR", Rarity.UNCOMMON, ("Instant",), ("Draw two cards, then discard two cards.",)),
+        card("Sol Ring", "1", Rarity.RARE, ("Artifact",), ("Add two colorless mana.",), sset="OTH"),
+        card("Boros Reckoner", "{R/W}{R/W}{R/W}", Rarity.RARE, rules=("Whenever ~ is dealt damage, draw a card.",)),
+        card("Crow of Dark Tidings", "2B", rules=("Flying",)),
+        card("Dismember", "1{B/P}{B/P}", Rarity.MYTHIC, ("Instant",)),
+        card("Ornithopter", "0", Rarity.COMMON, ("Artifact", "Creature"), ("Flying",)),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CardIndex(CARDS)
+
+
+def names(index, query):
+    return [c.name for c in index.search(query)]
+
+
+def test_name(index):
+    assert names(index, "crow") == ["Storm Crow", "Crow of Dark Tidings"]
+    assert names(index, "cro dar") == ["Crow of Dark Tidings"]
+    assert names(index, "n:bolt") == ["Lightning Bolt"]
+    assert names(index, "nothing") == []
+
+
+def test_oracle(index):
+    assert names(index, "o:flying") == ["Storm Crow", "Crow of Dark Tidings", "Ornithopter"]
+    # ~ is expanded to the card's name.
+    assert names(index, "o:lightning") == ["Lightning Bolt"]
+    # A quoted phrase needs the words in order, not just all of them.
+    assert names(index, 'o:"draw a card"') == ["Boros Reckoner"]
+    assert names(index, 'o:"two cards"') == ["Izzet Charm"]
+    assert names(index, 'o:"cards two"') == []
+
+
+def test_type_and_set(index):
+    assert names(index, "t:artifact") == ["Sol Ring", "Ornithopter"]
+    assert names(index, "t:artifact t:creature") == ["Ornithopter"]
+    assert names(index, "t:pirate s:oth") == ["Sol Ring"]
+    assert names(index, "s:OTH") == ["Sol Ring"]
+
+
+def test_colors(index):
+    assert names(index, "c:R") == ["Lightning Bolt", "Izzet Charm", "Boros Reckoner"]
+    assert names(index, "c:UR") == ["Izzet Charm"]
+    assert names(index, "c>=UR") == ["Izzet Charm"]
+    assert names(index, "c=R") == ["Lightning Bolt"]
+    assert names(index, "c=RW") == ["Boros Reckoner"]
+    assert names(index, "c<=UR") == ["Storm Crow", "Lightning Bolt", "Izzet Charm", "Sol Ring", "Ornithopter"]
+    # Phyrexian symbols count toward their color.
+    assert names(index, "c:B") == ["Crow of Dark Tidings", "Dismember"]
+
+
+def test_colorless(index):
+    assert names(index, "c:C") == ["Sol Ring", "Ornithopter"]
+    assert names(index, "c=C") == ["Sol Ring", "Ornithopter"]
+    assert names(index, "c<=C") == ["Sol Ring", "Ornithopter"]
+    assert names(index, "-c:C") == [c.name for c in CARDS if c.cost.colors()]
+
+
+def test_cmc(index):
+    assert names(index, "cmc:2") == ["Storm Crow", "Izzet Charm"]
+    assert names(index, "cmc=0") == ["Ornithopter"]
+    assert names(index, "cmc!=2 cmc<3") == ["Lightning Bolt", "Sol Ring", "Ornithopter"]
+    assert names(index, "cmc<=1") == ["Lightning Bolt", "Sol Ring", "Ornithopter"]
+    assert names(index, "cmc>2") == ["Boros Reckoner", "Crow of Dark Tidings", "Dismember"]
+    assert names(index, "mv>=3") == ["Boros Reckoner", "Crow of Dark Tidings", "Dismember"]
+    assert names(index, "cmc>9") == []
+
+
+def test_rarity(index):
+    assert names(index, "r:u") == ["Lightning Bolt", "Izzet Charm"]
+    assert names(index, "r=mythic") == ["Dismember"]
+    assert names(index, "r>=rare") == ["Sol Ring", "Boros Reckoner", "Dismember"]
+    assert names(index, "r>r") == ["Dismember"]
+    assert names(index, "r<u") == ["Storm Crow", "Crow of Dark Tidings", "Ornithopter"]
+    assert names(index, "r<=c") == ["Storm Crow", "Crow of Dark Tidings", "Ornithopter"]
+    assert names(index, "r!=c t:instant") == ["Lightning Bolt", "Izzet Charm", "Dismember"]
+
+
+def test_negation_and_or(index):
+    assert names(index, "t:instant -c:R") == ["Dismember"]
+    assert names(index, "-o:flying t:creature") == ["Boros Reckoner"]
+    assert names(index, "bolt or sol") == ["Lightning Bolt", "Sol Ring"]
+    assert names(index, "t:instant c:U or t:artifact -t:creature or r:m") == ["Izzet Charm", "Sol Ring", "Dismember"]
+    # Empty groups match everything, as does an empty query.
+    assert len(index.search("or")) == len(CARDS)
+    assert len(index.search("")) == len(CARDS)
+    assert len(index.search("", limit=3)) == 3
+
+
+@pytest.mark.parametrize("query", ["x:foo", "cmc:two", "cmc<x", "c:UQ", "c<R", "r:q", 'o:"open'])
+def test_errors(index, query):
+    with pytest.raises(ValueError):
+        index.match(query)
+
+
+def test_bits_from_indices():
+    # Sparse: far fewer indices than bits.
+    assert cardindex.bits_from_indices([3, 1000], 10_000) == (1 << 3) | (1 << 1000)
+    # Dense: build through a byte buffer.
+    indices = [0, 7, 8, 9, 63, 64]
+    assert cardindex.bits_from_indices(indices, 65) == sum(1 << i for i in indices)
+    assert cardindex.bits_from_indices([], 0) == 0
+    assert list(cardindex.iter_bits(cardindex.bits_from_indices(indices, 65))) == indices
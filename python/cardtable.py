@@ -0,0 +1,223 @@
+"""Columnar view of a list of cards for set analytics.
+
+Usual workflow would be to get a list of core.Card (possibly from several
+sets or versions of a set), build a CardTable from it, and then use the
+group-by helpers to compute mana curves, color counts and so on with NumPy
+instead of Python loops.
+"""
+from __future__ import annotations
+
+import dataclasses
+from typing import Sequence
+
+import numpy as np
+
+import core
+
+
+RARITIES: tuple[core.Rarity, ...] = tuple(core.Rarity)
+CARD_TYPES = ("artifact", "creature", "enchantment", "instant", "land", "sorcery")
+
+
+def _pt_value(pt: int | str | None) -> float:
+    """Numeric power or toughness, or NaN for missing and non-numeric values like "*"."""
+    if isinstance(pt, int):
+        return float(pt)
+    return np.nan
+
+
+def cost_pips(cost: core.Cost) -> tuple[int, ...]:
+    """Colored mana symbols of a cost per color, in core.COLORS order.
+
+    Hybrid symbols count toward each of their colors, e.g. "{W/U}" toward
+    both W and U, and phyrexian symbols toward their color, so that a color
+    has pips exactly when it is in cost.colors().
+    """
+    pips = {c: getattr(cost, c) for c in core.COLORS}
+    for symbol in cost.hybrid + cost.phyrexian:
+        for part in symbol.split("/"):
+            if part in pips:
+                pips[part] += 1
+    return tuple(pips[c] for c in core.COLORS)
+
+
+@dataclasses.dataclass
+class CardTable:
+    name: np.ndarray  # object
+    sset: np.ndarray  # object
+    cmc: np.ndarray  # int16
+    pips: np.ndarray  # int16, shape (n, len(core.COLORS)), columns in core.COLORS order, see cost_pips
+    rarity: np.ndarray  # int8 index into RARITIES
+    power: np.ndarray  # float32, NaN if missing or not a number
+    toughness: np.ndarray  # float32, NaN if missing or not a number
+    legendary: np.ndarray  # bool
+    type_flags: np.ndarray  # bool, shape (n, len(CARD_TYPES)), columns in CARD_TYPES order
+
+    @classmethod
+    def from_cards(cls, cards: Sequence[core.Card]) -> CardTable:
+        n = len(cards)
+        rarity_codes = {rarity: code for code, rarity in enumerate(RARITIES)}
+        type_columns = {t: i for i, t in enumerate(CARD_TYPES)}
+
+        pips = np.zeros((n, len(core.COLORS)), dtype=np.int16)
+        type_flags = np.zeros((n, len(CARD_TYPES)), dtype=bool)
+        # Only a few distinct costs occur in a set, so convert each one once.
+        cost_rows: dict[core.Cost, tuple[tuple[int, ...], int]] = {}
+        cmc = np.empty(n, dtype=np.int16)
+        for i, card in enumerate(cards):
+            cost = card.cost
+            row = cost_rows.get(cost)
+            if row is None:
+                row = cost_rows[cost] = (cost_pips(cost), cost.cmc())
+            pips[i], cmc[i] = row
+            for t in card.types:
+                column = type_columns.get(t.lower())
+                if column is not None:
+                    type_flags[i, column] = True
+
+        return cls(
+                name=np.array([card.name for card in cards], dtype=object),
+                sset=np.array([card.sset for card in cards], dtype=object),
+                cmc=cmc,
+                pips=pips,
+                rarity=np.fromiter((rarity_codes[card.rarity] for card in cards), dtype=np.int8, count=n),
+                power=np.fromiter((_pt_value(card.power) for card in cards), dtype=np.float32, count=n),
+                toughness=np.fromiter((_pt_value(card.toughness) for card in cards), dtype=np.float32, count=n),
+                legendary=np.fromiter((card.legendary for card in cards), dtype=bool, count=n),
+                type_flags=type_flags,
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence[CardTable]) -> CardTable:
+        """Stack tables, e.g. from several sets or versions of a set."""
+        return cls(**{
+                field.name: np.concatenate([getattr(t, field.name) for t in tables])
+                for field in dataclasses.fields(cls)
+        })
+
+    def __len__(self) -> int:
+        return len(self.cmc)
+
+    def select(self, where: np.ndarray) -> CardTable:
+        """Rows where the boolean mask is True."""
+        return CardTable(**{
+                field.name: getattr(self, field.name)[where]
+                for field in dataclasses.fields(self)
+        })
+
+    def is_type(self, card_type: str) -> np.ndarray:
+        return self.type_flags[:, CARD_TYPES.index(card_type.lower())]
+
+    def has_color(self, color: str) -> np.ndarray:
+        return self.pips[:, core.COLORS.index(color)] > 0
+
+    def color_mask(self) -> np.ndarray:
+        """Bit i set if the card has a pip of core.COLORS[i]."""
+        bits = (1 << np.arange(len(core.COLORS), dtype=np.uint8))
+        return ((self.pips > 0) * bits).sum(axis=1).astype(np.uint8)
+
+    def mana_curve(self, max_cmc: int = 7, where: np.ndarray | None = None) -> np.ndarray:
+        """Card counts by cmc. The last bucket holds cmc >= max_cmc."""
+        cmc = self.cmc if where is None else self.cmc[where]
+        return np.bincount(np.minimum(cmc, max_cmc), minlength=max_cmc + 1)
+
+    def color_counts(self, where: np.ndarray | None = None) -> dict[str, int]:
+        """Number of cards with at least one pip of each color."""
+        pips = self.pips if where is None else self.pips[where]
+        counts = (pips > 0).sum(axis=0)
+        return {color: int(count) for color, count in zip(core.COLORS, counts)}
+
+    def rarity_distribution(self, where: np.ndarray | None = None) -> dict[core.Rarity, int]:
+        rarity = self.rarity if where is None else self.rarity[where]
+        counts = np.bincount(rarity, minlength=len(RARITIES))
+        return {r: int(count) for r, count in zip(RARITIES, counts)}
+
+    def pt_vs_cmc(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Mean power and toughness of creatures by cmc.
+
+        Creatures with non-numeric power or toughness are left out.
+
+        Returns (cmc values, mean power, mean toughness).
+        """
+        where = self.is_type("creature") & np.isfinite(self.power) & np.isfinite(self.toughness)
+        keys, power = group_aggregate(self.cmc[where], self.power[where], "mean")
+        _, toughness = group_aggregate(self.cmc[where], self.toughness[where], "mean")
+        return keys, power, toughness
+
+    def to_arrow(self):
+        """Convert to a pyarrow.Table. Requires pyarrow."""
+        import pyarrow as pa
+
+        columns = {
+                "name": pa.array(self.name, type=pa.string()),
+                "sset": pa.array(self.sset, type=pa.string()),
+                "cmc": self.cmc,
+                "rarity": pa.array([r.value for r in RARITIES]).take(pa.array(self.rarity)),
+                "power": self.power,
+                "toughness": self.toughness,
+                "legendary": self.legendary,
+        }
+        for i, color in enumerate(core.COLORS):
+            columns[f"pips_{color}"] = self.pips[:, i]
+        for i, card_type in enumerate(CARD_TYPES):
+            columns[f"is_{card_type}"] = self.type_flags[:, i]
+        return pa.table(columns)
+
+    def to_parquet(self, path: str) -> None:
+        """Write to a Parquet file. Requires pyarrow."""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+
+def group_index(keys: np.ndarray | Sequence[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Find the distinct keys and each row's group.
+
+    Args:
+        keys: One key array, or a sequence of equally long key arrays to group
+            by several columns at once.
+
+    Returns (distinct keys, group index of each row).
+    """
+    if isinstance(keys, np.ndarray):
+        unique, inverse = np.unique(keys, return_inverse=True)
+    else:
+        unique, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+
+def group_count(keys: np.ndarray | Sequence[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Number of rows per distinct key. See group_index."""
+    unique, inverse = group_index(keys)
+    return unique, np.bincount(inverse, minlength=len(unique))
+
+
+def group_aggregate(
+        keys: np.ndarray | Sequence[np.ndarray],
+        values: np.ndarray,
+        func: str = "sum",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Aggregate values per distinct key.
+
+    Args:
+        keys: See group_index.
+        values: One value per row.
+        func: One of "sum", "mean", "min" or "max".
+
+    Returns (distinct keys, aggregated value per key).
+    """
+    unique, inverse = group_index(keys)
+    if func in ("sum", "mean"):
+        sums = np.bincount(inverse, weights=values, minlength=len(unique))
+        if func == "sum":
+            return unique, sums
+        return unique, sums / np.bincount(inverse, minlength=len(unique))
+    if func in ("min", "max"):
+        if len(values) == 0:
+            return unique, np.asarray(values)[:0]
+        order = np.argsort(inverse, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+        # fmin and fmax ignore NaN, e.g. non-numeric power.
+        ufunc = np.fmin if func == "min" else np.fmax
+        return unique, ufunc.reduceat(np.asarray(values)[order], starts)
+    raise ValueError(f"Unknown aggregate {func!r}")
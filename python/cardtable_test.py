@@ -0,0 +1,121 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+import cardtable
+import core
+from cardtable import CardTable
+from core import Cost, Rarity
+from testcards import make_card
+
+
+def make_cards():
+    return [
+            dataclasses.replace(make_card("Foo"), cost=Cost.from_str("1WW")),
+            dataclasses.replace(make_card("Bar"), cost=Cost.from_str("{W/U}{2/B}"), power="*"),
+            dataclasses.replace(make_card("Baz"), cost=Cost.from_str("{G/P}{3}"), rarity=Rarity.COMMON,
+                                types=("Instant",), power=None, toughness=None),
+            dataclasses.replace(make_card("Qux"), cost=Cost.from_str("4"), power=5, toughness=1),
+    ]
+
+
+def test_from_cards():
+    table = CardTable.from_cards(make_cards())
+    assert table.name.tolist() == ["Foo", "Bar", "Baz", "Qux"]
+    assert table.cmc.tolist() == [3, 3, 4, 4]
+    assert table.rarity.tolist() == [2, 2, 0, 2]
+    assert np.isnan(table.power[1]) and np.isnan(table.power[2])
+    assert table.is_type("creature").tolist() == [True, True, False, True]
+    assert table.is_type("Instant").tolist() == [False, False, True, False]
+
+
+def test_hybrid_and_phyrexian_pips():
+    cards = make_cards()
+    table = CardTable.from_cards(cards)
+    assert table.pips.tolist() == [
+            [2, 0, 0, 0, 0, 0],
+            [1, 1, 1, 0, 0, 0],
+            [0, 0, 0, 0, 1, 0],
+            [0, 0, 0, 0, 0, 0],
+    ]
+    for color in "WUBRG":
+        assert table.has_color(color).tolist() == [color in card.cost.colors() for card in cards]
+    assert table.color_mask().tolist() == [0b1, 0b111, 0b10000, 0]
+    assert table.color_counts() == {"W": 2, "U": 1, "B": 1, "R": 0, "G": 1, "D": 0}
+    assert table.color_counts(where=table.is_type("creature")) == {"W": 2, "U": 1, "B": 1, "R": 0, "G": 0, "D": 0}
+
+
+def test_select_and_concat():
+    table = CardTable.from_cards(make_cards())
+    selected = table.select(table.cmc == 4)
+    assert len(selected) == 2
+    assert selected.name.tolist() == ["Baz", "Qux"]
+    assert selected.pips.shape == (2, 6)
+
+    both = CardTable.concat([table, selected])
+    assert len(both) == 6
+    assert both.name.tolist() == ["Foo", "Bar", "Baz", "Qux", "Baz", "Qux"]
+    assert both.type_flags.shape == (6, len(cardtable.CARD_TYPES))
+    assert both.mana_curve(max_cmc=3).tolist() == [0, 0, 0, 6]
+
+
+def test_pt_vs_cmc():
+    keys, power, toughness = CardTable.from_cards(make_cards()).pt_vs_cmc()
+    assert keys.tolist() == [3, 4]
+    assert power.tolist() == [2, 5]
+    assert toughness.tolist() == [2, 1]
+
+
+def test_group_aggregate():
+    keys = np.array([2, 1, 2, 1, 3])
+    values = np.array([1.0, np.nan, 3.0, 4.0, np.nan])
+    assert cardtable.group_aggregate(keys, values[[0, 2, 3, 3, 0]], "sum")[1].tolist() == [7, 5, 1]
+    assert cardtable.group_aggregate(keys, np.array([1.0, 2, 3, 4, 5]), "mean")[1].tolist() == [3, 2, 5]
+
+    unique, low = cardtable.group_aggregate(keys, values, "min")
+    _, high = cardtable.group_aggregate(keys, values, "max")
+    assert unique.tolist() == [1, 2, 3]
+    # NaN is ignored unless the whole group is NaN.
+    assert low[:2].tolist() == [4, 1] and np.isnan(low[2])
+    assert high[:2].tolist() == [4, 3] and np.isnan(high[2])
+
+    unique, empty = cardtable.group_aggregate(np.array([], dtype=int), np.array([]), "max")
+    assert len(unique) == 0 and len(empty) == 0
+
+
+def test_group_by_several_keys():
+    unique, counts = cardtable.group_count([np.array([1, 1, 2, 1]), np.array([0, 1, 0, 0])])
+    assert unique.tolist() == [[1, 0], [1, 1], [2, 0]]
+    assert counts.tolist() == [2, 1, 1]
+
+
+def assert_matches_table(arrow_table, table):
+    columns = arrow_table.to_pydict()
+    assert columns["name"] == table.name.tolist()
+    assert columns["sset"] == table.sset.tolist()
+    assert columns["cmc"] == table.cmc.tolist()
+    assert columns["rarity"] == ["R", "R", "C", "R"]
+    assert columns["legendary"] == table.legendary.tolist()
+    assert np.array_equal(np.array(columns["power"], dtype=float), table.power, equal_nan=True)
+    assert np.array_equal(np.array(columns["toughness"], dtype=float), table.toughness, equal_nan=True)
+    for i, color in enumerate(core.COLORS):
+        assert columns[f"pips_{color}"] == table.pips[:, i].tolist()
+    for i, card_type in enumerate(cardtable.CARD_TYPES):
+        assert columns[f"is_{card_type}"] == table.type_flags[:, i].tolist()
+
+
+def test_to_arrow():
+    pytest.importorskip("pyarrow")
+    table = CardTable.from_cards(make_cards())
+    assert_matches_table(table.to_arrow(), table)
+
+
+def test_to_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    table = CardTable.from_cards(make_cards())
+    path = str(tmp_path / "cards.parquet")
+    table.to_parquet(path)
+    assert_matches_table(pq.read_table(path), table)
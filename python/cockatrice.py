@@ -1,6 +1,14 @@
-import core
+import itertools
+import os
+from typing import BinaryIO, Iterable, Iterator
 import xml.etree.ElementTree as ET
 
+import cachefiles
+import core
+import manifest
+import tracing
+from manifest import Manifest, ManifestDiff
+
 
 def type_to_tablerow(ttype: str) -> int:
     match ttype:
@@ -44,7 +52,7 @@ def card_to_xml_element(card: core.Card, render_url: str) -> ET.Element:
     cmc = ET.SubElement(prop, "cmc")
     cmc.text = str(card.cost.cmc())
     colors = ET.SubElement(prop, "colors")
-    colors.text = "".join(c for c in core.COLORS if getattr(card.cost, c) > 0)
+    colors.text = card.cost.colors()
     color_identity = ET.SubElement(prop, "coloridentity")
     color_identity.text = colors.text
     if card.power is not None and card.toughness is not None:
@@ -57,17 +65,13 @@ def card_to_xml_element(card: core.Card, render_url: str) -> ET.Element:
     return root
 
 
-def export_cockatrice_xml(
-        cards: list[core.Card],
-        renders: dict[str, str],  # name -> URL
-        set_filename: str,
-        set_code: str,
-        set_long_name: str,
-        date_string: str,
-) -> None:
-    root = ET.Element("cockatrice_carddatabase", version="4")
-    sets_element = ET.SubElement(root, "sets")
-    sset = ET.SubElement(sets_element, "set")
+CUSTOMSETS_DIRECTORY = "/home/daniel/.local/share/Cockatrice/Cockatrice/customsets"
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+INDENT = "  "
+
+
+def set_to_xml_element(set_code: str, set_long_name: str, date_string: str) -> ET.Element:
+    sset = ET.Element("set")
     set_name = ET.SubElement(sset, "name")
     set_name.text = set_code
     set_longname = ET.SubElement(sset, "longname")
@@ -76,16 +80,161 @@ def export_cockatrice_xml(
     set_type.text = "Custom"
     set_release_date = ET.SubElement(sset, "releasedate")
     set_release_date.text = date_string
+    return sset
+
+
+def render_filename(card: core.Card) -> str:
+    name_for_url = card.name.replace("'", "").replace("!", "").replace(",", "")
+    return f"{name_for_url}.png"
 
-    cards_element = ET.SubElement(root, "cards")
+
+def cards_with_renders(
+        cards: Iterable[core.Card],
+        renders: dict[str, str],  # name -> URL
+) -> Iterator[tuple[core.Card, str]]:
+    """Pair cards with their render URLs, skipping cards with no render."""
     for card in cards:
-        name_for_url = card.name.replace("'", "").replace("!", "").replace(",", "")
-        url = renders.get(f"{name_for_url}.png", None)
+        filename = render_filename(card)
+        url = renders.get(filename, None)
         if url is None:
-            print(f"{name_for_url}.png image file not found.")
+            print(f"{filename} image file not found.")
         else:
-            cards_element.append(card_to_xml_element(card, url))
-    tree = ET.ElementTree(root)
-    ET.indent(tree, space="  ", level=0)
-    with open(f"/home/daniel/.local/share/Cockatrice/Cockatrice/customsets/01.{set_filename}", mode="wb") as file:
-        tree.write(file, encoding="utf-8", xml_declaration=True)
+            yield card, url
+
+
+def card_xml_elements(
+        cards: Iterable[core.Card],
+        renders: dict[str, str],  # name -> URL
+        card_manifest: Manifest | None = None,
+) -> Iterator[ET.Element]:
+    """Convert cards to XML elements, skipping cards with no render.
+
+    Args:
+        cards:
+        renders:
+        card_manifest: If given, each converted card is added to it.
+    """
+    for card, url in cards_with_renders(cards, renders):
+        if card_manifest is not None:
+            card_manifest.add_card(card, url)
+        yield card_to_xml_element(card, url)
+
+
+def indented_bytes(element: ET.Element, level: int) -> bytes:
+    """Serialize one element as it would appear at level in an indented document."""
+    ET.indent(element, space=INDENT, level=level)
+    return ET.tostring(element, encoding="unicode").encode("utf-8")
+
+
+def serialize_card_element(element: ET.Element) -> bytes:
+    """Serialize a <card> element ahead of time for write_cockatrice_xml.
+
+    This lets the serialization run elsewhere, e.g. in a worker process.
+    """
+    return indented_bytes(element, level=2)
+
+
+def newline(level: int) -> bytes:
+    """The whitespace before an element at level in an indented document."""
+    return ("\n" + INDENT * level).encode("utf-8")
+
+
+def write_cockatrice_xml(
+        file: BinaryIO,
+        sets: Iterable[ET.Element],
+        cards: Iterable[ET.Element | bytes],
+) -> None:
+    """Write a card database one element at a time.
+
+    The output is byte-identical to building the whole tree, running ET.indent
+    over it and writing it with an XML declaration, but only one card element
+    is held in memory at a time.
+
+    Args:
+        file: Binary file to write to.
+        sets: <set> elements, e.g. from set_to_xml_element.
+        cards: <card> elements, e.g. from card_xml_elements, or their
+            serialize_card_element bytes.
+    """
+    file.write(XML_DECLARATION)
+    file.write(b'<cockatrice_carddatabase version="4">')
+
+    file.write(newline(1))
+    sets = iter(sets)
+    first_set = next(sets, None)
+    if first_set is None:
+        file.write(b"<sets />")
+    else:
+        file.write(b"<sets>")
+        for sset in itertools.chain((first_set,), sets):
+            file.write(newline(2))
+            file.write(indented_bytes(sset, level=2))
+        file.write(newline(1))
+        file.write(b"</sets>")
+
+    file.write(newline(1))
+    cards = iter(cards)
+    first_card = next(cards, None)
+    if first_card is None:
+        file.write(b"<cards />")
+    else:
+        file.write(b"<cards>")
+        for card in itertools.chain((first_card,), cards):
+            file.write(newline(2))
+            if not isinstance(card, bytes):
+                card = serialize_card_element(card)
+            file.write(card)
+        file.write(newline(1))
+        file.write(b"</cards>")
+
+    file.write(newline(0))
+    file.write(b"</cockatrice_carddatabase>")
+
+
+class _Unchanged(Exception):
+    """Discards an export that turned out to match the last one."""
+
+
+def export_cockatrice_xml(
+        cards: Iterable[core.Card],
+        renders: dict[str, str],  # name -> URL
+        set_filename: str,
+        set_code: str,
+        set_long_name: str,
+        date_string: str,
+        directory: str = CUSTOMSETS_DIRECTORY,
+) -> ManifestDiff:
+    """Export a set to Cockatrice's custom sets directory.
+
+    Cards are written one at a time as they come from the iterable, into a
+    temporary file that replaces the export once it is complete. A manifest
+    of card hashes, built up as the cards are written, is kept next to the
+    export. If no card and none of the set metadata changed since the last
+    export, the temporary file is dropped and the existing export is left
+    untouched.
+
+    Returns what changed since the last export.
+    """
+    path = os.path.join(directory, f"01.{set_filename}")
+    manifest_path = f"{path}.manifest.json"
+    old_manifest = Manifest.read(manifest_path) if os.path.exists(path) else None
+    new_manifest = Manifest(header=manifest.digest([set_code, set_long_name, date_string]))
+
+    try:
+        with tracing.span("cockatrice.write", set=set_code) as span, cachefiles.atomic_write(path, "wb") as file:
+            write_cockatrice_xml(
+                    file,
+                    sets=[set_to_xml_element(set_code, set_long_name, date_string)],
+                    cards=card_xml_elements(cards, renders, card_manifest=new_manifest),
+            )
+            span["cards"] = len(new_manifest.cards)
+            span["bytes"] = file.tell()
+            diff = manifest.diff(old_manifest, new_manifest)
+            if diff.unchanged():
+                raise _Unchanged
+    except _Unchanged:
+        pass
+    else:
+        new_manifest.write(manifest_path)
+    print(diff.report())
+    return diff
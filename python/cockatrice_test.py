@@ -0,0 +1,140 @@
+import io
+import xml.etree.ElementTree as ET
+
+import cockatrice
+import manifest
+from manifest import Manifest
+from testcards import make_card
+
+
+def indented_tree_bytes(sets, cards):
+    root = ET.Element("cockatrice_carddatabase", version="4")
+    sets_element = ET.SubElement(root, "sets")
+    sets_element.extend(sets)
+    cards_element = ET.SubElement(root, "cards")
+    cards_element.extend(cards)
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="  ", level=0)
+    file = io.BytesIO()
+    tree.write(file, encoding="utf-8", xml_declaration=True)
+    return file.getvalue()
+
+
+def streamed_bytes(sets, cards):
+    file = io.BytesIO()
+    cockatrice.write_cockatrice_xml(file, sets=sets, cards=cards)
+    return file.getvalue()
+
+
+def sset():
+    return cockatrice.set_to_xml_element("TST", "Test <&> Set", "2024-01-01")
+
+
+def test_write_cockatrice_xml_matches_indented_tree():
+    cards = [
+            make_card("Foo"),
+            make_card("Bar's!", types=("Instant",), power=None, toughness=None),
+    ]
+    renders = {"Foo.png": "http://a?x=1&y=2", "Bars.png": "u"}
+    for chosen in (cards, cards[:1], []):
+        expected = indented_tree_bytes(
+                [sset()],
+                list(cockatrice.card_xml_elements(chosen, renders)),
+        )
+        actual = streamed_bytes(
+                [sset()],
+                cockatrice.card_xml_elements(chosen, renders),
+        )
+        assert actual == expected
+
+
+def test_write_cockatrice_xml_empty():
+    assert streamed_bytes([], []) == indented_tree_bytes([], [])
+
+
+def export(directory, cards, renders, date_string="2024-01-01"):
+    return cockatrice.export_cockatrice_xml(
+            cards=cards,
+            renders=renders,
+            set_filename="tst.xml",
+            set_code="TST",
+            set_long_name="Test Set",
+            date_string=date_string,
+            directory=str(directory),
+    )
+
+
+def test_export_skips_unchanged_set(tmp_path):
+    cards = [make_card("Foo"), make_card("Bar")]
+    renders = {"Foo.png": "u1", "Bar.png": "u2"}
+    path = tmp_path / "01.tst.xml"
+
+    diff = export(tmp_path, cards, renders)
+    assert (diff.added, diff.header_changed) == (["Bar", "Foo"], True)
+    written = path.read_bytes()
+    assert written == streamed_bytes(
+            [cockatrice.set_to_xml_element("TST", "Test Set", "2024-01-01")],
+            cockatrice.card_xml_elements(cards, renders))
+
+    # An unchanged export must not even rewrite the file.
+    path.write_bytes(b"sentinel")
+    assert export(tmp_path, cards, renders).unchanged()
+    assert path.read_bytes() == b"sentinel"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["01.tst.xml", "01.tst.xml.manifest.json"]
+
+    diff = export(tmp_path, cards, {"Foo.png": "u1", "Bar.png": "u3"})
+    assert (diff.added, diff.changed, diff.removed) == ([], ["Bar"], [])
+    assert path.read_bytes() != b"sentinel"
+
+    assert export(tmp_path, cards, {"Foo.png": "u1", "Bar.png": "u3"}, "2025-01-01").header_changed
+
+
+def test_export_streams_generator(tmp_path, monkeypatch):
+    cards = [make_card("Foo"), make_card("Bar"), make_card("Baz")]
+    renders = {"Foo.png": "u1", "Bar.png": "u2"}
+    events = []
+
+    def generate():
+        for card in cards:
+            events.append(("yield", card.name))
+            yield card
+
+    convert = cockatrice.card_to_xml_element
+
+    def recording_convert(card, url):
+        events.append(("convert", card.name))
+        return convert(card, url)
+
+    monkeypatch.setattr(cockatrice, "card_to_xml_element", recording_convert)
+    diff = export(tmp_path, generate(), renders)
+    # Each card is converted before the next one is asked for.
+    assert events == [("yield", "Foo"), ("convert", "Foo"), ("yield", "Bar"), ("convert", "Bar"), ("yield", "Baz")]
+    assert diff.added == ["Bar", "Foo"]
+    assert (tmp_path / "01.tst.xml").read_bytes() == streamed_bytes(
+            [cockatrice.set_to_xml_element("TST", "Test Set", "2024-01-01")],
+            cockatrice.card_xml_elements(cards, renders))
+
+    assert export(tmp_path, generate(), renders).unchanged()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["01.tst.xml", "01.tst.xml.manifest.json"]
+
+
+def test_export_hashes_each_card_as_it_is_written(tmp_path, monkeypatch):
+    cards = [make_card("Foo"), make_card("Bar")]
+    events = []
+    card_digest = manifest.card_digest
+    convert = cockatrice.card_to_xml_element
+
+    def recording_digest(card, url):
+        events.append(("digest", card.name))
+        return card_digest(card, url)
+
+    def recording_convert(card, url):
+        events.append(("convert", card.name))
+        return convert(card, url)
+
+    monkeypatch.setattr(manifest, "card_digest", recording_digest)
+    monkeypatch.setattr(cockatrice, "card_to_xml_element", recording_convert)
+    export(tmp_path, iter(cards), {"Foo.png": "u1", "Bar.png": "u2"})
+    assert events == [("digest", "Foo"), ("convert", "Foo"), ("digest", "Bar"), ("convert", "Bar")]
+    assert Manifest.read(str(tmp_path / "01.tst.xml.manifest.json")).cards == {
+            "Foo": card_digest(cards[0], "u1"), "Bar": card_digest(cards[1], "u2")}
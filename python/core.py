@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import dataclasses
 import enum
+import functools
 import re
-
-
-re_cost = re.compile(r"(?P<generic>\d*)(?P<colors>[a-zA-Z]*)")
+import sys
+import weakref
+from typing import Iterable
 
 
 @enum.verify(enum.UNIQUE)
@@ -31,7 +32,7 @@ class Rarity(enum.Enum):
         }[self.value]
 
 
-@dataclasses.dataclass(eq=True, frozen=True)
+@dataclasses.dataclass(eq=True, frozen=True, slots=True, weakref_slot=True)
 class Cost:
     W: int
     U: int
@@ -41,52 +42,165 @@ class Cost:
     D: int
     generic: int | None
     colorless: int
+    X: int = 0
+    hybrid: tuple[str, ...] = ()  # e.g. "W/U" or "2/W"
+    phyrexian: tuple[str, ...] = ()  # e.g. "W/P"
 
     def as_str(self) -> str:
+        if self.X or self.colorless or self.D or self.hybrid or self.phyrexian:
+            return self._as_braced_str()
         colors = "".join(getattr(self, symbol) * symbol for symbol in "WUBRG")
         generic = str(self.generic) if self.generic is not None else ""
         return generic + colors
 
+    def _as_braced_str(self) -> str:
+        symbols = ["X"] * self.X
+        if self.generic is not None:
+            symbols.append(str(self.generic))
+        symbols.extend(["C"] * self.colorless)
+        symbols.extend(self.hybrid)
+        symbols.extend(self.phyrexian)
+        for symbol in COLORS:
+            symbols.extend([symbol] * getattr(self, symbol))
+        return "".join(f"{{{symbol}}}" for symbol in symbols if symbol)
+
     def __str__(self) -> str:
         return self.as_str()
 
     @classmethod
     def from_str(cls, s: str) -> Cost:
-        maybe_result = re_cost.fullmatch(s)
-        if maybe_result is None:
-            colored = {"W": 0, "U": 0, "B": 0, "R": 0, "G": 0, "D": 0}
-            return cls(
-                    generic=None,
-                    colorless=0,
-                    **colored,
-            )
-        if (value := maybe_result.group("generic")) != "":
-            generic = int(value)
-        else:
-            generic = None
+        """Parse a mana cost.
 
-        colored: dict[str, int] = {c: 0 for c in COLORS}
-        for char in maybe_result.group("colors"):
-            if char in COLORS:
-                colored[char] = colored.get(char, 0) + 1
+        Accepts plain costs like "2UU" as well as braced symbols, e.g.
+        "{X}{2}{W/U}{C}", including hybrid ("{W/U}", "{2/W}") and phyrexian
+        ("{W/P}") symbols. Results are memoized.
 
-        return cls(
-                generic=generic,
-                **colored,
-                colorless=0,
-        )
+        Raises ValueError if the cost is malformed.
+        """
+        return _parse_cost(s)
+
+    @classmethod
+    def parse_many(cls, strings: Iterable[str]) -> list[Cost]:
+        """Parse many mana costs, parsing each distinct string only once."""
+        parsed: dict[str, Cost] = {}
+        result: list[Cost] = []
+        for s in strings:
+            cost = parsed.get(s)
+            if cost is None:
+                cost = parsed[s] = _parse_cost(s)
+            result.append(cost)
+        return result
 
     def cmc(self) -> int:
         cmc = sum(getattr(self, color) for color in COLORS)
         if self.generic is not None:
             cmc += self.generic
+        cmc += self.colorless
+        for symbol in self.hybrid:
+            first = symbol.split("/")[0]
+            cmc += int(first) if first.isdigit() else 1
+        cmc += len(self.phyrexian)
         return cmc
 
+    def colors(self) -> str:
+        """Colors of this cost, in COLORS order, counting hybrid and phyrexian symbols."""
+        symbols = "".join(self.hybrid) + "".join(self.phyrexian)
+        return "".join(c for c in COLORS if getattr(self, c) > 0 or c in symbols)
+
+    def interned(self) -> Cost:
+        """Get the shared instance equal to this Cost.
+
+        Only a few distinct costs appear in a set, so sharing instances saves
+        memory and lets equality checks short-circuit on identity. The pool
+        only holds weak references, so costs no card uses anymore are freed.
+        """
+        # Keyed by the field values rather than the Cost itself, since a key
+        # is a strong reference and would keep the Cost alive.
+        key = (
+                self.W, self.U, self.B, self.R, self.G, self.D,
+                self.generic, self.colorless, self.X, self.hybrid, self.phyrexian,
+        )
+        return _cost_pool.setdefault(key, self)
+
+
+_cost_pool: weakref.WeakValueDictionary[tuple, Cost] = weakref.WeakValueDictionary()
+
+
+# How each mana symbol, braced or not, adds to a Cost.
+# Values are (field, amount); generic numbers and hybrid and phyrexian symbols
+# are handled separately.
+_COST_SYMBOLS: dict[str, tuple[str, int]] = {
+        "W": ("W", 1),
+        "U": ("U", 1),
+        "B": ("B", 1),
+        "R": ("R", 1),
+        "G": ("G", 1),
+        "D": ("D", 1),
+        "C": ("colorless", 1),
+        "X": ("X", 1),
+}
+re_cost_token = re.compile(r"\{(?P<braced>[^{}]*)\}|(?P<number>\d+)|(?P<symbol>[A-Z])")
+re_hybrid = re.compile(r"(?P<first>[WUBRGD]|\d+)/(?P<second>[WUBRGD])")
+re_phyrexian = re.compile(r"(?P<color>[WUBRGD])/P")
+COST_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=COST_CACHE_SIZE)
+def _parse_cost(s: str) -> Cost:
+    text = s.strip().upper()
+    counts: dict[str, int] = {
+            "W": 0, "U": 0, "B": 0, "R": 0, "G": 0, "D": 0, "colorless": 0, "X": 0,
+    }
+    generic: int | None = None
+    hybrid: list[str] = []
+    phyrexian: list[str] = []
+
+    position = 0
+    while position < len(text):
+        match = re_cost_token.match(text, position)
+        if match is None:
+            raise ValueError(f"Malformed mana cost {s!r}")
+        position = match.end()
+        symbol = match.group("braced")
+        if symbol is None:
+            symbol = match.group("number") or match.group("symbol")
+        if symbol.isdigit():
+            generic = (generic or 0) + int(symbol)
+        elif symbol in _COST_SYMBOLS:
+            field, amount = _COST_SYMBOLS[symbol]
+            counts[field] += amount
+        elif re_hybrid.fullmatch(symbol):
+            hybrid.append(symbol)
+        elif re_phyrexian.fullmatch(symbol):
+            phyrexian.append(symbol)
+        else:
+            raise ValueError(f"Malformed mana cost {s!r}: unknown symbol {symbol!r}")
+
+    return Cost(
+            generic=generic,
+            hybrid=tuple(hybrid),
+            phyrexian=tuple(phyrexian),
+            **counts,
+    ).interned()
+
+
+NAMES_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=NAMES_CACHE_SIZE)
+def intern_names(names: tuple[str, ...]) -> tuple[str, ...]:
+    """Get a shared tuple of interned strings equal to names.
+
+    Type, subtype and class lists repeat across thousands of cards. Only the
+    most recently used NAMES_CACHE_SIZE tuples are kept.
+    """
+    return tuple(sys.intern(name) for name in names)
+
 
 COLORS = ("W", "U", "B", "R", "G", "D")
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Card:
     sset: str
     rarity: Rarity
@@ -102,6 +216,13 @@ class Card:
     flavor: str
     image_url: str | None
 
+    def __post_init__(self):
+        self.types = intern_names(tuple(self.types))
+        self.subtypes = intern_names(tuple(self.subtypes))
+        self.classes = intern_names(tuple(self.classes))
+        self.sset = sys.intern(self.sset)
+        self.cost = self.cost.interned()
+
     def expand_rules(self) -> list[str]:
         rules: list[str] = []
         for rule in self.rules:
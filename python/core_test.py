@@ -0,0 +1,85 @@
+import dataclasses
+import gc
+
+import pytest
+
+import core
+from core import Cost
+from testcards import make_card
+
+
+def test_cost_from_str_plain():
+    cost = Cost.from_str("3UB")
+    assert cost.generic == 3
+    assert (cost.W, cost.U, cost.B, cost.R, cost.G, cost.D) == (0, 1, 1, 0, 0, 0)
+    assert cost.cmc() == 5
+    assert cost.as_str() == "3UB"
+
+
+def test_cost_from_str_empty():
+    cost = Cost.from_str("")
+    assert cost.generic is None
+    assert cost.cmc() == 0
+    assert cost.as_str() == ""
+
+
+def test_cost_from_str_braced():
+    cost = Cost.from_str("{X}{2}{W/U}{2/B}{R/P}{C}G")
+    assert cost.X == 1
+    assert cost.generic == 2
+    assert cost.colorless == 1
+    assert cost.hybrid == ("W/U", "2/B")
+    assert cost.phyrexian == ("R/P",)
+    assert cost.G == 1
+    assert cost.cmc() == 2 + 1 + 1 + 2 + 1 + 1
+    assert cost.colors() == "WUBRG"
+    assert Cost.from_str(cost.as_str()) == cost
+
+
+def test_cost_from_str_braced_matches_plain():
+    assert Cost.from_str("{2}{U}{U}") is Cost.from_str("2UU")
+
+
+@pytest.mark.parametrize("s", ["2Q", "{W/Q}", "U-2", "{2", "{}"])
+def test_cost_from_str_malformed(s):
+    with pytest.raises(ValueError):
+        Cost.from_str(s)
+
+
+def test_cost_parse_many():
+    costs = Cost.parse_many(["1W", "1W", "U"])
+    assert costs[0] is costs[1]
+    assert costs[2] == Cost.from_str("U")
+
+
+def test_cost_interned():
+    cost = Cost(W=1, U=0, B=0, R=0, G=0, D=0, generic=2, colorless=0)
+    same = Cost(W=1, U=0, B=0, R=0, G=0, D=0, generic=2, colorless=0)
+    assert same is not cost
+    assert same.interned() is cost.interned()
+    assert same.interned() == cost and hash(same.interned()) == hash(cost)
+    assert Cost.from_str("2W") is cost.interned()
+
+
+def test_cost_pool_is_weak():
+    size = len(core._cost_pool)
+    cost = Cost(W=0, U=0, B=0, R=0, G=0, D=7, generic=None, colorless=0).interned()
+    assert len(core._cost_pool) == size + 1
+    del cost
+    gc.collect()
+    assert len(core._cost_pool) == size
+
+
+def test_card_interns_names_and_cost():
+    first = make_card("Foo")
+    second = dataclasses.replace(make_card("Bar"), types=tuple(["Crea" + "ture"]))
+    assert second.types == first.types and second.types is first.types
+    assert second.subtypes is first.subtypes
+    assert second.cost is first.cost
+    assert hash(second.types) == hash(("Creature",))
+
+
+@pytest.mark.parametrize("s", ["{X}{W/U}GG", "3D", "{C}{D}{D}U", "{2/W}{W}"])
+def test_cost_as_str_round_trips(s):
+    cost = Cost.from_str(s)
+    assert Cost.from_str(cost.as_str()) == cost
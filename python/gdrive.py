@@ -1,15 +1,23 @@
 from dataclasses import dataclass
+import json
+import os
 
-import os.path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-# If modifying these scopes, delete the file token.json.
-# 'metadata.readonly' allows us to see file names and IDs without accessing file contents
-SCOPES = ['https://www.googleapis.com/auth/drive.metadata.readonly']
+import cachefiles
+import google_session
+import ratelimit
+import tracing
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+MAX_PAGE_SIZE = 1000
+SNAPSHOT_DIRECTORY = os.path.join(
+        os.path.expanduser("~"),
+        ".cache",
+        "magichack",
+        "drive",
+)
 
 
 def download_url(drive_id: str) -> str:
@@ -21,66 +29,238 @@ def download_url(drive_id: str) -> str:
 class File:
     drive_id: str
     name: str
+    md5: str | None = None  # Drive's md5Checksum of the contents
 
 
-def get_drive_service():
-    """Handles authentication and returns the Drive API service object."""
-    creds = None
-    # The file token.json stores the user's access and refresh tokens
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return build('drive', 'v3', credentials=creds)
-
-
-def list_files_in_folder(folder_id: str) -> set[File]:
-    """Lists files in a Google Drive folder.
+@dataclass
+class FolderSnapshot:
+    """A folder's files as of a point in the Drive changes feed."""
+    folder_id: str
+    shared_drive_id: str | None  # Shared drive holding the folder, None for My Drive
+    page_token: str  # Changes after this token are not yet applied.
+    files: dict[str, File]  # drive_id -> File
+
+    @staticmethod
+    def path(directory: str, folder_id: str) -> str:
+        return os.path.join(directory, f"{folder_id}.json")
+
+    @classmethod
+    def load(cls, directory: str, folder_id: str) -> "FolderSnapshot | None":
+        try:
+            with open(cls.path(directory, folder_id), encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        try:
+            files = {
+                    drive_id: File(drive_id=drive_id, name=f["name"], md5=f["md5"])
+                    for drive_id, f in data["files"].items()
+            }
+            shared_drive_id = data["shared_drive_id"]
+        except (KeyError, TypeError):
+            # Snapshot from an older format; crawl again.
+            return None
+        return cls(
+                folder_id=folder_id,
+                shared_drive_id=shared_drive_id,
+                page_token=data["page_token"],
+                files=files,
+        )
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        files = {
+                drive_id: {"name": f.name, "md5": f.md5}
+                for drive_id, f in self.files.items()
+        }
+        data = {"shared_drive_id": self.shared_drive_id, "page_token": self.page_token, "files": files}
+        with cachefiles.atomic_write(self.path(directory, self.folder_id)) as file:
+            json.dump(data, file)
+
+    def as_files(self) -> set[File]:
+        return set(self.files.values())
+
+
+def get_drive_service(session: google_session.Session | None = None):
+    """Returns this thread's Drive API service object.
 
     Args:
-        folder_id: Get files from this folder.
+        session: Google API session to use. Defaults to the shared session.
+    """
+    if session is None:
+        session = google_session.default_session()
+    return session.drive()
+
+
+def shared_drive_of(service, folder_id: str) -> str | None:
+    """Id of the shared drive holding a folder, or None if it's in My Drive."""
+    result = ratelimit.execute(
+        service.files().get(fileId=folder_id, fields="driveId", supportsAllDrives=True),
+        "drive",
+    )
+    return result.get("driveId")
+
+
+def _changes_scope(shared_drive_id: str | None) -> dict[str, str | bool]:
+    """Arguments that scope the changes feed to a folder's drive.
 
-    Returns a set of Files.
+    The feed can't be filtered by folder. For a folder in a shared drive it
+    can at least be limited to that drive; otherwise it covers the user's
+    whole My Drive and apply_changes filters by parent.
     """
-    files: set[File] = set()
-    try:
-        service = get_drive_service()
-        query = f"'{folder_id}' in parents and trashed = false"
-        page_token = None
-
-        while True:
-            # We pass the page_token to this call. On the first loop, it's None.
-            results = service.files().list(
-                q=query,
-                fields="nextPageToken, files(id, name, mimeType)",
-                pageSize=100,  # Grab 100 at a time
-                pageToken=page_token
-            ).execute()
+    if shared_drive_id is None:
+        return {"supportsAllDrives": True}
+    return {"supportsAllDrives": True, "driveId": shared_drive_id}
+
+
+def crawl_folder(service, folder_id: str, shared_drive_id: str | None = None) -> dict[str, File]:
+    """Get all non-folder files in a folder.
+
+    Args:
+        service: Drive API service object.
+        folder_id: Folder to list.
+        shared_drive_id: Shared drive holding the folder, see shared_drive_of.
 
-            for file in results.get("files", []):
-                if file["mimeType"] == "application/vnd.google-apps.folder":
-                    print(f'Skipping folder {file["name"]}.')
-                    continue
-                files.add(File(name=file["name"], drive_id=file["id"]))
+    Returns a dict mapping Drive IDs to Files.
+    """
+    if shared_drive_id is None:
+        scope = {"corpora": "user"}
+    else:
+        scope = {"corpora": "drive", "driveId": shared_drive_id}
+    files: dict[str, File] = {}
+    # Leave folders out in the query so that we don't need mime types back.
+    query = f"'{folder_id}' in parents and trashed = false and mimeType != '{FOLDER_MIME_TYPE}'"
+    page_token = None
 
-            # Check if there is another page of data, and if not, we're done.
-            page_token = results.get("nextPageToken", None)
-            if not page_token:
-                break
+    while True:
+        # We pass the page_token to this call. On the first loop, it's None.
+        results = ratelimit.execute(
+            service.files().list(
+                q=query,
+                fields="nextPageToken, files(id, name, md5Checksum)",
+                pageSize=MAX_PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                **scope,
+            ),
+            "drive",
+        )
+        tracing.count("drive.pages")
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+        for file in results.get("files", []):
+            files[file["id"]] = File(
+                    drive_id=file["id"],
+                    name=file["name"],
+                    md5=file.get("md5Checksum"),
+            )
 
+        # Check if there is another page of data, and if not, we're done.
+        page_token = results.get("nextPageToken", None)
+        if not page_token:
+            break
     return files
 
+
+def apply_changes(service, snapshot: FolderSnapshot) -> None:
+    """Bring a snapshot up to date with the Drive changes feed.
+
+    New and renamed files in the folder are added or updated. Files that were
+    trashed, deleted or moved out of the folder are dropped.
+    """
+    page_token = snapshot.page_token
+    while True:
+        results = ratelimit.execute(
+            service.changes().list(
+                pageToken=page_token,
+                pageSize=MAX_PAGE_SIZE,
+                includeRemoved=True,
+                includeItemsFromAllDrives=True,
+                spaces="drive",
+                **_changes_scope(snapshot.shared_drive_id),
+                fields="nextPageToken, newStartPageToken, "
+                       "changes(fileId, removed, file(name, md5Checksum, parents, trashed, mimeType))",
+            ),
+            "drive",
+        )
+        tracing.count("drive.pages")
+
+        for change in results.get("changes", []):
+            drive_id = change["fileId"]
+            file = change.get("file")
+            if (
+                    change.get("removed")
+                    or file is None
+                    or file.get("trashed")
+                    or file.get("mimeType") == FOLDER_MIME_TYPE
+                    or snapshot.folder_id not in file.get("parents", [])
+            ):
+                snapshot.files.pop(drive_id, None)
+            else:
+                snapshot.files[drive_id] = File(
+                        drive_id=drive_id,
+                        name=file["name"],
+                        md5=file.get("md5Checksum"),
+                )
+
+        # The last page carries the token to start from next time.
+        if "newStartPageToken" in results:
+            snapshot.page_token = results["newStartPageToken"]
+            return
+        page_token = results["nextPageToken"]
+
+
+def list_files_in_folder(
+        folder_id: str,
+        session: google_session.Session | None = None,
+        incremental: bool = True,
+        snapshot_directory: str = SNAPSHOT_DIRECTORY,
+) -> set[File]:
+    """Lists files in a Google Drive folder.
+
+    Args:
+        folder_id: Get files from this folder.
+        session: See get_drive_service.
+        incremental: If True, keep a local snapshot of the folder and on later
+            calls only apply what changed since, using the Drive changes feed.
+            Otherwise list the whole folder.
+        snapshot_directory: Where snapshots are kept.
+
+    Returns a set of Files. Folders are not included.
+
+    Raises HttpError if Drive still fails after ratelimit's retries, rather
+    than returning a partial listing.
+    """
+    with tracing.span("drive.list", folder=folder_id, incremental=incremental) as span:
+        service = get_drive_service(session)
+        if not incremental:
+            files = set(crawl_folder(service, folder_id, shared_drive_of(service, folder_id)).values())
+            span["files"] = len(files)
+            return files
+
+        snapshot = FolderSnapshot.load(snapshot_directory, folder_id)
+        if snapshot is not None:
+            try:
+                apply_changes(service, snapshot)
+            except HttpError as error:
+                # E.g. the page token expired. Start over with a full crawl.
+                print(f"Could not apply changes to snapshot of {folder_id}: {error}")
+                snapshot = None
+        if snapshot is None:
+            # Take the token before crawling so that changes made during the
+            # crawl are replayed next time rather than missed.
+            shared_drive_id = shared_drive_of(service, folder_id)
+            page_token = ratelimit.execute(
+                service.changes().getStartPageToken(**_changes_scope(shared_drive_id)),
+                "drive",
+            )["startPageToken"]
+            snapshot = FolderSnapshot(
+                    folder_id=folder_id,
+                    shared_drive_id=shared_drive_id,
+                    page_token=page_token,
+                    files=crawl_folder(service, folder_id, shared_drive_id),
+            )
+        snapshot.save(snapshot_directory)
+        files = snapshot.as_files()
+        span["files"] = len(files)
+    return files
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import gdrive
+from gdrive import File, FolderSnapshot
+
+
+class Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeDrive:
+    """Drive service holding one folder, with a changes feed."""
+
+    def __init__(self, shared_drive_id=None):
+        self.shared_drive_id = shared_drive_id
+        self.folder = {"1": ("a.png", "m1")}
+        self.changes_feed = []
+        self.calls = []
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def get(self, **kwargs):
+        self.calls.append(("files.get", kwargs))
+        return Request({"driveId": self.shared_drive_id} if self.shared_drive_id else {})
+
+    def list(self, **kwargs):
+        if "q" in kwargs:
+            self.calls.append(("files.list", kwargs))
+            return Request({"files": [
+                    {"id": drive_id, "name": name, "md5Checksum": md5}
+                    for drive_id, (name, md5) in self.folder.items()
+            ]})
+        self.calls.append(("changes.list", kwargs))
+        changes, self.changes_feed = self.changes_feed, []
+        return Request({"changes": changes, "newStartPageToken": str(len(self.calls))})
+
+    def getStartPageToken(self, **kwargs):
+        self.calls.append(("changes.getStartPageToken", kwargs))
+        return Request({"startPageToken": "0"})
+
+
+def test_incremental_listing(tmp_path, monkeypatch):
+    drive = FakeDrive()
+    monkeypatch.setattr(gdrive, "get_drive_service", lambda session=None: drive)
+    assert gdrive.list_files_in_folder("folder", snapshot_directory=str(tmp_path)) == {File("1", "a.png", "m1")}
+    assert [name for name, _ in drive.calls] == ["files.get", "changes.getStartPageToken", "files.list"]
+
+    drive.calls = []
+    drive.changes_feed = [
+            {"fileId": "2", "file": {"name": "b.png", "md5Checksum": "m2", "parents": ["folder"]}},
+            {"fileId": "3", "file": {"name": "c.png", "parents": ["elsewhere"]}},
+            {"fileId": "1", "removed": True},
+    ]
+    assert gdrive.list_files_in_folder("folder", snapshot_directory=str(tmp_path)) == {File("2", "b.png", "m2")}
+    assert [name for name, _ in drive.calls] == ["changes.list"]
+    assert drive.calls[0][1]["pageToken"] == "0"
+    assert "driveId" not in drive.calls[0][1]
+    assert drive.calls[0][1]["supportsAllDrives"] and drive.calls[0][1]["includeItemsFromAllDrives"]
+
+
+def test_shared_drive(tmp_path, monkeypatch):
+    drive = FakeDrive(shared_drive_id="shared")
+    monkeypatch.setattr(gdrive, "get_drive_service", lambda session=None: drive)
+    gdrive.list_files_in_folder("folder", snapshot_directory=str(tmp_path))
+    gdrive.list_files_in_folder("folder", snapshot_directory=str(tmp_path))
+
+    calls = dict(drive.calls)
+    assert calls["changes.getStartPageToken"] == {"supportsAllDrives": True, "driveId": "shared"}
+    assert (calls["files.list"]["corpora"], calls["files.list"]["driveId"]) == ("drive", "shared")
+    assert calls["changes.list"]["driveId"] == "shared"
+    assert FolderSnapshot.load(str(tmp_path), "folder").shared_drive_id == "shared"
+
+
+def test_concurrent_snapshot_saves(tmp_path):
+    def save(n):
+        for _ in range(20):
+            FolderSnapshot("folder", None, str(n), {str(n): File(str(n), f"{n}.png")}).save(str(tmp_path))
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(tmp_path) == ["folder.json"]
+    snapshot = FolderSnapshot.load(str(tmp_path), "folder")
+    assert snapshot.files == {snapshot.page_token: File(snapshot.page_token, f"{snapshot.page_token}.png")}
@@ -0,0 +1,137 @@
+"""Shared Google API credentials and service objects.
+
+Loading token.json, refreshing credentials and building a service from its
+discovery document are all done once per Session instead of once per API
+call. Each thread gets its own service objects because the underlying
+httplib2 transport is not thread safe; within a thread the transport keeps
+its connections to Google open between requests.
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+import tracing
+
+
+# If modifying these scopes, delete the file token.json.
+# 'metadata.readonly' allows us to see file names and IDs without accessing file contents
+SCOPES = [
+        "https://www.googleapis.com/auth/spreadsheets.readonly",
+        "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+
+HTTP_TIMEOUT_SECONDS = 60
+
+
+class TracedHttp(AuthorizedHttp):
+    """AuthorizedHttp that records every request with tracing."""
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        with tracing.span("http", method=method, url=uri.split("?")[0]) as args:
+            response, content = super().request(uri, method, body=body, headers=headers, **kwargs)
+            args["status"] = response.status
+        tracing.count("http.requests")
+        tracing.count("http.bytes_sent", len(body) if body else 0)
+        tracing.count("http.bytes_received", len(content) if content else 0)
+        return response, content
+
+
+class Session:
+    """Credentials plus per-thread, reusable API service objects.
+
+    Args:
+        token_file: Stores the user's access and refresh tokens. Created
+            automatically when the authorization flow completes for the first
+            time.
+        credentials_file: OAuth client secrets used for the authorization flow.
+    """
+
+    def __init__(
+            self,
+            token_file: str = "token.json",
+            credentials_file: str = "credentials.json",
+    ):
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self._creds: Credentials | None = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def credentials(self) -> Credentials:
+        """Load credentials once, running the OAuth flow if needed."""
+        with self._lock:
+            creds = self._creds
+            if creds is not None and creds.valid:
+                return creds
+            with tracing.span("auth"):
+                if creds is None and os.path.exists(self.token_file):
+                    creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
+
+                # If there are no (valid) credentials available, let the user log in.
+                if not creds or not creds.valid:
+                    if creds and creds.expired and creds.refresh_token:
+                        creds.refresh(Request())
+                    else:
+                        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
+                        creds = flow.run_local_server(port=0)
+                    # Save the credentials for the next run
+                    with open(self.token_file, "w") as token:
+                        token.write(creds.to_json())
+            self._creds = creds
+            return creds
+
+    def http(self) -> AuthorizedHttp:
+        """This thread's authorized transport."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = TracedHttp(
+                    self.credentials(),
+                    http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS),
+            )
+            self._local.http = http
+        return http
+
+    def service(self, name: str, version: str):
+        """This thread's service object for an API, built on first use."""
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        key = (name, version)
+        if key not in services:
+            services[key] = build(
+                    name,
+                    version,
+                    http=self.http(),
+                    # Sheets v4 and Drive v3 ship with the library, so the
+                    # discovery document is never fetched or cached.
+                    static_discovery=True,
+                    cache_discovery=False,
+            )
+        return services[key]
+
+    def sheets(self):
+        return self.service("sheets", "v4")
+
+    def drive(self):
+        return self.service("drive", "v3")
+
+
+_default_session: Session | None = None
+_default_session_lock = threading.Lock()
+
+
+def default_session() -> Session:
+    """The process-wide Session used when callers don't pass their own."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = Session()
+        return _default_session
@@ -10,17 +10,24 @@ Please follow the instructions here:
 from __future__ import print_function
 
 
+import bisect
+import collections
+import heapq
 import httplib2
 import logging
 import os
 import pandas
+import re
 import string
+import time
 
 from apiclient import discovery
 from oauth2client import client
 from oauth2client import tools
 from oauth2client.file import Storage
 
+import ratelimit
+
 # If modifying these scopes, delete your previously saved credentials
 # at ~/.credentials/drive-credentials.json
 
@@ -89,10 +96,12 @@ class SheetsClient(object):
                       [r2c1, r2c2] ]
         """
         try:
-            data = (self.service.spreadsheets().values().get(
-                spreadsheetId=spreadsheet_id,
-                range=spreadsheet_range,
-                valueRenderOption=read_type).execute())
+            data = ratelimit.execute(
+                self.service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
+                    range=spreadsheet_range,
+                    valueRenderOption=read_type),
+                'sheets_read')
             return data['values']
         except Exception as exc:
             raise SheetsReadException(exc)
@@ -130,14 +139,50 @@ class SheetsClient(object):
         }
 
         try:
-            self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=spreadsheet_range,
-                valueInputOption=write_type,
-                body=request).execute()
+            ratelimit.execute(
+                self.service.spreadsheets().values().update(
+                    spreadsheetId=spreadsheet_id,
+                    range=spreadsheet_range,
+                    valueInputOption=write_type,
+                    body=request),
+                'sheets_write')
         except Exception as exc:
             raise SheetsWriteException(exc)
 
+    def batch_write(self, spreadsheet_id, data, write_type='RAW'):
+        """Writes several ranges to a spreadsheet in one request.
+
+        Args:
+            spreadsheet_id (str): The Drive file ID
+            data (list[tuple[str, list[list[str]]]]): (range, rows) pairs, as
+                for write_range. They are applied in order.
+            write_type (str): See write_range.
+
+        Returns:
+            Nothing.
+        """
+        body = {
+            'valueInputOption': write_type,
+            'data': [{
+                'majorDimension': 'ROWS',
+                'range': spreadsheet_range,
+                'values': rows,
+            } for spreadsheet_range, rows in data],
+        }
+
+        try:
+            ratelimit.execute(
+                self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body=body),
+                'sheets_write')
+        except Exception as exc:
+            raise SheetsWriteException(exc)
+
+    def write_buffer(self, spreadsheet_id, **kwargs):
+        """Returns a WriteBuffer for a spreadsheet. See WriteBuffer."""
+        return WriteBuffer(self, spreadsheet_id, **kwargs)
+
     def _get_credentials(self):
         """Get user credentials from storage.
 
@@ -227,6 +272,233 @@ def column_letter_to_index(col_letter):
     return column_index - 1
 
 
+RANGE_RE = re.compile(
+    r'^(?:(?P<sheet>.+)!)?(?P<col1>[A-Z]+)(?P<row1>[0-9]+)'
+    r'(?::(?P<col2>[A-Z]+)(?P<row2>[0-9]+))?$')
+
+
+def _unquote_sheet(sheet):
+    """The sheet name in a range, e.g. "'Bob''s cards'" -> "Bob's cards"."""
+    if sheet is not None and len(sheet) > 1 and sheet[0] == sheet[-1] == "'":
+        return sheet[1:-1].replace("''", "'")
+    return sheet
+
+
+def _quote_sheet(sheet):
+    """The inverse of _unquote_sheet, quoting only names that need it."""
+    if re.match(r'^[A-Za-z0-9_]+$', sheet):
+        return sheet
+    return "'{}'".format(sheet.replace("'", "''"))
+
+
+class _Block(object):
+    """A write to a rectangle of cells, with 0-indexed bounds."""
+
+    def __init__(self, sheet, row, column, height, width, rows):
+        self.sheet = sheet
+        self.row = row
+        self.column = column
+        self.height = height
+        self.width = width
+        self.rows = rows
+
+    @classmethod
+    def parse(cls, spreadsheet_range, rows):
+        """Returns a _Block, or None if the range isn't a plain cell range."""
+        match = RANGE_RE.match(spreadsheet_range)
+        if match is None:
+            return None
+        row = int(match.group('row1')) - 1
+        column = column_letter_to_index(match.group('col1'))
+        if match.group('col2') is None:
+            height, width = 1, 1
+        else:
+            height = int(match.group('row2')) - row
+            width = column_letter_to_index(match.group('col2')) - column + 1
+        if height < 1 or width < 1 or len(rows) > height or any(len(r) > width for r in rows):
+            return None
+        return cls(_unquote_sheet(match.group('sheet')), row, column, height,
+                   width, rows)
+
+    def range(self):
+        first = '{}{}'.format(column_index_to_letter(self.column), self.row + 1)
+        last = '{}{}'.format(
+            column_index_to_letter(self.column + self.width - 1),
+            self.row + self.height)
+        cells = first if first == last else '{}:{}'.format(first, last)
+        return cells if self.sheet is None else '{}!{}'.format(
+            _quote_sheet(self.sheet), cells)
+
+    def padded_rows(self):
+        """Rows filled out to the block's full size.
+
+        None cells are skipped by the API, so padding doesn't overwrite
+        anything.
+        """
+        rows = [list(r) + [None] * (self.width - len(r)) for r in self.rows]
+        return rows + [[None] * self.width] * (self.height - len(rows))
+
+
+def _merge_runs(blocks, key, adjacent, merge):
+    """Merge consecutive blocks, in key order, that are adjacent."""
+    merged = []
+    for block in sorted(blocks, key=key):
+        if merged and adjacent(merged[-1], block):
+            merged[-1] = merge(merged[-1], block)
+        else:
+            merged.append(block)
+    return merged
+
+
+def any_overlap(blocks):
+    """Whether any two blocks overlap.
+
+    Sweeps down each sheet's rows. The open blocks at the current row all
+    cross it, so unless two of them overlap their columns are disjoint, and
+    each new block only needs checking against its neighbours by column.
+    """
+    by_sheet = collections.defaultdict(list)
+    for block in blocks:
+        by_sheet[block.sheet].append(block)
+    for sheet_blocks in by_sheet.values():
+        starts, ends = [], []  # Columns of the open blocks, by start.
+        closing = []  # Heap of (end row, start column) of the open blocks.
+        for block in sorted(sheet_blocks, key=lambda b: (b.row, b.column)):
+            while closing and closing[0][0] <= block.row:
+                i = bisect.bisect_left(starts, heapq.heappop(closing)[1])
+                del starts[i], ends[i]
+            i = bisect.bisect_right(starts, block.column)
+            if i > 0 and ends[i - 1] > block.column:
+                return True
+            if i < len(starts) and starts[i] < block.column + block.width:
+                return True
+            starts.insert(i, block.column)
+            ends.insert(i, block.column + block.width)
+            heapq.heappush(closing, (block.row + block.height, block.column))
+    return False
+
+
+def merge_blocks(blocks):
+    """Merge vertically, then horizontally, adjacent blocks."""
+    blocks = _merge_runs(
+        blocks,
+        key=lambda b: (b.sheet or '', b.column, b.width, b.row),
+        adjacent=lambda a, b: (a.sheet == b.sheet and a.column == b.column
+                               and a.width == b.width
+                               and a.row + a.height == b.row),
+        merge=lambda a, b: _Block(a.sheet, a.row, a.column,
+                                  a.height + b.height, a.width,
+                                  a.padded_rows() + b.rows))
+    return _merge_runs(
+        blocks,
+        key=lambda b: (b.sheet or '', b.row, b.height, b.column),
+        adjacent=lambda a, b: (a.sheet == b.sheet and a.row == b.row
+                               and a.height == b.height
+                               and a.column + a.width == b.column),
+        merge=lambda a, b: _Block(a.sheet, a.row, a.column, a.height,
+                                  a.width + b.width,
+                                  [ra + rb for ra, rb in zip(a.padded_rows(),
+                                                             b.padded_rows())]))
+
+
+class WriteBuffer(object):
+    """Collects range writes and sends them as one batchUpdate request.
+
+    Writes to adjacent ranges, e.g. one cell per row down a column, are
+    merged into a single range before sending. The buffer flushes itself
+    once it holds max_cells cells, or on a write more than max_delay seconds
+    after the oldest pending one, and when used as a context manager, on
+    exit:
+
+        with sheet.write_buffer() as buffer:
+            for i, card in enumerate(cards):
+                buffer.write_range('Cards!N{}'.format(i + 2), [[card.cmc]])
+
+    max_delay is a threshold, not a timer: it is checked on each write and
+    by flush_if_due(). A buffer that stops getting writes holds what it has
+    until then, so a caller that may pause between writes should call
+    flush_if_due() periodically.
+
+    Args:
+        client (SheetsClient): Client to send writes with.
+        spreadsheet_id (str): The Drive file ID.
+        write_type (str): See SheetsClient.write_range.
+        max_cells (int): Flush once this many cells are pending.
+        max_delay (float): Flush on the first write, or flush_if_due() call,
+            this many seconds after the oldest pending write.
+    """
+
+    def __init__(self, client, spreadsheet_id, write_type='RAW',
+                 max_cells=10000, max_delay=10.0):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self.write_type = write_type
+        self.max_cells = max_cells
+        self.max_delay = max_delay
+        self.requests_sent = 0
+        self._pending = []  # (range, rows)
+        self._cells = 0
+        self._oldest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Writes made before an error are still valid, so send them.
+        self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def write_range(self, spreadsheet_range, rows):
+        """Queue a write. See SheetsClient.write_range."""
+        if self._oldest is None:
+            self._oldest = time.time()
+        self._pending.append((spreadsheet_range, rows))
+        self._cells += sum(len(r) for r in rows)
+        if self._cells >= self.max_cells:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flush if the oldest pending write is max_delay seconds old.
+
+        Returns whether it flushed.
+        """
+        if self._oldest is None or time.time() - self._oldest < self.max_delay:
+            return False
+        self.flush()
+        return True
+
+    def coalesced(self):
+        """The pending writes as (range, rows), with adjacent ones merged.
+
+        If any writes can't be parsed or overlap, they are left as they are
+        so that later writes still win. So are writes that mix ranges with
+        and without a sheet name: a range without one is on the first sheet,
+        whose name the buffer doesn't know, so overlaps can't be ruled out.
+        """
+        blocks = [_Block.parse(r, rows) for r, rows in self._pending]
+        if any(b is None for b in blocks):
+            return list(self._pending)
+        if len({b.sheet is None for b in blocks}) > 1 or any_overlap(blocks):
+            return list(self._pending)
+        return [(b.range(), b.rows)
+                for b in merge_blocks(blocks)]
+
+    def flush(self):
+        """Send all pending writes in one request."""
+        if not self._pending:
+            return
+        data = self.coalesced()
+        self.client.batch_write(self.spreadsheet_id, data, self.write_type)
+        self.requests_sent += 1
+        self._pending = []
+        self._cells = 0
+        self._oldest = None
+
+
 class SingleSheet(object):
     """A handle to a single Google sheet."""
 
@@ -238,6 +510,14 @@ class SingleSheet(object):
         """See SheetsClient.read_range."""
         return self.client.read_range(self.sheet_id, sheet_range)
 
+    def write_range(self, sheet_range, rows, write_type='RAW'):
+        """See SheetsClient.write_range."""
+        self.client.write_range(self.sheet_id, sheet_range, rows, write_type)
+
+    def write_buffer(self, **kwargs):
+        """See WriteBuffer."""
+        return self.client.write_buffer(self.sheet_id, **kwargs)
+
     def read_range_as_DataFrame(self, sheet_range):
         """Like read_range but returns a Pandas DataFrame.
 
@@ -1,62 +1,160 @@
 import os
 import csv
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 import core
+import google_session
+import ratelimit
+import sheetcache
+import tracing
 from core import Rarity, Cost
 
 
-# If modifying these scopes, delete the file token.json.
-SCOPES = [
-        "https://www.googleapis.com/auth/spreadsheets.readonly",
-        "https://www.googleapis.com/auth/drive.metadata.readonly",
-]
+def get_spreadsheet_version(session: google_session.Session, spreadsheet_id: str) -> str:
+    """Get the Drive version of a spreadsheet.
+
+    The version increases with every change to the spreadsheet, so it is a
+    cheap way to tell whether previously fetched values are still current.
+    """
+    service = session.drive()
+    with tracing.span("sheets.version"):
+        result = ratelimit.execute(
+            service.files().get(fileId=spreadsheet_id, fields="version"),
+            "drive",
+        )
+    return result["version"]
 
 
-def get_gsheet_rows(spreadsheet_id: str, range_name: str) -> list[list[str]] | None:
+def get_gsheet_rows(
+        spreadsheet_id: str,
+        range_name: str,
+        cache: sheetcache.SheetCache | None = None,
+        session: google_session.Session | None = None,
+        version: str | None = None,
+) -> list[list[str]] | None:
     """Fetch Google Sheets data.
 
     Args:
         spreadsheet_id:
         range_name:
+        cache: If given, rows are served from this cache when the spreadsheet
+            has not changed since they were stored. In offline mode the cache
+            is used without contacting Google at all.
+        session: Google API session to use. Defaults to the shared session.
+        version: The spreadsheet's current version, if the caller already
+            has it, e.g. when fetching several ranges of one spreadsheet.
+            Otherwise it is fetched when needed for the cache.
 
     Returns a list of sheet rows. Each row is a list of strings, i.e. contents of
         that row's cells.
     """
-    creds = None
-    # The file token.json stores the user's access and refresh tokens, and is
-    # created automatically when the authorization flow completes for the first time.
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+    if cache is not None and cache.offline:
+        entry = cache.load(spreadsheet_id, range_name)
+        if entry is None:
+            print(f"No cached rows for {range_name} in offline mode.")
+            return None
+        return entry.values
+
+    if session is None:
+        session = google_session.default_session()
 
     try:
+        if cache is not None:
+            if version is None:
+                version = get_spreadsheet_version(session, spreadsheet_id)
+            rows = cache.get(spreadsheet_id, range_name, version)
+            if rows is not None:
+                tracing.count("sheets.cache_hits")
+                return rows
+
         print("fetching...")
-        service = build("sheets", "v4", credentials=creds)
+        service = session.sheets()
 
         # Call the Sheets API
         sheet = service.spreadsheets()
-        result = (
-            sheet.values()
-            .get(spreadsheetId=spreadsheet_id, range=range_name)
-            .execute()
-        )
-        return result.get("values", [])
+        with tracing.span("sheets.get", range=range_name) as span:
+            result = ratelimit.execute(
+                sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name),
+                "sheets_read",
+            )
+            rows = result.get("values", [])
+            span["rows"] = len(rows)
+        if cache is not None:
+            cache.put(spreadsheet_id, range_name, version, rows)
+        return rows
+
+    except HttpError as err:
+        print(f"An API error occurred: {err}")
+        return None
+
+
+def get_gsheet_rows_batch(
+        spreadsheet_id: str,
+        range_names: list[str],
+        cache: sheetcache.SheetCache | None = None,
+        session: google_session.Session | None = None,
+) -> dict[str, list[list[str]]] | None:
+    """Fetch several ranges of a spreadsheet in a single request.
+
+    Args:
+        spreadsheet_id:
+        range_names: Ranges to fetch, e.g. one per tab.
+        cache: See get_gsheet_rows. Only ranges missing from the cache are
+            fetched.
+        session: See get_gsheet_rows.
+
+    Returns a dict mapping each requested range name to its rows, as returned
+        by get_gsheet_rows.
+    """
+    rows_by_range: dict[str, list[list[str]]] = {}
+
+    if cache is not None and cache.offline:
+        for range_name in range_names:
+            entry = cache.load(spreadsheet_id, range_name)
+            if entry is None:
+                print(f"No cached rows for {range_name} in offline mode.")
+                return None
+            rows_by_range[range_name] = entry.values
+        return rows_by_range
+
+    if session is None:
+        session = google_session.default_session()
+
+    try:
+        version = None
+        missing = list(range_names)
+        if cache is not None:
+            version = get_spreadsheet_version(session, spreadsheet_id)
+            missing = []
+            for range_name in range_names:
+                rows = cache.get(spreadsheet_id, range_name, version)
+                if rows is None:
+                    missing.append(range_name)
+                else:
+                    tracing.count("sheets.cache_hits")
+                    rows_by_range[range_name] = rows
+        if not missing:
+            return rows_by_range
+
+        print(f"fetching {len(missing)} ranges...")
+        service = session.sheets()
+
+        sheet = service.spreadsheets()
+        with tracing.span("sheets.batch_get", ranges=len(missing)) as span:
+            result = ratelimit.execute(
+                sheet.values().batchGet(spreadsheetId=spreadsheet_id, ranges=missing),
+                "sheets_read",
+            )
+            span["rows"] = sum(len(r.get("values", [])) for r in result.get("valueRanges", []))
+        # Value ranges come back in request order, but with normalized range
+        # names (e.g. "'White'!A1:M1000"), so match them up by position.
+        for range_name, value_range in zip(missing, result.get("valueRanges", [])):
+            rows = value_range.get("values", [])
+            rows_by_range[range_name] = rows
+            if cache is not None:
+                cache.put(spreadsheet_id, range_name, version, rows)
+        return rows_by_range
 
     except HttpError as err:
         print(f"An API error occurred: {err}")
@@ -77,41 +175,47 @@ def parse_gsheet_rows(
         rows: list[list[str]],
         setcode: str,
 ) -> list[core.Card]:
-    # Format the gsheet rows a bit before creating Cards.
-    column_names = rows[0]
-    formatted: list[dict[str, str | list[str]]] = []
-    for row in rows[1:]:
-        d: dict[str, str] = {}
-        types: list[str] = []
-        for name, val in zip(column_names, row):
-            if name == "Type":
-                if val:
-                    types.append(val)
-            else:
-                d[name] = val
-        d["Type"] = "\n".join(types)
-        formatted.append(d)
-
-    cards: list[core.Card] = []
-    for row in formatted:
-        if row.get("Name", "") == "":
-            continue
-        cards.append(
-                core.Card(
-                    sset=setcode,
-                    rarity=Rarity.from_string(row["Rarity"]),
-                    legendary=True if row["Legendary"] == "TRUE" else False,
-                    types=tuple(row["Type"].split("\n")),
-                    subtypes=tuple(row["Subtypes"].split("\n")),
-                    classes=tuple(row["Classes"].split("\n")),
-                    power=parse_pt(row["P"]),
-                    toughness=parse_pt(row["T"]),
-                    cost=Cost.from_str(row["Cost"]),
-                    rules=tuple(row["Rules"].split("\n")),
-                    name=row["Name"],
-                    flavor=row.get("Flavor", ""),
-                    image_url=row["Image"] if row.get("Image", None) else None,
-                )
-        )
+    with tracing.span("parse", setcode=setcode) as span:
+        # Format the gsheet rows a bit before creating Cards.
+        column_names = rows[0]
+        formatted: list[dict[str, str | list[str]]] = []
+        for row in rows[1:]:
+            d: dict[str, str] = {}
+            types: list[str] = []
+            for name, val in zip(column_names, row):
+                if name == "Type":
+                    if val:
+                        types.append(val)
+                else:
+                    d[name] = val
+            d["Type"] = "\n".join(types)
+            formatted.append(d)
+
+        cards: list[core.Card] = []
+        for row in formatted:
+            if row.get("Name", "") == "":
+                continue
+            try:
+                cost = Cost.from_str(row["Cost"])
+            except ValueError as err:
+                raise ValueError(f"Card {row['Name']!r}: {err}") from err
+            cards.append(
+                    core.Card(
+                        sset=setcode,
+                        rarity=Rarity.from_string(row["Rarity"]),
+                        legendary=True if row["Legendary"] == "TRUE" else False,
+                        types=tuple(row["Type"].split("\n")),
+                        subtypes=tuple(row["Subtypes"].split("\n")),
+                        classes=tuple(row["Classes"].split("\n")),
+                        power=parse_pt(row["P"]),
+                        toughness=parse_pt(row["T"]),
+                        cost=cost,
+                        rules=tuple(row["Rules"].split("\n")),
+                        name=row["Name"],
+                        flavor=row.get("Flavor", ""),
+                        image_url=row["Image"] if row.get("Image", None) else None,
+                    )
+            )
+        span["cards"] = len(cards)
     return cards
 
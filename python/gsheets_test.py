@@ -0,0 +1,142 @@
+import itertools
+import random
+
+import pytest
+
+pytest.importorskip('oauth2client')
+
+import gsheets  # noqa: E402
+from gsheets import _Block, WriteBuffer  # noqa: E402
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.batches = []
+
+    def batch_write(self, spreadsheet_id, data, write_type):
+        self.batches.append(data)
+
+
+def test_block_parse():
+    block = _Block.parse('Cards!B2:C4', [['a', 'b'], ['c']])
+    assert (block.sheet, block.row, block.column, block.height, block.width) == ('Cards', 1, 1, 3, 2)
+    assert block.range() == 'Cards!B2:C4'
+    assert block.padded_rows() == [['a', 'b'], ['c', None], [None, None]]
+
+    block = _Block.parse('A1', [['x']])
+    assert (block.sheet, block.row, block.column, block.height, block.width) == (None, 0, 0, 1, 1)
+    assert block.range() == 'A1'
+
+    assert _Block.parse('Cards!A:A', [['x']]) is None
+    assert _Block.parse('Cards!A1', [['x', 'y']]) is None
+    assert _Block.parse('Cards!B2:A1', []) is None
+
+
+def test_block_parse_quoted_sheet():
+    assert _Block.parse("'Cards'!A1", [['x']]).sheet == 'Cards'
+    block = _Block.parse("'Bob''s cards'!A1", [['x']])
+    assert block.sheet == "Bob's cards"
+    assert block.range() == "'Bob''s cards'!A1"
+    assert _Block.parse('Cards!A1', [['x']]).range() == 'Cards!A1'
+
+
+def test_merge_blocks():
+    column = [_Block.parse('S!N{}'.format(i), [[i]]) for i in (4, 2, 3)]
+    [merged] = gsheets.merge_blocks(column)
+    assert (merged.range(), merged.rows) == ('S!N2:N4', [[2], [3], [4]])
+
+    square = [_Block.parse(r, [[r]]) for r in ('A1', 'B1', 'A2', 'B2')]
+    [merged] = gsheets.merge_blocks(square)
+    assert (merged.range(), merged.rows) == ('A1:B2', [['A1', 'B1'], ['A2', 'B2']])
+
+    apart = [_Block.parse(r, [[r]]) for r in ('A1', 'A3', 'Other!A2')]
+    assert sorted(b.range() for b in gsheets.merge_blocks(apart)) == ['A1', 'A3', 'Other!A2']
+
+
+def overlaps(a, b):
+    return (a.sheet == b.sheet
+            and a.row < b.row + b.height and b.row < a.row + a.height
+            and a.column < b.column + b.width and b.column < a.column + a.width)
+
+
+def test_any_overlap_matches_pairwise():
+    rng = random.Random(0)
+    for _ in range(500):
+        blocks = [
+                _Block(rng.choice(['S', 'T']), rng.randrange(8), rng.randrange(8),
+                       rng.randint(1, 3), rng.randint(1, 3), [])
+                for _ in range(rng.randint(1, 6))]
+        expected = any(overlaps(a, b) for a, b in itertools.combinations(blocks, 2))
+        assert gsheets.any_overlap(blocks) == expected
+
+
+def test_coalesced():
+    buffer = WriteBuffer(FakeClient(), 'id')
+    for i in range(3):
+        buffer.write_range('Cards!N{}'.format(i + 2), [[i]])
+        buffer.write_range("'Cards'!O{}".format(i + 2), [['x']])
+    assert buffer.coalesced() == [('Cards!N2:O4', [[0, 'x'], [1, 'x'], [2, 'x']])]
+
+    # Overlapping or unparseable writes are sent as they are, in order.
+    buffer.write_range('Cards!N3', [['again']])
+    assert buffer.coalesced() == buffer._pending
+    buffer = WriteBuffer(FakeClient(), 'id')
+    buffer.write_range('Cards!A1', [[1]])
+    buffer.write_range('Cards!B:B', [[2]])
+    assert buffer.coalesced() == [('Cards!A1', [[1]]), ('Cards!B:B', [[2]])]
+
+
+def test_coalesced_keeps_order_of_unqualified_and_qualified_ranges():
+    # A1:B2 is on the first sheet, which may well be Sheet1.
+    buffer = WriteBuffer(FakeClient(), 'id')
+    buffer.write_range('Sheet1!A2', [['second']])
+    buffer.write_range('A1:B2', [['a', 'b'], ['c', 'd']])
+    buffer.write_range('Sheet1!A3', [['third']])
+    assert buffer.coalesced() == buffer._pending
+
+    buffer = WriteBuffer(FakeClient(), 'id')
+    buffer.write_range('A2', [[2]])
+    buffer.write_range('A1', [[1]])
+    assert buffer.coalesced() == [('A1:A2', [[1], [2]])]
+
+
+def test_flush_on_cells_and_exit():
+    client = FakeClient()
+    with WriteBuffer(client, 'id', max_cells=4) as buffer:
+        buffer.write_range('A1:C1', [[1, 2, 3]])
+        assert client.batches == []
+        buffer.write_range('A2:C2', [[4]])
+        assert client.batches == [[('A1:C2', [[1, 2, 3], [4]])]]
+        assert len(buffer) == 0
+        buffer.write_range('A3', [[5]])
+    assert client.batches[1:] == [[('A3', [[5]])]]
+    assert buffer.requests_sent == 2
+
+
+@pytest.mark.parametrize('delay, batches', [(9.0, 0), (10.0, 1)])
+def test_flush_on_age(monkeypatch, delay, batches):
+    now = [100.0]
+    monkeypatch.setattr(gsheets.time, 'time', lambda: now[0])
+    client = FakeClient()
+    buffer = WriteBuffer(client, 'id', max_delay=10.0)
+    buffer.write_range('A1', [[1]])
+    now[0] += delay
+    assert len(client.batches) == 0
+    buffer.write_range('A2', [[2]])
+    assert len(client.batches) == batches
+
+
+def test_flush_if_due(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(gsheets.time, 'time', lambda: now[0])
+    client = FakeClient()
+    buffer = WriteBuffer(client, 'id', max_delay=10.0)
+    assert not buffer.flush_if_due()
+    buffer.write_range('A1', [[1]])
+    now[0] += 9.0
+    assert not buffer.flush_if_due()
+    now[0] += 1.0
+    assert buffer.flush_if_due()
+    assert client.batches == [[('A1', [[1]])]]
+    assert not buffer.flush_if_due()
@@ -0,0 +1,111 @@
+"""Content hashes of exported cards, used to tell what changed between exports.
+
+A manifest maps each exported card's name to a hash of everything that
+affects its exported form: the core.Card fields plus its resolved render URL.
+"""
+from __future__ import annotations
+
+import dataclasses
+import enum
+import hashlib
+import json
+from typing import Any
+
+import cachefiles
+import core
+
+
+def canonical(value: Any) -> Any:
+    """Convert a value built from dataclasses, enums and tuples to plain JSON data."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+                field.name: canonical(getattr(value, field.name))
+                for field in dataclasses.fields(value)
+        }
+    if isinstance(value, (tuple, list)):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    return value
+
+
+def digest(value: Any) -> str:
+    """SHA-256 of a value's canonical JSON form."""
+    data = json.dumps(canonical(value), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def card_digest(card: core.Card, render_url: str | None) -> str:
+    return digest({"card": card, "render_url": render_url})
+
+
+@dataclasses.dataclass
+class Manifest:
+    """Card digests of one export, added one card at a time as it is written."""
+
+    header: str = ""
+    cards: dict[str, str] = dataclasses.field(default_factory=dict)  # name -> digest
+
+    def add_card(self, card: core.Card, render_url: str | None) -> None:
+        # Disambiguate cards sharing a name so neither one is lost.
+        key = card.name
+        n = 2
+        while key in self.cards:
+            key = f"{card.name} ({n})"
+            n += 1
+        self.cards[key] = card_digest(card, render_url)
+
+    @classmethod
+    def read(cls, path: str) -> Manifest | None:
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return cls(header=data["header"], cards=data["cards"])
+
+    def write(self, path: str) -> None:
+        with cachefiles.atomic_write(path) as file:
+            json.dump({"header": self.header, "cards": self.cards}, file, indent=1, sort_keys=True)
+
+
+@dataclasses.dataclass
+class ManifestDiff:
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+    header_changed: bool
+
+    def unchanged(self) -> bool:
+        return not (self.added or self.changed or self.removed or self.header_changed)
+
+    def report(self) -> str:
+        if self.unchanged():
+            return "No changes."
+        lines: list[str] = []
+        if self.header_changed:
+            lines.append("Set metadata changed.")
+        for label, names in (("Added", self.added), ("Changed", self.changed), ("Removed", self.removed)):
+            for name in names:
+                lines.append(f"{label}: {name}")
+        return "\n".join(lines)
+
+
+def diff(old: Manifest | None, new: Manifest) -> ManifestDiff:
+    """Compare manifests. A missing old manifest means everything was added."""
+    if old is None:
+        old = Manifest()
+        header_changed = True
+    else:
+        header_changed = old.header != new.header
+    return ManifestDiff(
+            added=sorted(name for name in new.cards if name not in old.cards),
+            changed=sorted(
+                name for name, card_hash in new.cards.items()
+                if name in old.cards and old.cards[name] != card_hash
+            ),
+            removed=sorted(name for name in old.cards if name not in new.cards),
+            header_changed=header_changed,
+    )
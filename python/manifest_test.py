@@ -0,0 +1,46 @@
+import dataclasses
+
+import manifest
+from manifest import Manifest
+from testcards import make_card
+
+
+def make_manifest(header, cards):
+    result = Manifest(header=header)
+    for card, url in cards:
+        result.add_card(card, url)
+    return result
+
+
+def test_diff():
+    foo, bar, baz = make_card("Foo"), make_card("Bar"), make_card("Baz")
+    old = make_manifest("h", [(foo, "u"), (bar, "u")])
+
+    assert manifest.diff(old, make_manifest("h", [(foo, "u"), (bar, "u")])).unchanged()
+
+    new = make_manifest("h", [(dataclasses.replace(foo, flavor="Yo ho"), "u"), (baz, "u")])
+    diff = manifest.diff(old, new)
+    assert (diff.added, diff.changed, diff.removed, diff.header_changed) == (
+            ["Baz"], ["Foo"], ["Bar"], False)
+    assert diff.report() == "Added: Baz\nChanged: Foo\nRemoved: Bar"
+
+    assert manifest.diff(old, make_manifest("h2", [(foo, "u"), (bar, "u")])).report() == "Set metadata changed."
+    assert manifest.diff(old, make_manifest("h", [(foo, "v"), (bar, "u")])).changed == ["Foo"]
+
+
+def test_diff_without_old_manifest():
+    diff = manifest.diff(None, make_manifest("h", [(make_card("Foo"), "u")]))
+    assert (diff.added, diff.header_changed) == (["Foo"], True)
+
+
+def test_duplicate_names_are_kept():
+    cards = make_manifest("h", [(make_card("Foo"), "u"), (make_card("Foo"), "v")]).cards
+    assert list(cards) == ["Foo", "Foo (2)"]
+
+
+def test_read_write(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    assert Manifest.read(path) is None
+    written = make_manifest("h", [(make_card("Foo"), "u")])
+    written.write(path)
+    assert Manifest.read(path) == written
@@ -0,0 +1,141 @@
+"""Bring an existing database up to the current sqlalchemy_models schema.
+
+Older databases lack the indexes, the association tables' primary keys and
+the cards.cmc and cards.color_mask columns, and have NOT NULL power and
+toughness. Tables that need new keys or constraints are rebuilt and their
+rows copied over, duplicate association rows are dropped, cmc and color_mask
+are filled in, and missing indexes are created. Running it again does
+nothing.
+
+Usage:
+    python migrate.py sqlite:///cards.db
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+
+import sqlalchemy as sa
+
+import sqlalchemy_models as models
+
+
+def _copy_without_indexes(table, name):
+    """A copy of table named name, in a MetaData of its own."""
+    metadata = sa.MetaData()
+    # Copy every table so that foreign keys still resolve.
+    copy = None
+    for other in models.Base.metadata.sorted_tables:
+        if other is table:
+            copy = other.to_metadata(metadata, name=name)
+        else:
+            other.to_metadata(metadata)
+    copy.indexes = set()
+    return copy
+
+
+def _rebuild_table(connection, table, distinct=False):
+    """Recreate table from its current definition, keeping its rows.
+
+    Args:
+        connection: Connection in a transaction.
+        table: Table of sqlalchemy_models.
+        distinct: Copy only distinct rows with no NULL columns, e.g. for
+            association tables gaining a primary key.
+    """
+    existing = set(column['name'] for column in sa.inspect(connection).get_columns(table.name))
+    new_table = _copy_without_indexes(table, '{}_new'.format(table.name))
+    new_table.create(connection)
+
+    names = [column.name for column in table.columns if column.name in existing]
+    old_columns = [sa.column(name) for name in names]
+    select = sa.select(*old_columns).select_from(sa.table(table.name))
+    if distinct:
+        select = select.where(*[column.isnot(None) for column in old_columns]).distinct()
+    connection.execute(new_table.insert().from_select(names, select))
+
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(sa.text('DROP TABLE {}'.format(preparer.quote(table.name))))
+    connection.execute(sa.text('ALTER TABLE {} RENAME TO {}'.format(
+            preparer.quote(new_table.name), preparer.quote(table.name))))
+
+
+def _needs_rebuild(inspector, table):
+    columns = {column['name']: column for column in inspector.get_columns(table.name)}
+    if any(column.name not in columns for column in table.columns):
+        return True
+    if any(columns[column.name]['nullable'] != column.nullable
+           for column in table.columns if not column.primary_key):
+        return True
+    primary_key = inspector.get_pk_constraint(table.name)['constrained_columns']
+    return set(primary_key) != set(column.name for column in table.primary_key)
+
+
+def backfill_cost_summary_statement():
+    """Fill in cmc and color_mask where they're missing, in SQL."""
+    cards = models.Card.__table__
+    mana = {color: getattr(cards.c, 'mana_{}'.format(color.lower())) for color in models.COLORS}
+    cmc = sum(sa.func.coalesce(column, 0) for column in mana.values())
+    color_mask = sum(
+            sa.case((sa.func.coalesce(mana[color], 0) > 0, bit), else_=0)
+            for color, bit in models.COLOR_BITS.items())
+    return (cards.update()
+            .where(sa.or_(cards.c.cmc.is_(None), cards.c.color_mask.is_(None)))
+            .values(cmc=cmc, color_mask=color_mask))
+
+
+def _check_foreign_keys(connection):
+    """Raise ValueError if any row references a row that doesn't exist."""
+    problems = connection.exec_driver_sql('PRAGMA foreign_key_check').all()
+    if problems:
+        raise ValueError('Foreign key violations after migrating: {}'.format(
+                ', '.join('{} row {} -> {}'.format(table, rowid, parent)
+                          for table, rowid, parent, _ in problems)))
+
+
+def migrate(engine):
+    """Upgrade the database behind engine to the current schema.
+
+    On SQLite the migration fails with ValueError, changing nothing, if it
+    would leave rows that break a foreign key.
+
+    Returns the names of the tables that were rebuilt.
+    """
+    rebuilt = []
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            # Dropping a table that others reference fails with foreign keys
+            # on. The pragma has no effect inside a transaction, and sticks
+            # to the pooled connection, so it is put back afterwards.
+            foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+        try:
+            with connection.begin():
+                inspector = sa.inspect(connection)
+                existing = set(inspector.get_table_names())
+                for table in models.Base.metadata.sorted_tables:
+                    if table.name not in existing:
+                        table.create(connection)
+                    elif _needs_rebuild(inspector, table):
+                        _rebuild_table(connection, table, distinct=table.name in (
+                                models.cards_and_secondary_types.name,
+                                models.cards_and_sets.name))
+                        rebuilt.append(table.name)
+                connection.execute(backfill_cost_summary_statement())
+                for table in models.Base.metadata.sorted_tables:
+                    for index in table.indexes:
+                        index.create(connection, checkfirst=True)
+                if sqlite:
+                    _check_foreign_keys(connection)
+        finally:
+            if sqlite:
+                connection.exec_driver_sql(
+                        'PRAGMA foreign_keys={}'.format('ON' if foreign_keys else 'OFF'))
+                connection.commit()
+    return rebuilt
+
+
+if __name__ == '__main__':
+    tables = migrate(sa.create_engine(sys.argv[1]))
+    print('Rebuilt tables: {}'.format(', '.join(tables) if tables else 'none'))
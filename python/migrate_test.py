@@ -0,0 +1,80 @@
+import pytest
+import sqlalchemy as sa
+
+import migrate
+import sqlalchemy_models as models
+
+OLD_SCHEMA = [
+        'CREATE TABLE cards (id INTEGER PRIMARY KEY, name VARCHAR(64) NOT NULL, '
+        'primary_type VARCHAR(32) NOT NULL, flavor TEXT, rarity VARCHAR(8), '
+        'mana__ INTEGER, mana_w INTEGER, mana_u INTEGER, mana_b INTEGER, '
+        'mana_r INTEGER, mana_g INTEGER, power INTEGER NOT NULL, toughness INTEGER NOT NULL)',
+        'CREATE TABLE sets (id INTEGER PRIMARY KEY, name VARCHAR(32) UNIQUE)',
+        'CREATE TABLE secondary_types (id INTEGER PRIMARY KEY, name VARCHAR(32) NOT NULL UNIQUE)',
+        'CREATE TABLE rules (id INTEGER PRIMARY KEY, text TEXT NOT NULL, '
+        'card_id INTEGER NOT NULL REFERENCES cards (id))',
+        'CREATE TABLE cards_and_sets (card_id INTEGER REFERENCES cards (id), '
+        'set_id INTEGER REFERENCES sets (id))',
+        'CREATE TABLE cards_and_secondary_types (card_id INTEGER REFERENCES cards (id), '
+        'secondary_type_id INTEGER REFERENCES secondary_types (id))',
+]
+
+
+def test_migrate_old_database():
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO sets VALUES (1, 'TST')")
+        connection.exec_driver_sql(
+                "INSERT INTO cards (id, name, primary_type, mana__, mana_u, power, toughness) "
+                "VALUES (1, 'Foo', 'creature', 2, 1, 1, 1)")
+        connection.exec_driver_sql('INSERT INTO cards_and_sets VALUES (1, 1), (1, 1), (1, NULL)')
+
+    assert migrate.migrate(engine) == ['cards', 'cards_and_secondary_types', 'cards_and_sets']
+    assert migrate.migrate(engine) == []
+
+    with engine.begin() as connection:
+        assert connection.execute(sa.text('SELECT cmc, color_mask FROM cards')).all() == [(3, models.COLOR_BITS['U'])]
+        assert connection.execute(sa.text('SELECT * FROM cards_and_sets')).all() == [(1, 1)]
+        connection.exec_driver_sql("INSERT INTO cards (id, name, primary_type) VALUES (2, 'Bar', 'instant')")
+        indexes = set(index['name'] for index in sa.inspect(connection).get_indexes('cards'))
+    assert {'ix_cards_name', 'ix_cards_primary_type', 'ix_cards_cmc', 'ix_cards_color_mask'} <= indexes
+
+
+def engine_with_foreign_keys():
+    engine = sa.create_engine('sqlite://')
+
+    @sa.event.listens_for(engine, 'connect')
+    def enable_foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+    return engine
+
+
+def foreign_keys_enabled(engine):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+
+
+def test_migrate_restores_foreign_keys():
+    engine = engine_with_foreign_keys()
+    migrate.migrate(engine)
+    assert foreign_keys_enabled(engine) == 1
+
+    engine = sa.create_engine('sqlite://')
+    migrate.migrate(engine)
+    assert foreign_keys_enabled(engine) == 0
+
+
+def test_migrate_fails_on_dangling_references():
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO rules (id, text, card_id) VALUES (1, 'Flying', 7)")
+
+    with pytest.raises(ValueError, match='rules row 1 -> cards'):
+        migrate.migrate(engine)
+    with engine.connect() as connection:
+        assert 'cmc' not in [column['name'] for column in sa.inspect(connection).get_columns('cards')]
@@ -0,0 +1,154 @@
+"""Concurrent fetching of a set's cards and renders.
+
+The Sheets reads and the Drive render listing are independent, so they run
+at the same time on a thread pool. Wall-clock time is then roughly that of
+the slowest request rather than the sum of all of them.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+from typing import Iterable
+
+import core
+import gdrive
+import google_session
+import gsheets_new as gsn
+import sheetcache
+
+
+def tab_range(tab: str) -> str:
+    return f"{tab}!A1:M"
+
+
+def renders_by_name(files: Iterable[gdrive.File]) -> dict[str, str]:
+    """Map render file names to their download URLs."""
+    return {f.name: gdrive.download_url(drive_id=f.drive_id) for f in files}
+
+
+def fetch_rows(
+        spreadsheet_id: str,
+        tabs: Iterable[str],
+        renders_folder_id: str,
+        cache: sheetcache.SheetCache | None = None,
+        session: google_session.Session | None = None,
+) -> tuple[dict[str, list[list[str]]], dict[str, str]]:
+    """Fetch a set's raw sheet rows with one batch request while listing its renders.
+
+    Args:
+        See fetch_set.
+
+    Returns a dict mapping tab names to rows, and a dict mapping render file
+        names to download URLs.
+    """
+    tabs = list(tabs)
+    if session is None:
+        session = google_session.default_session()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        renders_future = executor.submit(
+                gdrive.list_files_in_folder,
+                folder_id=renders_folder_id,
+                session=session,
+        )
+        rows_by_range = gsn.get_gsheet_rows_batch(
+                spreadsheet_id=spreadsheet_id,
+                range_names=[tab_range(tab) for tab in tabs],
+                cache=cache,
+                session=session,
+        )
+        if rows_by_range is None:
+            raise ValueError(f"Could not fetch spreadsheet {spreadsheet_id}.")
+        render_files = renders_future.result()
+
+    rows_by_tab = {tab: rows_by_range[tab_range(tab)] for tab in tabs}
+    return rows_by_tab, renders_by_name(render_files)
+
+
+def parse_rows(rows_by_tab: dict[str, list[list[str]]], setcode: str) -> list[core.Card]:
+    """Parse rows from fetch_rows into cards, in tab order."""
+    cards: list[core.Card] = []
+    for tab, rows in rows_by_tab.items():
+        print(f"Found {len(rows)} rows in sheet {tab}.")
+        cards.extend(gsn.parse_gsheet_rows(rows=rows, setcode=setcode))
+    return cards
+
+
+def fetch_set(
+        spreadsheet_id: str,
+        tabs: Iterable[str],
+        setcode: str,
+        renders_folder_id: str,
+        cache: sheetcache.SheetCache | None = None,
+        session: google_session.Session | None = None,
+        parallel_tabs: bool = False,
+        max_workers: int | None = None,
+) -> tuple[list[core.Card], dict[str, str]]:
+    """Fetch and parse a set's cards while listing its renders.
+
+    Args:
+        spreadsheet_id: The set's design spreadsheet.
+        tabs: Names of the tabs holding cards.
+        setcode: Set code given to each parsed card.
+        renders_folder_id: Drive folder holding the card renders.
+        cache: See gsheets_new.get_gsheet_rows.
+        session: See gsheets_new.get_gsheet_rows.
+        parallel_tabs: If True, fetch each tab with its own request and parse
+            each one as soon as it arrives. Otherwise fetch all tabs with one
+            batch request.
+        max_workers: Thread pool size when parallel_tabs is True. Defaults to
+            one thread per request.
+
+    Returns the cards, in tab order, and a dict mapping render file names to
+        download URLs.
+    """
+    if not parallel_tabs:
+        rows_by_tab, renders = fetch_rows(
+                spreadsheet_id=spreadsheet_id,
+                tabs=tabs,
+                renders_folder_id=renders_folder_id,
+                cache=cache,
+                session=session,
+        )
+        return parse_rows(rows_by_tab, setcode), renders
+
+    tabs = list(tabs)
+    if session is None:
+        session = google_session.default_session()
+    if max_workers is None:
+        max_workers = len(tabs) + 1
+    # One version lookup for the whole spreadsheet rather than one per tab.
+    version = None
+    if cache is not None and not cache.offline:
+        version = gsn.get_spreadsheet_version(session, spreadsheet_id)
+
+    cards_by_tab: dict[str, list[core.Card]] = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        renders_future = executor.submit(
+                gdrive.list_files_in_folder,
+                folder_id=renders_folder_id,
+                session=session,
+        )
+        tab_futures = {
+                executor.submit(
+                    gsn.get_gsheet_rows,
+                    spreadsheet_id=spreadsheet_id,
+                    range_name=tab_range(tab),
+                    cache=cache,
+                    session=session,
+                    version=version,
+                ): tab
+                for tab in tabs
+        }
+        for future in concurrent.futures.as_completed(tab_futures):
+            tab = tab_futures[future]
+            rows = future.result()
+            if rows is None:
+                raise ValueError(f"Could not fetch tab {tab}.")
+            cards_by_tab[tab] = parse_rows({tab: rows}, setcode)
+        render_files = renders_future.result()
+
+    cards: list[core.Card] = []
+    for tab in tabs:
+        cards.extend(cards_by_tab[tab])
+    return cards, renders_by_name(render_files)
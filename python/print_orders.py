@@ -1,30 +1,206 @@
 """Tools for placing print orders.
 
 Usual workflow would be to first get a set of core.Card,
-then copy those into a list of this module's Card,
-then use the xml() function to make an XML file for ordering.
+then copy those into a list of this module's Card (see cards_from_core),
+load the printer's current price list with load_tiers(),
+then use build_orders() to split them into orders
+and write_orders() to make an XML file for each.
+
+The printer prices orders by quantity tier: an order of n slots costs the
+price of the smallest tier holding at least n slots, and no order can be
+larger than the biggest tier. build_orders picks the set of tiers that covers
+every copy for the least total price.
+
+A tier file is a JSON list of tiers, e.g.
+    [{"quantity": 18, "price": 8.0}, {"quantity": 36, "price": 12.0}]
 """
+from __future__ import annotations
+
 import dataclasses
-from typing import Callable
+import json
+import os
+from typing import BinaryIO, Callable, Iterable
 import xml.etree.ElementTree as ET
 
+import cockatrice
 import core
+import gdrive
 
 
 @dataclasses.dataclass(eq=True, frozen=True)
 class Card:
     drive_id: str
     filename: str
+    rarity: core.Rarity | None = None
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class Tier:
+    quantity: int  # Most slots an order at this tier holds
+    price: float  # Price of one order at this tier
+
+
+DEFAULT_COPIES = {
+        core.Rarity.COMMON: 4,
+        core.Rarity.UNCOMMON: 3,
+        core.Rarity.RARE: 1,
+        core.Rarity.MYTHIC: 1,
+}
+
+STOCK = "(S33) Superior Smooth"
+
+
+def load_tiers(path: str) -> tuple[Tier, ...]:
+    """Read the printer's quantity tiers from a JSON file. See the module docstring."""
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    try:
+        tiers = tuple(Tier(quantity=int(t["quantity"]), price=float(t["price"])) for t in data)
+    except (KeyError, TypeError, ValueError) as err:
+        raise ValueError(f"Bad tier file {path}: {err}") from err
+    if not tiers:
+        raise ValueError(f"No tiers in {path}.")
+    return tiers
+
+
+@dataclasses.dataclass
+class Order:
+    tier: Tier
+    fronts: list[tuple[Card, int]]  # (card, copies) in slot order
+
+    def quantity(self) -> int:
+        return sum(copies for _, copies in self.fronts)
+
+
+def cards_from_core(cards: Iterable[core.Card], files: Iterable[gdrive.File]) -> list[Card]:
+    """Match cards to their render files in Drive, skipping cards with no render.
+
+    Args:
+        cards: Cards to print.
+        files: Files in the renders folder, from gdrive.list_files_in_folder.
+    """
+    by_name = {f.name: f for f in files}
+    result = []
+    for card in cards:
+        filename = cockatrice.render_filename(card)
+        file = by_name.get(filename, None)
+        if file is None:
+            print(f"{filename} image file not found.")
+        else:
+            result.append(Card(drive_id=file.drive_id, filename=filename, rarity=card.rarity))
+    return result
+
+
+def copies_by_rarity(
+        rules: dict[core.Rarity, int] = DEFAULT_COPIES,
+        default: int = 1,
+) -> Callable[[Card], int]:
+    """Make a card_to_copies function that prints copies according to rarity.
+
+    Args:
+        rules: Copies of each rarity.
+        default: Copies of cards with no rarity, or a rarity not in rules.
+    """
+    def card_to_copies(card: Card) -> int:
+        return rules.get(card.rarity, default)
+    return card_to_copies
+
+
+def tier_for(quantity: int, tiers: Iterable[Tier]) -> Tier:
+    """The cheapest tier that holds quantity slots."""
+    fitting = [tier for tier in tiers if tier.quantity >= quantity]
+    if not fitting:
+        raise ValueError(f"No tier holds {quantity} slots.")
+    return min(fitting, key=lambda tier: (tier.price, tier.quantity))
+
+
+def plan_tiers(total: int, tiers: Iterable[Tier]) -> list[Tier]:
+    """Choose tiers whose slots add up to at least total, for the least price.
+
+    This is an unbounded knapsack solved bottom-up: the best plan for n slots
+    is some tier plus the best plan for the n - tier.quantity slots left.
+    Ties go to fewer orders.
 
+    Returns the tiers, largest first.
+    """
+    tiers = [tier for tier in tiers if tier.quantity > 0]
+    if not tiers:
+        raise ValueError("Need at least one tier.")
+    # best[n] is (price, order count) of the best plan covering n slots, and
+    # choice[n] the tier it ends with.
+    best: list[tuple[float, int]] = [(0.0, 0)] * (total + 1)
+    choice: list[Tier | None] = [None] * (total + 1)
+    for n in range(1, total + 1):
+        best_n = None
+        for tier in tiers:
+            price, count = best[max(0, n - tier.quantity)]
+            candidate = (price + tier.price, count + 1)
+            if best_n is None or candidate < best_n:
+                best_n = candidate
+                choice[n] = tier
+        best[n] = best_n
 
-def card_to_xml_element(card: core.Card, slot: int, copies: int):
+    plan = []
+    n = total
+    while n > 0:
+        tier = choice[n]
+        plan.append(tier)
+        n -= tier.quantity
+    plan.sort(key=lambda tier: tier.quantity, reverse=True)
+    return plan
+
+
+def build_orders(
+        cards: Iterable[Card],
+        tiers: Iterable[Tier],
+        card_to_copies: Callable[[Card], int] = copies_by_rarity(),
+) -> list[Order]:
+    """Split cards into the cheapest set of orders.
+
+    Cards keep their order. When an order fills up, the rest of a card's
+    copies go into the next order.
+
+    Args:
+        cards: Cards to print.
+        tiers: The printer's current quantity tiers, e.g. from load_tiers.
+        card_to_copies: How many copies of each card to print.
+    """
+    tiers = tuple(tiers)
+    wanted = [(card, card_to_copies(card)) for card in cards]
+    wanted = [(card, copies) for card, copies in wanted if copies > 0]
+    plan = plan_tiers(sum(copies for _, copies in wanted), tiers)
+
+    orders = [Order(tier=tier, fronts=[]) for tier in plan]
+    order_index = 0
+    free = plan[0].quantity if plan else 0
+    for card, copies in wanted:
+        while copies > 0:
+            if free == 0:
+                order_index += 1
+                free = plan[order_index].quantity
+            placed = min(copies, free)
+            orders[order_index].fronts.append((card, placed))
+            copies -= placed
+            free -= placed
+
+    # The last order may not be full, so a smaller tier might do.
+    for order in orders:
+        order.tier = tier_for(order.quantity(), tiers)
+    return orders
+
+
+def total_price(orders: Iterable[Order]) -> float:
+    return sum(order.tier.price for order in orders)
+
+
+def card_to_xml_element(card: Card, slot: int, copies: int):
     root = ET.Element("card")
     idd = ET.SubElement(root, "id")
     idd.text = card.drive_id
     source_type = ET.SubElement(root, "sourceType")
     source_type.text = "Google Drive"
     slots = ET.SubElement(root, "slots")
-    slots.text = ",".join((str(_ + slot) for _ in range(copies)))
+    slots.text = ",".join(map(str, range(slot, slot + copies)))
     name = ET.SubElement(root, "name")
     name.text = card.filename
     query = ET.SubElement(root, "query")
@@ -32,36 +208,85 @@ def card_to_xml_element(card: core.Card, slot: int, copies: int):
     return root
 
 
+def details_xml_element(quantity: int, stock: str = STOCK, foil: bool = False) -> ET.Element:
+    details = ET.Element("details")
+    quantity_element = ET.SubElement(details, "quantity")
+    quantity_element.text = str(quantity)
+    stock_element = ET.SubElement(details, "stock")
+    stock_element.text = stock
+    foil_element = ET.SubElement(details, "foil")
+    foil_element.text = "true" if foil else "false"
+    return details
+
+
+def write_order(
+        file: BinaryIO,
+        fronts: Iterable[tuple[Card, int]],
+        quantity: int,
+        stock: str = STOCK,
+        foil: bool = False,
+) -> None:
+    """Write one order a card at a time.
+
+    The output is the same as building the whole tree and indenting it.
+
+    Args:
+        file: Binary file to write to.
+        fronts: (card, copies) in slot order.
+        quantity: Total copies, for the order details.
+        stock: Card stock.
+        foil: Whether to print foil.
+    """
+    file.write(b"<order>")
+    file.write(cockatrice.newline(1))
+    file.write(cockatrice.indented_bytes(details_xml_element(quantity, stock, foil), level=1))
+    file.write(cockatrice.newline(1))
+    slot = 0
+    empty = True
+    for card, copies in fronts:
+        if empty:
+            file.write(b"<fronts>")
+            empty = False
+        file.write(cockatrice.newline(2))
+        file.write(cockatrice.indented_bytes(card_to_xml_element(card=card, slot=slot, copies=copies), level=2))
+        slot += copies
+    if empty:
+        file.write(b"<fronts />")
+    else:
+        file.write(cockatrice.newline(1))
+        file.write(b"</fronts>")
+    file.write(cockatrice.newline(0))
+    file.write(b"</order>")
+
+
+def write_orders(
+        orders: Iterable[Order],
+        directory: str,
+        prefix: str = "order",
+        stock: str = STOCK,
+        foil: bool = False,
+) -> list[str]:
+    """Write each order to its own numbered XML file.
+
+    Returns the paths written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, order in enumerate(orders, start=1):
+        path = os.path.join(directory, f"{prefix}_{i:02}.xml")
+        with open(path, mode="wb") as file:
+            write_order(file, order.fronts, order.quantity(), stock, foil)
+        print(f"{path}: {order.quantity()} cards, {order.tier.quantity} tier, {order.tier.price:.2f}.")
+        paths.append(path)
+    return paths
+
+
 def xml(
         card_to_copies: Callable[[Card], int],
         cards: list[Card],
         output_filename: str,
 ):
-    quantity_total = sum(card_to_copies(_) for _ in cards)
-    root = ET.Element("order")
-
-    details = ET.SubElement(root, "details")
-    quantity = ET.SubElement(details, "quantity")
-    quantity.text = str(quantity_total)
-    stock = ET.SubElement(details, "stock")
-    stock.text = "(S33) Superior Smooth"
-    foil = ET.SubElement(details, "foil")
-    foil.text = "false"
-
-    fronts = ET.SubElement(root, "fronts")
-    slot = 0
-    for card in cards:
-        copies = card_to_copies(card)
-        fronts.append(
-                card_to_xml_element(
-                    card=card,
-                    slot=slot,
-                    copies=copies,
-                ),
-        )
-        slot += copies
-
-    tree = ET.ElementTree(root)
-    ET.indent(tree, space="  ", level=0)
+    """Write all cards into a single order, however large."""
+    fronts = [(card, card_to_copies(card)) for card in cards]
     with open(output_filename, mode="wb") as file:
-        tree.write(file, encoding="utf-8", xml_declaration=False)
+        write_order(file, fronts, quantity=sum(copies for _, copies in fronts))
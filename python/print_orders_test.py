@@ -0,0 +1,83 @@
+import io
+import itertools
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import print_orders
+from core import Rarity
+from print_orders import Card, Tier
+
+
+def make_cards(n):
+    rarities = itertools.cycle([Rarity.COMMON, Rarity.UNCOMMON, Rarity.RARE, Rarity.MYTHIC])
+    return [Card(drive_id=f"id{i}", filename=f"Card & {i}.png", rarity=next(rarities)) for i in range(n)]
+
+
+def indented_tree_bytes(fronts, quantity):
+    root = ET.Element("order")
+    root.append(print_orders.details_xml_element(quantity))
+    fronts_element = ET.SubElement(root, "fronts")
+    slot = 0
+    for card, copies in fronts:
+        fronts_element.append(print_orders.card_to_xml_element(card, slot, copies))
+        slot += copies
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="  ", level=0)
+    file = io.BytesIO()
+    tree.write(file, encoding="utf-8", xml_declaration=False)
+    return file.getvalue()
+
+
+def test_write_order_matches_indented_tree():
+    for n in (0, 1, 5):
+        fronts = [(card, 2) for card in make_cards(n)]
+        file = io.BytesIO()
+        print_orders.write_order(file, fronts, quantity=2 * n)
+        assert file.getvalue() == indented_tree_bytes(fronts, 2 * n)
+
+
+TIERS = (Tier(10, 5.0), Tier(25, 9.0), Tier(40, 13.0))
+
+
+def brute_force_price(total, tiers):
+    """Cheapest price of any combination of orders covering total slots."""
+    ranges = [range(-(-total // tier.quantity) + 1) for tier in tiers]
+    return min(
+            sum(count * tier.price for count, tier in zip(counts, tiers))
+            for counts in itertools.product(*ranges)
+            if sum(count * tier.quantity for count, tier in zip(counts, tiers)) >= total
+    )
+
+
+def test_plan_tiers_is_cheapest():
+    for total in range(0, 130):
+        plan = print_orders.plan_tiers(total, TIERS)
+        assert sum(tier.quantity for tier in plan) >= total
+        assert sum(tier.price for tier in plan) == brute_force_price(total, TIERS)
+
+
+def test_build_orders_splits_cards_across_orders():
+    cards = make_cards(40)
+    card_to_copies = print_orders.copies_by_rarity()
+    orders = print_orders.build_orders(cards, TIERS, card_to_copies)
+
+    assert all(order.quantity() <= order.tier.quantity for order in orders)
+    placed = {}
+    for order in orders:
+        for card, copies in order.fronts:
+            placed[card] = placed.get(card, 0) + copies
+    assert placed == {card: card_to_copies(card) for card in cards}
+    total = sum(placed.values())
+    assert total == 90
+    assert print_orders.total_price(orders) == brute_force_price(total, TIERS)
+
+
+def test_load_tiers(tmp_path):
+    path = tmp_path / "tiers.json"
+    path.write_text('[{"quantity": 18, "price": 8}, {"quantity": 36, "price": 12.5}]')
+    assert print_orders.load_tiers(str(path)) == (Tier(18, 8.0), Tier(36, 12.5))
+
+    path.write_text('[{"quantity": 18}]')
+    with pytest.raises(ValueError):
+        print_orders.load_tiers(str(path))
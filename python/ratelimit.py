@@ -0,0 +1,225 @@
+"""Keep Google API calls within quota, and retry the ones that hit it anyway.
+
+Every request to an API goes through that API's Limiter: a token bucket
+shared by all threads holds requests back to the quota's rate, and requests
+that still fail with a retryable error (429, 5xx, or 403 rate limit reasons)
+are retried with exponential backoff and full jitter, honouring Retry-After.
+Errors that aren't retryable, or that outlast the retries, are raised.
+
+Sheets reads and writes have separate quotas, so they have separate
+limiters, "sheets_read" and "sheets_write".
+
+Usage:
+    result = ratelimit.execute(service.files().list(...), "drive")
+
+print(ratelimit.report()) shows how often each API was throttled.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import random
+import socket
+import threading
+import time
+from typing import Callable
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import tracing
+
+
+# Google's default per-user quotas. Raise them with configure() if the
+# project has been granted more.
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+DRIVE_REQUESTS_PER_MINUTE = 12_000
+
+RETRYABLE_STATUSES = frozenset((429, 500, 502, 503, 504))
+RETRYABLE_403_REASONS = frozenset(("rateLimitExceeded", "userRateLimitExceeded"))
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, in bursts of up to capacity."""
+
+    def __init__(
+            self,
+            rate: float,
+            capacity: float,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for one if needed. Returns seconds waited."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now, even if that goes negative, so that waiting
+            # threads queue up behind each other instead of all waking at once.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class RetryPolicy:
+    max_attempts: int = 6
+    base_delay: float = 1.0  # Seconds before the first retry, before jitter
+    max_delay: float = 64.0
+
+    def delay(self, attempt: int, rng: random.Random = random) -> float:
+        """Full jitter: a random delay up to the exponential backoff."""
+        return rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+@dataclasses.dataclass
+class Stats:
+    requests: int = 0
+    throttled: int = 0  # Requests held back by the token bucket
+    throttled_seconds: float = 0.0
+    retries: int = 0
+    retry_seconds: float = 0.0
+    failures: int = 0  # Requests that raised in the end
+
+
+def _error_reason(error: HttpError) -> str | None:
+    try:
+        return json.loads(error.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUSES:
+            return True
+        return status == 403 and _error_reason(error) in RETRYABLE_403_REASONS
+    # Dropped connections and timeouts.
+    return isinstance(
+            error, (ConnectionError, TimeoutError, socket.timeout, httplib2.HttpLib2Error))
+
+
+def _retry_after(error: Exception) -> float | None:
+    if not isinstance(error, HttpError):
+        return None
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Limiter:
+    """Rate limit and retry the requests of one API.
+
+    Args:
+        name: API name, for stats and tracing.
+        requests_per_minute: Quota to stay within.
+        burst: Requests allowed at once after a quiet spell.
+        policy: How to retry.
+        clock, sleep: Replace time.monotonic and time.sleep, e.g. in tests.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            requests_per_minute: float,
+            burst: float | None = None,
+            policy: RetryPolicy = RetryPolicy(),
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        rate = requests_per_minute / 60
+        self.bucket = TokenBucket(
+                rate, burst if burst is not None else max(1.0, rate * 10), clock, sleep)
+        self.policy = policy
+        self._sleep = sleep
+        self.stats = Stats()
+        self._lock = threading.Lock()
+
+    def _record(self, **changes: float) -> None:
+        with self._lock:
+            for field, value in changes.items():
+                setattr(self.stats, field, getattr(self.stats, field) + value)
+
+    def execute(self, request):
+        """Run request.execute() within the quota, retrying transient errors."""
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._record(requests=1)
+            if waited > 0:
+                self._record(throttled=1, throttled_seconds=waited)
+                tracing.count(f"ratelimit.{self.name}.throttled")
+            try:
+                return request.execute()
+            except Exception as error:
+                attempt += 1
+                if not is_retryable(error) or attempt >= self.policy.max_attempts:
+                    self._record(failures=1)
+                    raise
+                delay = self.policy.delay(attempt - 1)
+                retry_after = _retry_after(error)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                self._record(retries=1, retry_seconds=delay)
+                tracing.count(f"ratelimit.{self.name}.retries")
+                self._sleep(delay)
+
+
+_limiters = {
+        "sheets_read": Limiter("sheets_read", SHEETS_READS_PER_MINUTE),
+        "sheets_write": Limiter("sheets_write", SHEETS_WRITES_PER_MINUTE),
+        "drive": Limiter("drive", DRIVE_REQUESTS_PER_MINUTE),
+}
+_limiters_lock = threading.Lock()
+
+
+def configure(
+        api: str,
+        requests_per_minute: float,
+        burst: float | None = None,
+        policy: RetryPolicy = RetryPolicy(),
+) -> Limiter:
+    """Replace an API's limiter, e.g. to match a raised quota."""
+    limiter = Limiter(api, requests_per_minute, burst, policy)
+    with _limiters_lock:
+        _limiters[api] = limiter
+    return limiter
+
+
+def limiter(api: str) -> Limiter:
+    with _limiters_lock:
+        return _limiters[api]
+
+
+def execute(request, api: str):
+    """Execute a googleapiclient request through the api's shared Limiter."""
+    return limiter(api).execute(request)
+
+
+def report() -> str:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    lines = []
+    for lim in limiters:
+        s = lim.stats
+        lines.append(
+                f"{lim.name}: {s.requests} requests, {s.throttled} throttled "
+                f"({s.throttled_seconds:.1f} s), {s.retries} retries "
+                f"({s.retry_seconds:.1f} s), {s.failures} failed"
+        )
+    return "\n".join(lines)
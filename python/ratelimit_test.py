@@ -0,0 +1,133 @@
+import json
+import random
+import socket
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import ratelimit
+from ratelimit import Limiter, RetryPolicy, TokenBucket
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, reason=None, retry_after=None):
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    content = json.dumps({"error": {"errors": [{"reason": reason}]}} if reason else {})
+    return HttpError(httplib2.Response(headers), content.encode())
+
+
+class Request:
+    """Raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_token_bucket():
+    time = FakeTime()
+    bucket = TokenBucket(rate=2, capacity=3, clock=time.clock, sleep=time.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == 0.5
+    assert bucket.acquire() == 0.5
+    assert time.sleeps == [0.5, 0.5]
+
+    time.now += 10
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+class Highest:
+    def uniform(self, low, high):
+        return high
+
+
+def test_backoff_has_full_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert [policy.delay(n, rng=Highest()) for n in range(6)] == [1, 2, 4, 8, 10, 10]
+    rng = random.Random(0)
+    delays = [policy.delay(3, rng=rng) for _ in range(100)]
+    assert all(0 <= delay <= 8 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize("error, retryable", [
+        (http_error(429), True),
+        (http_error(500), True),
+        (http_error(503), True),
+        (http_error(403, "rateLimitExceeded"), True),
+        (http_error(403, "userRateLimitExceeded"), True),
+        (http_error(403, "forbidden"), False),
+        (http_error(403), False),
+        (http_error(404), False),
+        (ConnectionResetError(), True),
+        (socket.timeout(), True),
+        (httplib2.ServerNotFoundError(), True),
+        (ValueError(), False),
+])
+def test_is_retryable(error, retryable):
+    assert ratelimit.is_retryable(error) == retryable
+
+
+def make_limiter(time, max_attempts=6):
+    return Limiter(
+            "test", 60, burst=100, policy=RetryPolicy(max_attempts=max_attempts, base_delay=1.0),
+            clock=time.clock, sleep=time.sleep)
+
+
+def test_retries_then_succeeds(monkeypatch):
+    monkeypatch.setattr(ratelimit.random, "uniform", Highest().uniform)
+    time = FakeTime()
+    limiter = make_limiter(time)
+    request = Request(http_error(429), http_error(503), socket.timeout())
+    assert limiter.execute(request) == "ok"
+    assert request.calls == 4
+    assert time.sleeps == [1, 2, 4]
+    assert (limiter.stats.requests, limiter.stats.retries, limiter.stats.failures) == (4, 3, 0)
+
+
+def test_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(ratelimit.random, "uniform", Highest().uniform)
+    time = FakeTime()
+    limiter = make_limiter(time)
+    assert limiter.execute(Request(http_error(429, retry_after="30"), http_error(429, retry_after="0"))) == "ok"
+    assert time.sleeps == [30, 2]
+
+
+def test_gives_up():
+    time = FakeTime()
+    limiter = make_limiter(time, max_attempts=3)
+    request = Request(*[http_error(500)] * 5)
+    with pytest.raises(HttpError):
+        limiter.execute(request)
+    assert request.calls == 3
+
+    request = Request(http_error(404))
+    with pytest.raises(HttpError):
+        limiter.execute(request)
+    assert request.calls == 1
+    assert limiter.stats.failures == 2
+
+
+def test_sheets_reads_and_writes_have_separate_limiters():
+    assert ratelimit.limiter("sheets_read") is not ratelimit.limiter("sheets_write")
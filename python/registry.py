@@ -0,0 +1,68 @@
+"""Declarations of the custom sets we export.
+
+Each set is described by where its cards and renders live in Google Drive
+and how it should appear in Cockatrice. Use runner.py to export them.
+"""
+import dataclasses
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class SetSpec:
+    code: str
+    long_name: str
+    sheet_id: str  # Design spreadsheet
+    renders_id: str  # Drive folder holding the card renders
+    tabs: tuple[str, ...]  # Spreadsheet tabs holding cards
+    filename: str  # Cockatrice custom set file name
+
+
+SETS: dict[str, SetSpec] = {}
+
+
+def register(spec: SetSpec) -> SetSpec:
+    if spec.code in SETS:
+        raise ValueError(f"Set {spec.code} is already registered.")
+    SETS[spec.code] = spec
+    return spec
+
+
+def get(code: str) -> SetSpec:
+    try:
+        return SETS[code.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown set {code!r}. Known sets: {', '.join(SETS)}.")
+
+
+TOKS = register(SetSpec(
+        code="TOKS",
+        long_name="Treasures of Kao Sora",
+        sheet_id="1ovssKGvjC4TDobRoCf4yw-S6V4pa87xtPMdatQ9EQ_g",
+        renders_id="1cpUI9DW2VpxxN4ODszBqEa2Nk2_ts5ZY",
+        tabs=(
+            "White",
+            "Blue",
+            "Black",
+            "Red",
+            "Green",
+            "Treasure",
+            "Colorless",
+            "Land",
+            "Multi",
+        ),
+        filename="toks.xml",
+))
+
+LEY = register(SetSpec(
+        code="LEY",
+        long_name="Limited Edition Yellow",
+        sheet_id="1ST7Z8v6KOgjoNoxoxjRtzvO5mkQ5Mn7gIva8HXCT-m0",
+        renders_id="10ITQ4mo3MpG1Ein_JlXv3JnTxdhqWDnR",
+        tabs=(
+            "Inst/Sorc",
+            "Enchantment",
+            "Creatures",
+            "Artifact",
+            "Land",
+        ),
+        filename="ley.xml",
+))
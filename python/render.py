@@ -0,0 +1,372 @@
+"""Render card images without a browser.
+
+This reproduces the layout of the web/test-canvas prototype: the frame is
+drawn on a 750x1050 canvas, then the title, the type line and the rules
+text, using the same fonts, positions, scaling and shadows as main.js.
+
+Glyphs and fitted rules text layouts are cached, and render_set spreads a
+whole set over a process pool. Each worker loads the fonts and frame once.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import functools
+import hashlib
+import os
+import shutil
+from typing import Iterable
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+import cockatrice
+import core
+import gdrive
+import manifest
+import rendercache
+
+
+ASSETS_DIRECTORY = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        os.pardir,
+        "web",
+        "test-canvas",
+)
+FRAME_PATH = os.path.join(ASSETS_DIRECTORY, "ucard.png")
+TITLE_FONT_PATH = os.path.join(ASSETS_DIRECTORY, "fonts", "GoudyMediaevalRegular.ttf")
+TEXT_FONT_PATH = os.path.join(ASSETS_DIRECTORY, "fonts", "MPlantin.woff2")
+
+CANVAS_WIDTH = 750  # 6.35 cm at 300 px/inch
+CANVAS_HEIGHT = 1050  # 8.89 cm at 300 px/inch
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class TextStyle:
+    font_path: str
+    size: int
+    fill: str
+    x_scale: float = 1.0  # Horizontal stretch, like ctx.scale(x, 1)
+    letter_spacing: int = 1
+    shadow_offset: tuple[int, int] | None = None
+    shadow_blur: float = 1.0
+    shadow_fill: str = "#000000"
+
+
+TITLE_STYLE = TextStyle(TITLE_FONT_PATH, 35, "#FFFFFF", x_scale=1.1, shadow_offset=(2, 2))
+TYPE_STYLE = TextStyle(TEXT_FONT_PATH, 35, "#FFFFFF", x_scale=0.9, shadow_offset=(1, 1))
+RULES_STYLE = TextStyle(TEXT_FONT_PATH, 28, "#000000")
+
+# Baseline positions, in the scaled coordinates used by main.js.
+TITLE_POSITION = (60, 76)
+TYPE_POSITION = (85, 614)
+# left, top, right, bottom. The first baseline sits where main.js draws rules.
+RULES_BOX = (100, 700 - RULES_STYLE.size, CANVAS_WIDTH - 100, 980)
+RULES_MIN_SIZE = 16
+LINE_SPACING = 1.2
+PARAGRAPH_SPACING = 0.4
+# zlib level for the written PNGs. Saving dominates render time, and the
+# default level is several times slower for files only ~15% smaller.
+PNG_COMPRESS_LEVEL = 1
+# Bump this when the drawing code changes, so cached renders are redone.
+RENDERER_VERSION = 1
+
+
+@functools.cache
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+@functools.cache
+def load_frame(path: str = FRAME_PATH) -> Image.Image:
+    # The frame is opaque, so drop alpha for smaller and faster PNGs.
+    return Image.open(path).convert("RGB")
+
+
+@functools.lru_cache(maxsize=8192)
+def glyph(font_path: str, size: int, char: str) -> tuple[Image.Image | None, int, int, float]:
+    """A rendered glyph.
+
+    Returns (mask or None for blank glyphs, x offset, y offset from the
+        baseline, advance width).
+    """
+    font = load_font(font_path, size)
+    advance = font.getlength(char)
+    left, top, right, bottom = font.getbbox(char, anchor="ls")
+    if right <= left or bottom <= top:
+        return None, 0, 0, advance
+    mask = Image.new("L", (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), char, font=font, anchor="ls", fill=255)
+    return mask, left, top, advance
+
+
+def text_width(text: str, font_path: str, size: int, letter_spacing: int) -> float:
+    return sum(glyph(font_path, size, char)[3] + letter_spacing for char in text)
+
+
+def line_mask(text: str, style: TextStyle, size: int | None = None) -> tuple[Image.Image, int]:
+    """Draw one line of text from cached glyphs, before horizontal scaling.
+
+    Returns the mask and the baseline's y position within it.
+    """
+    size = size if size is not None else style.size
+    ascent, descent = load_font(style.font_path, size).getmetrics()
+    width = int(text_width(text, style.font_path, size, style.letter_spacing)) + 2
+    mask = Image.new("L", (max(width, 1), ascent + descent), 0)
+    x = 0.0
+    for char in text:
+        glyph_mask, left, top, advance = glyph(style.font_path, size, char)
+        if glyph_mask is not None:
+            mask.paste(255, (round(x) + left, ascent + top), glyph_mask)
+        x += advance + style.letter_spacing
+    return mask, ascent
+
+
+def draw_line(
+        image: Image.Image,
+        text: str,
+        position: tuple[float, float],
+        style: TextStyle,
+        size: int | None = None,
+) -> None:
+    """Draw text with its baseline starting at position, like ctx.fillText."""
+    mask, baseline = line_mask(text, style, size)
+    if style.x_scale != 1.0:
+        scaled_width = max(1, round(mask.width * style.x_scale))
+        mask = mask.resize((scaled_width, mask.height), Image.Resampling.BICUBIC)
+    x = round(position[0] * style.x_scale)
+    y = round(position[1]) - baseline
+    if style.shadow_offset is not None:
+        shadow = mask.filter(ImageFilter.GaussianBlur(style.shadow_blur / 2)) if style.shadow_blur else mask
+        dx, dy = style.shadow_offset
+        image.paste(style.shadow_fill, (x + dx, y + dy), shadow)
+    image.paste(style.fill, (x, y), mask)
+
+
+@functools.lru_cache(maxsize=4096)
+def fit_paragraphs(
+        paragraphs: tuple[str, ...],
+        style: TextStyle,
+        width: int,
+        height: int,
+) -> tuple[int, tuple[tuple[str, ...], ...]]:
+    """Wrap paragraphs to a width, shrinking the font until they fit the height.
+
+    Returns (font size, wrapped lines per paragraph).
+    """
+    size = style.size
+    while True:
+        wrapped = tuple(
+                wrap(paragraph, style.font_path, size, style.letter_spacing, width)
+                for paragraph in paragraphs
+        )
+        if size <= RULES_MIN_SIZE or paragraphs_height(wrapped, size) <= height:
+            return size, wrapped
+        size -= 1
+
+
+def wrap(text: str, font_path: str, size: int, letter_spacing: int, width: int) -> tuple[str, ...]:
+    lines: list[str] = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and text_width(candidate, font_path, size, letter_spacing) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return tuple(lines)
+
+
+def paragraphs_height(wrapped: tuple[tuple[str, ...], ...], size: int) -> float:
+    line_count = sum(len(lines) for lines in wrapped)
+    return size * (LINE_SPACING * line_count + PARAGRAPH_SPACING * max(len(wrapped) - 1, 0))
+
+
+def type_line(card: core.Card) -> str:
+    types = " ".join(card.types)
+    if card.legendary:
+        types = f"Legendary {types}"
+    subtypes = " ".join(t for t in (*card.subtypes, *card.classes) if t)
+    return f"{types} - {subtypes}" if subtypes else types
+
+
+def render_card(card: core.Card) -> Image.Image:
+    image = load_frame().copy()
+    draw_line(image, card.name, TITLE_POSITION, TITLE_STYLE)
+    draw_line(image, type_line(card), TYPE_POSITION, TYPE_STYLE)
+
+    left, top, right, bottom = RULES_BOX
+    paragraphs = tuple(rule for rule in card.expand_rules() if rule)
+    size, wrapped = fit_paragraphs(paragraphs, RULES_STYLE, right - left, bottom - top)
+    y = top + size
+    for lines in wrapped:
+        for line in lines:
+            draw_line(image, line, (left, y), RULES_STYLE, size)
+            y += size * LINE_SPACING
+        y += size * PARAGRAPH_SPACING
+    return image
+
+
+@functools.cache
+def template_digest() -> str:
+    """Hash of the frame, fonts and layout settings."""
+    files = {}
+    for path in (FRAME_PATH, TITLE_FONT_PATH, TEXT_FONT_PATH):
+        with open(path, "rb") as file:
+            files[os.path.basename(path)] = hashlib.sha256(file.read()).hexdigest()
+    # Use font file names rather than paths so keys don't depend on where the
+    # repository is checked out.
+    styles = [
+            dataclasses.replace(style, font_path=os.path.basename(style.font_path))
+            for style in (TITLE_STYLE, TYPE_STYLE, RULES_STYLE)
+    ]
+    layout = [
+            RENDERER_VERSION,
+            styles,
+            TITLE_POSITION,
+            TYPE_POSITION,
+            RULES_BOX,
+            RULES_MIN_SIZE,
+            LINE_SPACING,
+            PARAGRAPH_SPACING,
+    ]
+    return manifest.digest({"files": files, "layout": layout})
+
+
+def render_key(card: core.Card) -> str:
+    """Hash of everything that goes into a card's render.
+
+    This covers the card's fields, including its art URL, and the template.
+    """
+    return manifest.digest({"card": card, "template": template_digest()})
+
+
+def _copy_cached(cache: rendercache.RenderCache, key: str, path: str) -> bool:
+    """Copy a cached render to path. Returns False if it isn't cached."""
+    cached = cache.get(key)
+    if cached is None:
+        return False
+    shutil.copyfile(cached, path)
+    return True
+
+
+def render_to_file(
+        card: core.Card,
+        directory: str,
+        cache: rendercache.RenderCache | None = None,
+) -> str:
+    """Render a card to a PNG named the way cockatrice looks renders up.
+
+    If cache is given, an unchanged card is copied from it rather than
+    rendered again, and a new render is added to it.
+    """
+    path = os.path.join(directory, cockatrice.render_filename(card))
+    key = render_key(card) if cache is not None else None
+    if cache is not None and _copy_cached(cache, key, path):
+        return path
+    render_card(card).save(path, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    if cache is not None:
+        cache.put(key, path)
+    return path
+
+
+def _warm_up() -> None:
+    """Load fonts and the frame once per worker process."""
+    load_frame()
+    for style in (TITLE_STYLE, TYPE_STYLE, RULES_STYLE):
+        load_font(style.font_path, style.size)
+
+
+def render_set(
+        cards: Iterable[core.Card],
+        directory: str,
+        processes: int | None = None,
+        cache: rendercache.RenderCache | None = None,
+) -> list[str]:
+    """Render cards to PNGs in directory across a process pool.
+
+    Args:
+        cards: Cards to render.
+        directory: Where to write the PNGs.
+        processes: Process pool size. Defaults to the number of CPUs.
+        cache: If given, cards whose render inputs are unchanged are copied
+            from the cache instead of being rendered, and new renders are
+            added to it.
+
+    Returns the paths written, in card order.
+    """
+    cards = list(cards)
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, cockatrice.render_filename(card)) for card in cards]
+
+    keys: list[str] = []
+    to_render: list[int] = []
+    for i, card in enumerate(cards):
+        if cache is not None:
+            keys.append(render_key(card))
+            if _copy_cached(cache, keys[i], paths[i]):
+                continue
+        to_render.append(i)
+
+    if to_render:
+        processes = processes or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_warm_up) as executor:
+            for _ in executor.map(
+                    render_to_file,
+                    [cards[i] for i in to_render],
+                    [directory] * len(to_render),
+                    chunksize=max(1, len(to_render) // (4 * processes)),
+            ):
+                pass
+
+    if cache is not None:
+        for i in to_render:
+            cache.put(keys[i], paths[i], evict=False)
+        cache.evict()
+    print(f"Rendered {len(to_render)} cards, {len(cards) - len(to_render)} from cache.")
+    return paths
+
+
+@dataclasses.dataclass
+class StaleReport:
+    missing: list[str]  # Render file names not in Drive at all
+    stale: list[str]  # In Drive, but different from the render of the current card
+    unknown: list[str]  # Current card was never rendered here, so can't compare
+
+    def report(self) -> str:
+        lines: list[str] = []
+        for label, names in (("Missing", self.missing), ("Stale", self.stale), ("Not rendered", self.unknown)):
+            for name in names:
+                lines.append(f"{label}: {name}")
+        return "\n".join(lines) if lines else "All renders are up to date."
+
+
+def stale_renders(
+        cards: Iterable[core.Card],
+        cache: rendercache.RenderCache,
+        drive_files: Iterable[gdrive.File],
+) -> StaleReport:
+    """Find which renders in Drive don't match the current cards.
+
+    Args:
+        cards: Current cards.
+        cache: Holds the renders of the current cards, e.g. after render_set.
+        drive_files: What's in the renders folder, from
+            gdrive.list_files_in_folder.
+    """
+    drive_md5 = {f.name: f.md5 for f in drive_files}
+    missing: list[str] = []
+    stale: list[str] = []
+    unknown: list[str] = []
+    for card in cards:
+        filename = cockatrice.render_filename(card)
+        local_md5 = cache.md5(render_key(card))
+        if filename not in drive_md5:
+            missing.append(filename)
+        elif local_md5 is None:
+            unknown.append(filename)
+        elif drive_md5[filename] != local_md5:
+            stale.append(filename)
+    return StaleReport(missing=sorted(missing), stale=sorted(stale), unknown=sorted(unknown))
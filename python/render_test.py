@@ -0,0 +1,101 @@
+import dataclasses
+import os
+import shutil
+
+import pytest
+
+import render
+from testcards import make_card
+
+
+LONG_RULE = " ".join(["Whenever a pirate attacks, draw a card and lose one life."] * 4)
+
+
+@pytest.fixture
+def fresh_template_digest():
+    render.template_digest.cache_clear()
+    yield
+    render.template_digest.cache_clear()
+
+
+def test_wrap_fits_width():
+    width = 300
+    lines = render.wrap(LONG_RULE, render.TEXT_FONT_PATH, 28, 1, width)
+    assert len(lines) > 1
+    assert " ".join(lines) == LONG_RULE
+    assert all(render.text_width(line, render.TEXT_FONT_PATH, 28, 1) <= width for line in lines)
+
+
+def test_fit_paragraphs_keeps_size_when_text_fits():
+    size, wrapped = render.fit_paragraphs(("Flying",), render.RULES_STYLE, 550, 300)
+    assert (size, wrapped) == (render.RULES_STYLE.size, (("Flying",),))
+
+
+def test_fit_paragraphs_shrinks_long_text():
+    paragraphs = (LONG_RULE, LONG_RULE)
+    height = 280
+    size, wrapped = render.fit_paragraphs(paragraphs, render.RULES_STYLE, 550, height)
+    assert render.RULES_MIN_SIZE < size < render.RULES_STYLE.size
+    assert render.paragraphs_height(wrapped, size) <= height
+    assert wrapped == tuple(render.wrap(p, render.TEXT_FONT_PATH, size, 1, 550) for p in paragraphs)
+    # One size up would not have fit.
+    bigger = tuple(render.wrap(p, render.TEXT_FONT_PATH, size + 1, 1, 550) for p in paragraphs)
+    assert render.paragraphs_height(bigger, size + 1) > height
+
+    # Text that can't fit stops shrinking at the minimum size.
+    assert render.fit_paragraphs(paragraphs * 10, render.RULES_STYLE, 550, height)[0] == render.RULES_MIN_SIZE
+
+
+def test_type_line():
+    assert render.type_line(make_card("Foo")) == "Creature - Pirate"
+    card = dataclasses.replace(
+            make_card("Foo"), legendary=True, types=("Artifact", "Creature"), classes=("Knight",))
+    assert render.type_line(card) == "Legendary Artifact Creature - Pirate Knight"
+    card = dataclasses.replace(make_card("Foo"), types=("Instant",), subtypes=("",))
+    assert render.type_line(card) == "Instant"
+
+
+def test_render_card_size():
+    image = render.render_card(dataclasses.replace(make_card("Foo"), rules=(LONG_RULE,) * 3))
+    assert image.size == (render.CANVAS_WIDTH, render.CANVAS_HEIGHT) == (750, 1050)
+
+
+def test_render_to_file(tmp_path):
+    path = render.render_to_file(make_card("Bar's!"), str(tmp_path))
+    assert path == str(tmp_path / "Bars.png")
+    with render.Image.open(path) as image:
+        assert (image.format, image.size) == ("PNG", (750, 1050))
+
+
+def test_render_key_follows_template(tmp_path, monkeypatch, fresh_template_digest):
+    card = make_card("Foo")
+    key = render.render_key(card)
+    assert render.render_key(dataclasses.replace(card, flavor="Yo ho")) != key
+
+    monkeypatch.setattr(render, "RULES_MIN_SIZE", render.RULES_MIN_SIZE + 1)
+    render.template_digest.cache_clear()
+    layout_key = render.render_key(card)
+    assert layout_key != key
+
+    frame = tmp_path / "frame.png"
+    shutil.copyfile(render.FRAME_PATH, frame)
+    with open(frame, "ab") as file:
+        file.write(b"\0")
+    monkeypatch.setattr(render, "FRAME_PATH", str(frame))
+    render.template_digest.cache_clear()
+    assert render.render_key(card) not in (key, layout_key)
+
+
+def test_template_digest_ignores_checkout_location(tmp_path, monkeypatch, fresh_template_digest):
+    digest = render.template_digest()
+    for name in ("FRAME_PATH", "TITLE_FONT_PATH", "TEXT_FONT_PATH"):
+        path = getattr(render, name)
+        copy = tmp_path / os.path.basename(path)
+        shutil.copyfile(path, copy)
+        monkeypatch.setattr(render, name, str(copy))
+    for name in ("TITLE_STYLE", "TYPE_STYLE", "RULES_STYLE"):
+        style = getattr(render, name)
+        monkeypatch.setattr(render, name, dataclasses.replace(
+                style, font_path=str(tmp_path / os.path.basename(style.font_path))))
+    render.template_digest.cache_clear()
+    assert render.template_digest() == digest
@@ -0,0 +1,74 @@
+"""Content-addressed, size-bounded store of rendered card images.
+
+Images are stored under a key that hashes everything that goes into the
+render (see render.render_key), so an unchanged card finds its image and
+doesn't need to be rendered again.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+
+import cachefiles
+
+
+DEFAULT_DIRECTORY = os.path.join(
+        os.path.expanduser("~"),
+        ".cache",
+        "magichack",
+        "renders",
+)
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class RenderCache:
+    """Least-recently-used cache of PNGs keyed by content hash.
+
+    Args:
+        directory: Where images are stored.
+        max_bytes: Total size of stored images. The least recently used
+            images are evicted when a write pushes the cache over this size.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        # Fan out over subdirectories so no single directory gets huge.
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key: str) -> str | None:
+        """Path of the cached image, or None if it isn't cached."""
+        path = self.path(key)
+        return path if cachefiles.touch(path) else None
+
+    def put(self, key: str, source_path: str, evict: bool = True) -> str:
+        """Store a copy of an image file. Returns the cached path.
+
+        When storing many images, pass evict=False and call evict() once at
+        the end rather than scanning the cache after every image.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(source_path, "rb") as source, cachefiles.atomic_write(path, "wb") as file:
+            shutil.copyfileobj(source, file)
+        if evict:
+            self.evict()
+        return path
+
+    def md5(self, key: str) -> str | None:
+        """MD5 of the cached image, comparable to Drive's md5Checksum."""
+        path = self.get(key)
+        if path is None:
+            return None
+        with open(path, "rb") as file:
+            return hashlib.md5(file.read()).hexdigest()
+
+    def evict(self) -> None:
+        """Remove least recently used images until the cache fits in max_bytes."""
+        with self._lock:
+            cachefiles.evict_lru(self.directory, self.max_bytes, ".png")
@@ -0,0 +1,97 @@
+import dataclasses
+import os
+
+import pytest
+
+import cachefiles
+import render
+from gdrive import File
+from rendercache import RenderCache
+from testcards import make_card
+
+
+def no_rendering(card):
+    raise AssertionError(f"{card.name} was rendered again")
+
+
+def test_render_set_hits_cache(tmp_path, monkeypatch):
+    cache = RenderCache(directory=str(tmp_path / "cache"))
+    cards = [make_card("Foo"), make_card("Bar")]
+    first = render.render_set(cards, str(tmp_path / "one"), processes=1, cache=cache)
+    assert all(cache.get(render.render_key(card)) for card in cards)
+
+    monkeypatch.setattr(render, "render_card", no_rendering)
+    second = render.render_set(cards, str(tmp_path / "two"), processes=1, cache=cache)
+    for one, two in zip(first, second):
+        with open(one, "rb") as a, open(two, "rb") as b:
+            assert a.read() == b.read()
+
+
+def test_render_to_file_uses_cache(tmp_path, monkeypatch):
+    cache = RenderCache(directory=str(tmp_path / "cache"))
+    card = make_card("Foo")
+    path = render.render_to_file(card, str(tmp_path), cache=cache)
+    assert cache.md5(render.render_key(card)) is not None
+
+    os.remove(path)
+    monkeypatch.setattr(render, "render_card", no_rendering)
+    assert render.render_to_file(card, str(tmp_path), cache=cache) == path
+    assert os.path.exists(path)
+    with pytest.raises(AssertionError):
+        render.render_to_file(dataclasses.replace(card, flavor="New"), str(tmp_path), cache=cache)
+
+
+def test_render_key_follows_inputs():
+    card = make_card("Foo")
+    assert render.render_key(card) == render.render_key(make_card("Foo"))
+    assert render.render_key(card) != render.render_key(dataclasses.replace(card, image_url="art.png"))
+    assert render.render_key(card) != render.render_key(dataclasses.replace(card, rules=("Flying",)))
+
+
+def test_stale_renders(tmp_path):
+    cache = RenderCache(directory=str(tmp_path / "cache"))
+    current, changed, unrendered, missing = (make_card(name) for name in ("Foo", "Bar", "Baz", "Qux"))
+    for card in (current, changed, missing):
+        source = tmp_path / f"{card.name}.png"
+        source.write_bytes(card.name.encode())
+        cache.put(render.render_key(card), str(source))
+
+    report = render.stale_renders(
+            [current, changed, unrendered, missing],
+            cache,
+            [
+                File("1", "Foo.png", cache.md5(render.render_key(current))),
+                File("2", "Bar.png", "old"),
+                File("3", "Baz.png", "whatever"),
+            ],
+    )
+    assert (report.missing, report.stale, report.unknown) == (["Qux.png"], ["Bar.png"], ["Baz.png"])
+    assert report.report() == "Missing: Qux.png\nStale: Bar.png\nNot rendered: Baz.png"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(directory=str(tmp_path / "cache"), max_bytes=250)
+    source = tmp_path / "image.png"
+    source.write_bytes(b"x" * 100)
+    for key in ("aa1", "bb2"):
+        cache.put(key, str(source))
+    os.utime(cache.path("aa1"), (1, 1))
+    os.utime(cache.path("bb2"), (2, 2))
+    assert cache.get("aa1") is not None
+
+    cache.put("cc3", str(source))
+    assert cache.get("aa1") is not None
+    assert cache.get("bb2") is None
+    assert cache.get("cc3") is not None
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "file.json"
+    with cachefiles.atomic_write(str(path)) as file:
+        file.write("old")
+    with pytest.raises(RuntimeError):
+        with cachefiles.atomic_write(str(path)) as file:
+            file.write("new")
+            raise RuntimeError
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["file.json"]
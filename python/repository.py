@@ -0,0 +1,206 @@
+"""Reading cards from the sqlalchemy_models database without N+1 queries.
+
+Every query loads the cards' subclass columns (power and toughness) with the
+cards themselves. It also loads their rules, secondary types and sets with
+one extra SELECT ... IN query per relationship for the whole page, instead
+of one lazy query per card and relationship. A page of cards therefore takes
+four queries however many cards it holds.
+
+Results are paged by card id ("keyset" pagination): pass the last id of a
+page as after_id to get the next one. Unlike OFFSET, this stays an index
+range scan however deep the page.
+
+The *_statement functions only build the SELECT, so they can be run on
+either a Session or an AsyncSession (see asyncdb.py).
+"""
+from __future__ import absolute_import
+
+import dataclasses
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+import core
+import sqlalchemy_models as models
+
+
+DEFAULT_PAGE_SIZE = 100
+# Ids per query in get_many, to stay under database parameter limits.
+GET_MANY_CHUNK_SIZE = 500
+
+# Loads the subclass columns along with the base Card columns.
+CARDS = orm.with_polymorphic(models.Card, '*')
+
+EAGER_OPTIONS = (
+        orm.selectinload(CARDS.rules),
+        orm.selectinload(CARDS.secondary_types),
+        orm.selectinload(CARDS.sets),
+)
+
+RARITIES = {rarity.long_name(): rarity for rarity in core.Rarity}
+
+
+@dataclasses.dataclass
+class Page:
+    items: list
+    next_after_id: int | None  # Pass as after_id for the next page; None on the last page
+
+
+def _paged(statement, after_id, limit):
+    statement = statement.options(*EAGER_OPTIONS).order_by(CARDS.id)
+    if after_id is not None:
+        statement = statement.where(CARDS.id > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def cards_in_set_statement(set_name, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    statement = (sa.select(CARDS)
+                 .join(models.cards_and_sets, models.cards_and_sets.c.card_id == CARDS.id)
+                 .join(models.Set, models.Set.id == models.cards_and_sets.c.set_id)
+                 .where(models.Set.name == set_name))
+    return _paged(statement, after_id, limit)
+
+
+def search_statement(
+        name_prefix=None,
+        primary_type=None,
+        colors=None,
+        cmc=None,
+        min_cmc=None,
+        max_cmc=None,
+        rarity=None,
+        set_name=None,
+        after_id=None,
+        limit=DEFAULT_PAGE_SIZE):
+    """Cards matching all the given filters.
+
+    Args:
+        name_prefix: Names starting with this, case sensitive.
+        primary_type: E.g. 'creature'.
+        colors: Cards with a mana symbol of each of these colors, e.g. 'WU'.
+        cmc, min_cmc, max_cmc: Exact cmc, or a range.
+        rarity: E.g. 'mythic'.
+        set_name: Cards in this set.
+        after_id, limit: See the module docstring.
+    """
+    statement = sa.select(CARDS)
+    if name_prefix:
+        # A range rather than LIKE so that the name index is used.
+        statement = statement.where(CARDS.name >= name_prefix, CARDS.name < name_prefix + u'￿')
+    if primary_type is not None:
+        statement = statement.where(CARDS.primary_type == primary_type)
+    for color in colors or ():
+        statement = statement.where(CARDS.color_mask.in_(models.masks_with_color(color)))
+    if cmc is not None:
+        statement = statement.where(CARDS.cmc == cmc)
+    if min_cmc is not None:
+        statement = statement.where(CARDS.cmc >= min_cmc)
+    if max_cmc is not None:
+        statement = statement.where(CARDS.cmc <= max_cmc)
+    if rarity is not None:
+        statement = statement.where(CARDS.rarity == rarity)
+    if set_name is not None:
+        statement = statement.where(CARDS.sets.any(models.Set.name == set_name))
+    return _paged(statement, after_id, limit)
+
+
+def get_many_statement(ids):
+    return sa.select(CARDS).where(CARDS.id.in_(ids)).options(*EAGER_OPTIONS)
+
+
+def page_of(cards, limit):
+    """Wrap query results in a Page."""
+    next_after_id = cards[-1].id if limit is not None and len(cards) == limit else None
+    return Page(items=cards, next_after_id=next_after_id)
+
+
+def in_id_order(cards, ids):
+    """Order cards like ids, leaving out ids that weren't found."""
+    by_id = {card.id: card for card in cards}
+    return [by_id[card_id] for card_id in ids if card_id in by_id]
+
+
+def _cost(card):
+    if card.mana_cost is not None:
+        return core.Cost.from_str(card.mana_cost)
+    # Stored before mana_cost existed: only the plain mana columns.
+    return core.Cost(
+            W=card.mana_w or 0,
+            U=card.mana_u or 0,
+            B=card.mana_b or 0,
+            R=card.mana_r or 0,
+            G=card.mana_g or 0,
+            D=0,
+            generic=card.mana__,
+            colorless=0,
+    )
+
+
+def _names(text, default):
+    return tuple(text.split('\n')) if text is not None else default
+
+
+def to_core(card):
+    """Convert a models.Card with its relationships loaded to core.Card.
+
+    Cards stored by bulkload come back equal to the core.Card that was
+    stored, except that non-numeric power and toughness are lost, subtypes
+    are not kept in order or repeated, and empty rules are dropped. Cards
+    stored before the full cost and type columns existed come back with what
+    the mana columns and primary_type hold.
+    """
+    return core.Card(
+            sset=card.sets[0].name if card.sets else '',
+            rarity=RARITIES[card.rarity] if card.rarity else core.Rarity.COMMON,
+            legendary=bool(card.legendary),
+            types=_names(card.types, (card.primary_type.capitalize(),)),
+            subtypes=tuple(t.name for t in card.secondary_types) or ('',),
+            classes=_names(card.classes, ('',)),
+            power=getattr(card, 'power', None),
+            toughness=getattr(card, 'toughness', None),
+            cost=_cost(card),
+            rules=tuple(rule.text for rule in card.rules),
+            name=card.name,
+            flavor=card.flavor or '',
+            image_url=card.image_url,
+    )
+
+
+class CardRepository(object):
+    """Card queries on a Session.
+
+    Args:
+        session: SQLAlchemy Session.
+        as_core: If True, return core.Card instead of ORM objects.
+    """
+
+    def __init__(self, session, as_core=False):
+        self.session = session
+        self.as_core = as_core
+
+    def _convert(self, cards):
+        return [to_core(card) for card in cards] if self.as_core else cards
+
+    def _page(self, statement, limit):
+        page = page_of(self.session.scalars(statement).all(), limit)
+        page.items = self._convert(page.items)
+        return page
+
+    def cards_in_set(self, set_name, after_id=None, limit=DEFAULT_PAGE_SIZE):
+        """A page of the cards in a set, by id."""
+        return self._page(cards_in_set_statement(set_name, after_id, limit), limit)
+
+    def search(self, after_id=None, limit=DEFAULT_PAGE_SIZE, **filters):
+        """A page of cards matching filters. See search_statement."""
+        return self._page(search_statement(after_id=after_id, limit=limit, **filters), limit)
+
+    def get_many(self, ids):
+        """Cards with the given ids, in that order. Missing ids are left out."""
+        ids = list(ids)
+        cards = []
+        for start in range(0, len(ids), GET_MANY_CHUNK_SIZE):
+            chunk = ids[start:start + GET_MANY_CHUNK_SIZE]
+            cards.extend(self.session.scalars(get_many_statement(chunk)).all())
+        return self._convert(in_id_order(cards, ids))
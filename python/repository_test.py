@@ -0,0 +1,76 @@
+import dataclasses
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+import bulkload
+import repository
+import sqlalchemy_models as models
+from core import Cost
+from testcards import make_card
+
+
+def make_engine(n):
+    engine = sa.create_engine('sqlite://')
+    models.Base.metadata.create_all(engine)
+    cards = [make_card('Card {}'.format(i)) for i in range(n)]
+    cards[1] = dataclasses.replace(cards[1], types=('Instant',), power=None, toughness=None, cost=Cost.from_str('2W'))
+    bulkload.load_cards(engine, cards)
+    return engine
+
+
+def test_pages_load_in_four_queries():
+    engine = make_engine(25)
+    statements = []
+    sa.event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    with Session(engine) as session:
+        repo = repository.CardRepository(session)
+        page = repo.cards_in_set('TST', limit=10)
+        for card in page.items:
+            card.rules, card.secondary_types, card.sets, getattr(card, 'power', None)
+        assert len(statements) == 4
+        assert [card.id for card in page.items] == list(range(1, 11))
+
+        ids = []
+        after_id = None
+        while True:
+            page = repo.cards_in_set('TST', after_id=after_id, limit=10)
+            ids.extend(card.id for card in page.items)
+            after_id = page.next_after_id
+            if after_id is None:
+                break
+        assert ids == list(range(1, 26))
+
+
+def test_search_and_get_many():
+    engine = make_engine(5)
+    with Session(engine) as session:
+        repo = repository.CardRepository(session, as_core=True)
+        found = repo.search(colors='W').items
+        assert [card.name for card in found] == ['Card 1']
+        assert found[0].cost == Cost.from_str('2W')
+        assert [card.name for card in repo.search(primary_type='creature', colors='UR', cmc=4).items] == [
+                'Card 0', 'Card 2', 'Card 3', 'Card 4']
+
+        cards = repo.get_many([3, 99, 1])
+        assert [card.name for card in cards] == ['Card 2', 'Card 0']
+        assert cards[1].power == 2
+        assert cards[1].rules == ('Flying & <stuff>', 'When ~ enters, dräw a card.')
+        assert cards[1].subtypes == ('Pirate',)
+
+
+def test_to_core_round_trip():
+    card = dataclasses.replace(
+            make_card('Hybrid Golem'),
+            legendary=True,
+            types=('Artifact', 'Creature'),
+            classes=('Knight',),
+            cost=Cost.from_str('{2}{W/U}{2/B}{R/P}{C}{X}'),
+            image_url='https://example.com/golem.png',
+    )
+    engine = sa.create_engine('sqlite://')
+    models.Base.metadata.create_all(engine)
+    bulkload.load_cards(engine, [card])
+    with Session(engine) as session:
+        [stored] = repository.CardRepository(session, as_core=True).get_many([1])
+    assert stored == card
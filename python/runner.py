@@ -0,0 +1,284 @@
+"""Export many sets to Cockatrice in one run.
+
+Network I/O (Sheets and Drive) for every set runs on a thread pool. As each
+set's rows arrive they are handed to a process pool, which parses them and
+serializes the XML, so one slow set doesn't hold up the others.
+
+When merging, each worker writes its set's serialized cards to a part file,
+and the parent streams the parts into the merged database one card at a
+time, so no process holds more than one set's cards.
+
+A summary of where the time went is printed at the end; pass --trace to also
+get a Chrome trace. Parsing and serializing happen in worker processes, so
+they show up only as the wait_for_builds span.
+
+Usage:
+    python runner.py --date 2024-06-01                   # every set, one file each
+    python runner.py --date 2024-06-01 TOKS LEY          # some sets
+    python runner.py --date 2024-06-01 --merged all.xml  # one merged database
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import contextlib
+import dataclasses
+import itertools
+import multiprocessing
+import os
+import pickle
+import tempfile
+from typing import Iterable, Iterator
+
+import cockatrice
+import google_session
+import pipeline
+import ratelimit
+import registry
+import sheetcache
+import tracing
+from manifest import ManifestDiff
+
+
+@dataclasses.dataclass
+class SetResult:
+    code: str
+    card_count: int
+    diff: ManifestDiff | None = None  # Changes written, when exporting per set
+
+
+def part_path(parts_directory: str, spec: registry.SetSpec) -> str:
+    return os.path.join(parts_directory, f"{spec.code}.part")
+
+
+def write_part(path: str, cards: Iterable[bytes]) -> None:
+    """Write serialized <card> elements to a part file, one record each."""
+    with open(path, "wb") as file:
+        for card in cards:
+            pickle.dump(card, file)
+
+
+def read_part(path: str) -> Iterator[bytes]:
+    """The serialized <card> elements of a part file, one at a time."""
+    with open(path, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def build_set(
+        spec: registry.SetSpec,
+        rows_by_tab: dict[str, list[list[str]]],
+        renders: dict[str, str],
+        date_string: str,
+        part_path: str | None,
+        directory: str,
+) -> SetResult:
+    """Parse a set's rows and serialize its cards. Runs in a worker process.
+
+    When merging, part_path is given and the serialized cards are written
+    there for the parent to copy into the merged database; otherwise the set
+    is exported to its own file.
+    """
+    cards = pipeline.parse_rows(rows_by_tab, spec.code)
+    if part_path is not None:
+        write_part(
+                part_path,
+                (
+                    cockatrice.serialize_card_element(element)
+                    for element in cockatrice.card_xml_elements(cards, renders)
+                ),
+        )
+        return SetResult(code=spec.code, card_count=len(cards))
+    diff = cockatrice.export_cockatrice_xml(
+            cards=cards,
+            renders=renders,
+            set_filename=spec.filename,
+            set_code=spec.code,
+            set_long_name=spec.long_name,
+            date_string=date_string,
+            directory=directory,
+    )
+    return SetResult(code=spec.code, card_count=len(cards), diff=diff)
+
+
+def build_sets(
+        specs: list[registry.SetSpec],
+        date_string: str,
+        parts_directory: str | None,
+        directory: str,
+        cache: sheetcache.SheetCache | None,
+        fetch_workers: int | None,
+        process_workers: int | None,
+) -> list[SetResult]:
+    """Fetch every set on threads and build each one in a worker process.
+
+    When parts_directory is given, each set's cards go to a part file there,
+    see part_path; otherwise each set is exported to its own file in
+    directory.
+    """
+    session = google_session.default_session()
+    with (
+            concurrent.futures.ThreadPoolExecutor(max_workers=max(1, fetch_workers or len(specs))) as threads,
+            # Not fork: workers start while fetch threads may hold locks
+            # (tracing, ratelimit, stdio), and a forked child would inherit
+            # them held.
+            concurrent.futures.ProcessPoolExecutor(
+                    max_workers=process_workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+            ) as processes,
+    ):
+        fetches = {
+                threads.submit(
+                    pipeline.fetch_rows,
+                    spreadsheet_id=spec.sheet_id,
+                    tabs=spec.tabs,
+                    renders_folder_id=spec.renders_id,
+                    cache=cache,
+                    session=session,
+                ): spec
+                for spec in specs
+        }
+        builds: dict[str, concurrent.futures.Future] = {}
+        for future in concurrent.futures.as_completed(fetches):
+            spec = fetches[future]
+            rows_by_tab, renders = future.result()
+            builds[spec.code] = processes.submit(
+                    build_set,
+                    spec,
+                    rows_by_tab,
+                    renders,
+                    date_string,
+                    part_path(parts_directory, spec) if parts_directory is not None else None,
+                    directory,
+            )
+        with tracing.span("wait_for_builds"):
+            return [builds[spec.code].result() for spec in specs]
+
+
+def run(
+        specs: Iterable[registry.SetSpec],
+        date_string: str,
+        merged_path: str | None = None,
+        directory: str = cockatrice.CUSTOMSETS_DIRECTORY,
+        cache: sheetcache.SheetCache | None = None,
+        fetch_workers: int | None = None,
+        process_workers: int | None = None,
+) -> list[SetResult]:
+    """Export sets concurrently.
+
+    Args:
+        specs: Sets to export.
+        date_string: Release date given to every set.
+        merged_path: If given, write all sets into this one database file
+            instead of one file per set in directory.
+        directory: Where per-set files are written.
+        cache: See gsheets_new.get_gsheet_rows.
+        fetch_workers: Number of sets fetched at once. Defaults to all of them.
+        process_workers: Process pool size. Defaults to the number of CPUs.
+
+    Returns one SetResult per set, in the order given.
+    """
+    specs = list(specs)
+    merged = merged_path is not None
+    with (
+            tracing.span("run", sets=len(specs), merged=merged),
+            tempfile.TemporaryDirectory(dir=os.path.dirname(merged_path) or ".") if merged
+            else contextlib.nullcontext() as parts_directory,
+    ):
+        results = build_sets(
+                specs, date_string, parts_directory, directory, cache, fetch_workers, process_workers)
+        for result in results:
+            tracing.count("cards", result.card_count)
+
+        if merged:
+            with tracing.span("cockatrice.write_merged"), open(merged_path, mode="wb") as file:
+                cockatrice.write_cockatrice_xml(
+                        file,
+                        sets=[
+                            cockatrice.set_to_xml_element(spec.code, spec.long_name, date_string)
+                            for spec in specs
+                        ],
+                        cards=itertools.chain.from_iterable(
+                            read_part(part_path(parts_directory, spec)) for spec in specs),
+                )
+    return results
+
+
+def export_set(
+        spec: registry.SetSpec,
+        date_string: str,
+        cache: sheetcache.SheetCache | None = None,
+        parallel_tabs: bool = False,
+        trace_path: str | None = None,
+        directory: str = cockatrice.CUSTOMSETS_DIRECTORY,
+) -> None:
+    """Export one set in this process, then print where the time went.
+
+    Args:
+        spec: The set to export.
+        date_string: Release date given to the set.
+        cache: See gsheets_new.get_gsheet_rows.
+        parallel_tabs: See pipeline.fetch_set.
+        trace_path: If given, also write a Chrome trace of the run here.
+        directory: Where the set's file is written.
+    """
+    tracing.reset(keep_spans=trace_path is not None)
+    with tracing.span("export", set=spec.code):
+        cards, renders = pipeline.fetch_set(
+                spreadsheet_id=spec.sheet_id,
+                tabs=spec.tabs,
+                setcode=spec.code,
+                renders_folder_id=spec.renders_id,
+                cache=cache,
+                parallel_tabs=parallel_tabs,
+        )
+        cockatrice.export_cockatrice_xml(
+                cards=cards,
+                renders=renders,
+                set_filename=spec.filename,
+                set_code=spec.code,
+                set_long_name=spec.long_name,
+                date_string=date_string,
+                directory=directory,
+        )
+    print(tracing.tracer().summary())
+    if trace_path is not None:
+        tracing.tracer().write_chrome_trace(trace_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sets", nargs="*", help="Set codes to export. Defaults to all sets.")
+    parser.add_argument("--date", required=True, help="Release date string for the sets.")
+    parser.add_argument("--merged", metavar="FILE", help="Write one merged database to FILE.")
+    parser.add_argument("--directory", default=cockatrice.CUSTOMSETS_DIRECTORY, help="Where per-set files go.")
+    parser.add_argument("--offline", action="store_true", help="Only use cached sheet rows.")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch sheet rows.")
+    parser.add_argument("--processes", type=int, default=None, help="Process pool size.")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace of the run to FILE.")
+    args = parser.parse_args(argv)
+
+    specs = [registry.get(code) for code in args.sets] or list(registry.SETS.values())
+    cache = None if args.no_cache else sheetcache.SheetCache(offline=args.offline)
+    tracing.reset(keep_spans=args.trace is not None)
+    results = run(
+            specs,
+            date_string=args.date,
+            merged_path=args.merged,
+            directory=args.directory,
+            cache=cache,
+            process_workers=args.processes,
+    )
+    for result in results:
+        print(f"{result.code}: {result.card_count} cards.")
+    print(tracing.tracer().summary())
+    print(ratelimit.report())
+    if args.trace:
+        tracing.tracer().write_chrome_trace(args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import pipeline
+import registry
+import runner
+
+
+HEADER = ["Name", "Cost", "Rarity", "Legendary", "Type", "Subtypes", "Classes", "P", "T", "Rules", "Flavor", "Image"]
+
+
+def spec(code):
+    return registry.SetSpec(
+            code=code,
+            long_name=f"Set {code}",
+            sheet_id=f"sheet-{code}",
+            renders_id=f"renders-{code}",
+            tabs=("White", "Blue"),
+            filename=f"{code.lower()}.xml",
+    )
+
+
+def fake_fetch_rows(spreadsheet_id, tabs, renders_folder_id, cache=None, session=None):
+    code = spreadsheet_id.split("-")[1]
+    rows_by_tab = {
+            tab: [HEADER, [f"{code} {tab}", "1W", "C", "FALSE", "Creature", "Pirate", "", "1", "1", "", "", ""]]
+            for tab in tabs
+    }
+    renders = {f"{code} {tab}.png": f"url-{code}-{tab}" for tab in tabs}
+    return rows_by_tab, renders
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    monkeypatch.setattr(pipeline, "fetch_rows", fake_fetch_rows)
+
+
+def test_run_per_set(fake_fetch, tmp_path):
+    results = runner.run(
+            [spec("AAA"), spec("BBB")], "2024-01-01", directory=str(tmp_path), process_workers=1)
+    assert [(r.code, r.card_count) for r in results] == [("AAA", 2), ("BBB", 2)]
+    assert results[0].diff.added == ["AAA Blue", "AAA White"]
+    assert sorted(os.listdir(tmp_path)) == [
+            "01.aaa.xml", "01.aaa.xml.manifest.json", "01.bbb.xml", "01.bbb.xml.manifest.json"]
+
+
+def test_run_merged(fake_fetch, tmp_path):
+    path = tmp_path / "all.xml"
+    results = runner.run(
+            [spec("AAA"), spec("BBB")], "2024-01-01", merged_path=str(path), process_workers=1)
+    assert [r.card_count for r in results] == [2, 2]
+    assert sorted(os.listdir(tmp_path)) == ["all.xml"]
+    xml = path.read_text(encoding="utf-8")
+    assert xml.count("<card>") == 4
+    assert xml.index("AAA White") < xml.index("BBB White")
+    assert "<longname>Set BBB</longname>" in xml
+
+
+def test_run_no_sets(fake_fetch, tmp_path):
+    assert runner.run([], "2024-01-01", directory=str(tmp_path), process_workers=1) == []
+    path = tmp_path / "all.xml"
+    assert runner.run([], "2024-01-01", merged_path=str(path), process_workers=1) == []
+    assert "<cards />" in path.read_text(encoding="utf-8")
+
+
+def test_export_set(fake_fetch, tmp_path):
+    trace = tmp_path / "trace.json"
+    runner.export_set(spec("AAA"), "2024-01-01", trace_path=str(trace), directory=str(tmp_path))
+    assert "AAA White" in (tmp_path / "01.aaa.xml").read_text(encoding="utf-8")
+    assert "export" in trace.read_text(encoding="utf-8")
@@ -0,0 +1,122 @@
+"""On-disk cache of Google Sheets values.
+
+Entries are keyed by (spreadsheet_id, range) and tagged with the Drive
+version of the spreadsheet they were read from. A cached entry is only
+served if the spreadsheet's current version matches, so an unchanged
+spreadsheet costs one small metadata request instead of a full values fetch.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+
+import cachefiles
+
+
+DEFAULT_DIRECTORY = os.path.join(
+        os.path.expanduser("~"),
+        ".cache",
+        "magichack",
+        "sheets",
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class Entry:
+    spreadsheet_id: str
+    range_name: str
+    version: str
+    values: list[list[str]]
+
+
+class SheetCache:
+    """Size-bounded, least-recently-used cache of sheet rows.
+
+    Args:
+        directory: Where cache entries are stored, one JSON file per entry.
+        max_bytes: Total size of the cache directory. The least recently used
+            entries are evicted when a write pushes the cache over this size.
+        offline: If True, callers should serve whatever is cached without
+            checking the spreadsheet version.
+    """
+
+    def __init__(
+            self,
+            directory: str = DEFAULT_DIRECTORY,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+            offline: bool = False,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+
+    def _path(self, spreadsheet_id: str, range_name: str) -> str:
+        key = f"{spreadsheet_id}\0{range_name}".encode("utf-8")
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + ".json")
+
+    def load(self, spreadsheet_id: str, range_name: str) -> Entry | None:
+        """Get the cached entry regardless of its version."""
+        path = self._path(spreadsheet_id, range_name)
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        cachefiles.touch(path)
+        return Entry(
+                spreadsheet_id=data["spreadsheet_id"],
+                range_name=data["range_name"],
+                version=data["version"],
+                values=data["values"],
+        )
+
+    def get(
+            self,
+            spreadsheet_id: str,
+            range_name: str,
+            version: str,
+    ) -> list[list[str]] | None:
+        """Get cached rows if they were read at the given version."""
+        entry = self.load(spreadsheet_id, range_name)
+        if entry is None or entry.version != version:
+            return None
+        return entry.values
+
+    def put(
+            self,
+            spreadsheet_id: str,
+            range_name: str,
+            version: str,
+            values: list[list[str]],
+    ) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(spreadsheet_id, range_name)
+        data = {
+                "spreadsheet_id": spreadsheet_id,
+                "range_name": range_name,
+                "version": version,
+                "values": values,
+        }
+        with cachefiles.atomic_write(path) as file:
+            json.dump(data, file)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            cachefiles.evict_lru(self.directory, self.max_bytes, ".json")
+
+    def clear(self) -> None:
+        with self._lock:
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
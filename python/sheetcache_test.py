@@ -0,0 +1,57 @@
+import os
+
+from sheetcache import SheetCache
+
+
+ROWS = [["Name", "Cost"], ["Foo", "1W"]]
+
+
+def test_get_matches_version(tmp_path):
+    cache = SheetCache(directory=str(tmp_path))
+    assert cache.get("sheet", "White!A1:M", "1") is None
+
+    cache.put("sheet", "White!A1:M", "1", ROWS)
+    assert cache.get("sheet", "White!A1:M", "1") == ROWS
+    assert cache.get("sheet", "White!A1:M", "2") is None
+    assert cache.get("sheet", "Blue!A1:M", "1") is None
+    assert cache.get("other", "White!A1:M", "1") is None
+
+    cache.put("sheet", "White!A1:M", "2", ROWS[:1])
+    assert cache.get("sheet", "White!A1:M", "1") is None
+    assert cache.get("sheet", "White!A1:M", "2") == ROWS[:1]
+
+
+def test_load_ignores_version(tmp_path):
+    cache = SheetCache(directory=str(tmp_path), offline=True)
+    assert cache.load("sheet", "White!A1:M") is None
+
+    cache.put("sheet", "White!A1:M", "7", ROWS)
+    entry = cache.load("sheet", "White!A1:M")
+    assert (entry.spreadsheet_id, entry.range_name, entry.version, entry.values) == (
+            "sheet", "White!A1:M", "7", ROWS)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SheetCache(directory=str(tmp_path))
+    cache.put("sheet", "A", "1", ROWS)
+    size = os.path.getsize(cache._path("sheet", "A"))
+    cache.max_bytes = 2 * size
+    cache.put("sheet", "B", "1", ROWS)
+
+    # Make A older than B, then read it so that B becomes the least recently used.
+    os.utime(cache._path("sheet", "A"), (1, 1))
+    os.utime(cache._path("sheet", "B"), (2, 2))
+    assert cache.get("sheet", "A", "1") == ROWS
+
+    cache.put("sheet", "C", "1", ROWS)
+    assert cache.get("sheet", "A", "1") == ROWS
+    assert cache.get("sheet", "B", "1") is None
+    assert cache.get("sheet", "C", "1") == ROWS
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= cache.max_bytes
+
+
+def test_clear(tmp_path):
+    cache = SheetCache(directory=str(tmp_path))
+    cache.put("sheet", "A", "1", ROWS)
+    cache.clear()
+    assert cache.load("sheet", "A") is None
@@ -0,0 +1,151 @@
+"""Column-wise parsing of card sheets, and inserting the result.
+
+Used by upload.load_cards_from_sheet. Kept apart from upload so that it
+can be imported and tested without a Google Sheets client.
+"""
+from __future__ import absolute_import
+
+import collections
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+import bulkload
+import core
+import sqlalchemy_models as models
+
+
+PT_RE = r'^\s*(?P<power>-?\d+)\s*/\s*(?P<toughness>-?\d+)\s*$'
+
+COST_COLUMNS = list(bulkload.cost_columns(core.Cost.from_str('')))
+
+SheetColumns = collections.namedtuple(
+        'SheetColumns', ['cards', 'rules', 'secondary_types'])
+
+
+def _none_for_missing(frame):
+    """Object columns with None for missing values, as the database expects."""
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def _per_distinct(series, parse):
+    """Apply a column-wise parse to the distinct values of series only.
+
+    Sheets repeat the same types, costs and P/T over and over, so parsing
+    each distinct value once and broadcasting the result back is much
+    cheaper than parsing every row.
+    """
+    codes, uniques = pd.factorize(series.fillna(''))
+    parsed = parse(pd.Series(uniques, dtype=object))
+    return parsed.iloc[codes].set_axis(series.index)
+
+
+def _parse_costs(costs):
+    """Card columns for each cost, as bulkload stores them."""
+    columns = pd.DataFrame(
+            [bulkload.cost_columns(cost) for cost in core.Cost.parse_many(costs)],
+            index=costs.index,
+            columns=COST_COLUMNS)
+    for column in [*bulkload.MANA_COLUMNS.values(), 'mana__']:
+        columns[column] = columns[column].astype('Int64')
+    return columns
+
+
+def parse_sheet_columns(data):
+    """Parse a whole sheet DataFrame at once, column by column.
+
+    This does what get_cards_from_sheet does per row, with pandas string
+    methods over entire columns instead of Python code per card.
+
+    Args:
+        data (pandas.DataFrame): Sheet with NAME, TYPE, RULES, PT and COST
+            columns, e.g. from SingleSheet.read_range_as_DataFrame.
+
+    Raises ValueError for unknown card types and malformed costs.
+
+    Returns (SheetColumns): DataFrames indexed by the card's row in data:
+        cards: name, primary_type, power, toughness and the cost columns
+            from bulkload.cost_columns: mana_w .. mana__, mana_cost, cmc and
+            color_mask.
+        rules: text, one row per rule.
+        secondary_types: name, one row per secondary type.
+    """
+    data = data.reset_index(drop=True)
+    cards = pd.DataFrame({'name': data['NAME']}, index=data.index)
+
+    types = _per_distinct(
+            data['TYPE'],
+            lambda t: t.str.lower().str.split(' - ', n=1, expand=True))
+    cards['primary_type'] = types[0].str.strip()
+    unknown = ~cards['primary_type'].isin(list(models.card_factories))
+    if unknown.any():
+        raise ValueError('Unknown card types: {}'.format(
+                sorted(set(cards['primary_type'][unknown]))))
+
+    if types.shape[1] > 1:
+        minors = types[1].str.split(' ').explode()
+    else:
+        minors = pd.Series([], dtype=object)
+    minors = minors[minors.notna() & (minors != '')]
+    secondary_types = pd.DataFrame({'name': minors})
+
+    rules = data['RULES'].str.split(';').explode().str.strip()
+    rules = pd.DataFrame({'text': rules[rules.notna() & (rules != '')]})
+
+    pt = _per_distinct(data['PT'], lambda pt: pt.str.extract(PT_RE))
+    cards['power'] = pd.to_numeric(pt['power']).astype('Int64')
+    cards['toughness'] = pd.to_numeric(pt['toughness']).astype('Int64')
+
+    # Costs are parsed the same way as everywhere else, and a cost that
+    # core.Cost can't parse fails the whole sheet.
+    cards = cards.join(_per_distinct(data['COST'], _parse_costs))
+    return SheetColumns(cards=cards, rules=rules, secondary_types=secondary_types)
+
+
+def _resolve_secondary_type_ids(connection, names):
+    table = models.SecondaryType.__table__
+    names = sorted(set(names))
+    if not names:
+        return {}
+    select = sa.select(table.c.name, table.c.id).where(table.c.name.in_(names))
+    ids = dict(connection.execute(select).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        connection.execute(table.insert(), [{'name': name} for name in missing])
+        ids.update(connection.execute(select).all())
+    return ids
+
+
+def insert_sheet_columns(connection, columns):
+    """Insert parsed sheet columns with one executemany per table.
+
+    Args:
+        connection: SQLAlchemy Connection in a transaction.
+        columns (SheetColumns): From parse_sheet_columns.
+
+    Returns (numpy.ndarray): The new card ids, in sheet row order.
+    """
+    cards_table = models.Card.__table__
+    next_id = connection.execute(
+            sa.select(sa.func.coalesce(sa.func.max(cards_table.c.id), 0) + 1)
+    ).scalar_one()
+    card_ids = pd.Series(
+            np.arange(next_id, next_id + len(columns.cards)),
+            index=columns.cards.index)
+
+    cards = columns.cards.assign(id=card_ids)
+    rules = columns.rules.assign(card_id=card_ids[columns.rules.index].to_numpy())
+    type_ids = _resolve_secondary_type_ids(connection, columns.secondary_types['name'])
+    links = pd.DataFrame({
+            'card_id': card_ids[columns.secondary_types.index].to_numpy(),
+            'secondary_type_id': columns.secondary_types['name'].map(type_ids).to_numpy(),
+    }).drop_duplicates()
+
+    for table, frame in (
+            (cards_table, cards),
+            (models.Rule.__table__, rules),
+            (models.cards_and_secondary_types, links)):
+        if len(frame):
+            connection.execute(table.insert(), _none_for_missing(frame).to_dict('records'))
+    return card_ids.to_numpy()
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+import sheetcolumns
+import sqlalchemy_models as models
+
+
+def make_sheet(costs):
+    return pd.DataFrame({
+            'NAME': ['Card {}'.format(i) for i in range(len(costs))],
+            'TYPE': ['Creature - Human Pirate', 'Instant', 'Creature - Pirate', 'Land'][:len(costs)],
+            'RULES': ['Flying; Haste', 'Draw a card.', '', ''][:len(costs)],
+            'PT': ['2/3', '', '1 / 1', ''][:len(costs)],
+            'COST': costs,
+    })
+
+
+def test_parse_sheet_columns():
+    columns = sheetcolumns.parse_sheet_columns(make_sheet(['3UB', 'UW', '{1}{W/U}', '']))
+    cards = columns.cards
+    assert list(cards['primary_type']) == ['creature', 'instant', 'creature', 'land']
+    assert list(cards['mana_cost']) == ['3UB', 'WU', '{1}{W/U}', '']
+    assert list(cards['cmc']) == [5, 2, 2, 0]
+    assert list(cards['color_mask']) == [6, 3, 3, 0]
+    assert cards['mana__'].tolist() == [3, pd.NA, 1, pd.NA]
+    assert cards['mana_u'].tolist() == [1, 1, pd.NA, pd.NA]
+    assert cards['power'].tolist() == [2, pd.NA, 1, pd.NA]
+    assert list(columns.rules['text']) == ['Flying', 'Haste', 'Draw a card.']
+    assert list(columns.rules.index) == [0, 0, 1]
+    assert list(columns.secondary_types['name']) == ['human', 'pirate', 'pirate']
+    assert list(columns.secondary_types.index) == [0, 0, 2]
+
+
+def test_parse_sheet_columns_rejects_bad_rows():
+    with pytest.raises(ValueError, match='Malformed mana cost'):
+        sheetcolumns.parse_sheet_columns(make_sheet(['3UB', '3Q']))
+    sheet = make_sheet(['3UB'])
+    sheet['TYPE'] = ['Planeswalker']
+    with pytest.raises(ValueError, match='Unknown card types'):
+        sheetcolumns.parse_sheet_columns(sheet)
+
+
+def test_insert_sheet_columns():
+    engine = sa.create_engine('sqlite://')
+    models.Base.metadata.create_all(engine)
+    columns = sheetcolumns.parse_sheet_columns(make_sheet(['3UB', 'UW', '{1}{W/U}']))
+    with engine.begin() as connection:
+        assert list(sheetcolumns.insert_sheet_columns(connection, columns)) == [1, 2, 3]
+        assert list(sheetcolumns.insert_sheet_columns(connection, columns)) == [4, 5, 6]
+        cards = models.Card.__table__
+        assert connection.execute(
+                sa.select(cards.c.mana_cost, cards.c.cmc).where(cards.c.id == 3)).one() == ('{1}{W/U}', 2)
+        assert connection.execute(
+                sa.select(sa.func.count()).select_from(models.SecondaryType.__table__)).scalar_one() == 2
+        assert connection.execute(
+                sa.select(sa.func.count()).select_from(models.cards_and_secondary_types)).scalar_one() == 6
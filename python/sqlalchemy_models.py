@@ -1,32 +1,44 @@
 from __future__ import print_function, absolute_import
 
-from sqlalchemy import Table, Column, ForeignKey, Integer, String, Text
+from sqlalchemy import Table, Column, Boolean, ForeignKey, Index, Integer, String, Text
 from sqlalchemy import UnicodeText, Enum
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+import core
+
 Base = declarative_base()
 
 CARD_NAME_LEN = 64
 CARD_PRIMARY_TYPE_LEN = 32
 SECONDARY_TYPE_NAME_LEN = 32
 SET_NAME_LEN = 32
+MANA_COST_LEN = 64
 
 COLORS = ['_', 'W', 'U', 'B', 'R', 'G']
 TYPES = ['enchantment', 'creature', 'sorcery', 'instant', 'artifact', 'land']
 
+# Bits of Card.color_mask, one per color of mana in the cost.
+COLOR_BITS = {color: 1 << i for i, color in enumerate(COLORS[1:])}
+
 cards_and_secondary_types = Table(
         'cards_and_secondary_types',
         Base.metadata,
-        Column('card_id', Integer, ForeignKey('cards.id')),
-        Column('secondary_type_id', Integer, ForeignKey('secondary_types.id')))
+        Column('card_id', Integer, ForeignKey('cards.id'), primary_key=True),
+        Column('secondary_type_id', Integer, ForeignKey('secondary_types.id'),
+               primary_key=True),
+        # The primary key covers lookups by card_id.
+        Index('ix_cards_and_secondary_types_secondary_type_id',
+              'secondary_type_id'))
 
 
 cards_and_sets = Table(
         'cards_and_sets',
         Base.metadata,
-        Column('card_id', Integer, ForeignKey('cards.id')),
-        Column('set_id', Integer, ForeignKey('sets.id')))
+        Column('card_id', Integer, ForeignKey('cards.id'), primary_key=True),
+        Column('set_id', Integer, ForeignKey('sets.id'), primary_key=True),
+        Index('ix_cards_and_sets_set_id', 'set_id'))
 
 
 class Card(Base):
@@ -34,10 +46,18 @@ class Card(Base):
     __tablename__ = 'cards'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(CARD_NAME_LEN), nullable=False)
-    primary_type = Column(String(CARD_PRIMARY_TYPE_LEN), nullable=False)
+    name = Column(String(CARD_NAME_LEN), nullable=False, index=True)
+    primary_type = Column(String(CARD_PRIMARY_TYPE_LEN), nullable=False,
+                          index=True)
     flavor = Column(UnicodeText, nullable=True)
-    rarity = Column(Enum('common', 'uncommon', 'rare'), nullable=True)
+    rarity = Column(Enum('common', 'uncommon', 'rare', 'mythic'), nullable=True)
+    # The rest of a core.Card, so that it can be read back as it was
+    # stored. Types and classes are newline-separated, e.g. 'Artifact\nCreature'
+    # for an artifact creature, whose primary_type is 'creature'.
+    types = Column(UnicodeText, nullable=True)
+    classes = Column(UnicodeText, nullable=True)
+    legendary = Column(Boolean, nullable=True)
+    image_url = Column(UnicodeText, nullable=True)
 
     mana__ = Column(Integer, nullable=True)  # colorless
     mana_w = Column(Integer, nullable=True)
@@ -45,6 +65,14 @@ class Card(Base):
     mana_b = Column(Integer, nullable=True)
     mana_r = Column(Integer, nullable=True)
     mana_g = Column(Integer, nullable=True)
+    # The whole cost as core.Cost.as_str() writes it, including the hybrid,
+    # phyrexian, X and D symbols that the mana columns can't hold. NULL for
+    # cards stored before it existed, whose cost is just the mana columns.
+    mana_cost = Column(String(MANA_COST_LEN), nullable=True)
+
+    # Derived from the cost on every write; see cost_summary.
+    cmc = Column(Integer, nullable=True, index=True)
+    color_mask = Column(Integer, nullable=True, index=True)
 
     @property
     def cost(self):
@@ -54,7 +82,7 @@ class Card(Base):
         return d
 
     # one -> many
-    rules = relationship('Rule', back_populates='card')
+    rules = relationship('Rule', back_populates='card', order_by='Rule.id')
 
     # many <-> many
     secondary_types = relationship(
@@ -81,13 +109,59 @@ class Card(Base):
     }
 
 
+def cost_summary(cost):
+    """(cmc, color_mask) of a cost dict like Card.cost."""
+    cmc = sum(value or 0 for value in cost.values())
+    color_mask = 0
+    for color, bit in COLOR_BITS.items():
+        if cost.get(color):
+            color_mask |= bit
+    return cmc, color_mask
+
+
+def core_cost_summary(cost):
+    """(cmc, color_mask) of a core.Cost.
+
+    Hybrid and phyrexian symbols count toward their colors, as in
+    core.Cost.colors().
+    """
+    colors = cost.colors()
+    color_mask = 0
+    for color, bit in COLOR_BITS.items():
+        if color in colors:
+            color_mask |= bit
+    return cost.cmc(), color_mask
+
+
+def masks_with_color(color):
+    """All color_mask values that include color.
+
+    Filtering with color_mask.in_(masks_with_color('U')) can use the
+    color_mask index, unlike a bitwise test.
+    """
+    bit = COLOR_BITS[color]
+    return [mask for mask in range(1 << len(COLOR_BITS)) if mask & bit]
+
+
+@event.listens_for(Card, 'before_insert', propagate=True)
+@event.listens_for(Card, 'before_update', propagate=True)
+def _update_cost_summary(mapper, connection, target):
+    if target.mana_cost is not None:
+        summary = core_cost_summary(core.Cost.from_str(target.mana_cost))
+    else:
+        summary = cost_summary(target.cost)
+    target.cmc, target.color_mask = summary
+
+
 class Enchantment(Card):
     __mapper_args__ = {'polymorphic_identity': 'enchantment'}
 
 
 class Creature(Card):
-    power = Column(Integer, nullable=False)
-    toughness = Column(Integer, nullable=False)
+    # All card types share the cards table, so these have to be nullable for
+    # the other types to be stored at all.
+    power = Column(Integer, nullable=True)
+    toughness = Column(Integer, nullable=True)
 
     __mapper_args__ = {'polymorphic_identity': 'creature'}
 
@@ -126,7 +200,8 @@ class Rule(Base):
     text = Column(UnicodeText, nullable=False)
 
     # many -> one
-    card_id = Column(Integer, ForeignKey('cards.id'), nullable=False)
+    card_id = Column(Integer, ForeignKey('cards.id'), nullable=False,
+                     index=True)
     card = relationship('Card', back_populates='rules')
 
 
@@ -0,0 +1,22 @@
+"""Cards for the tests to share."""
+import core
+from core import Cost, Rarity
+
+
+def make_card(name, types=("Creature",), power=2, toughness=2):
+    """A rare 2UR pirate with two rules, one naming itself."""
+    return core.Card(
+            sset="TST",
+            rarity=Rarity.RARE,
+            legendary=False,
+            types=types,
+            subtypes=("Pirate",),
+            classes=("",),
+            power=power,
+            toughness=toughness,
+            cost=Cost.from_str("2UR"),
+            rules=("Flying & <stuff>", "When ~ enters, dräw a card."),
+            name=name,
+            flavor="",
+            image_url=None,
+    )
@@ -0,0 +1,165 @@
+"""Spans and counters for finding where an export run spends its time.
+
+Wrap a stage in `with tracing.span("name", key=value):` to record how long it
+took, and use tracing.count() for totals like requests made or bytes
+received. The span's args dict is yielded so that results known only at the
+end, like a card count, can be added to it.
+
+At the end of a run, print summary() and, to look at the timeline, write
+write_chrome_trace() and open it in chrome://tracing or https://ui.perfetto.dev.
+Call reset() at the start of a run so that earlier runs in the same process
+don't end up in its summary.
+
+By default only per-name totals are kept, so a long run's memory doesn't grow
+with its span count. Individual spans, which the Chrome trace needs, are
+only kept after reset(keep_spans=True).
+
+Spans and counters are recorded in the process that runs them, so work done
+in worker processes (see runner.py) only shows up as the parent's span around
+it.
+"""
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+from typing import Any, Iterator
+
+
+@dataclasses.dataclass
+class SpanTotals:
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    start: float  # Seconds, from time.perf_counter
+    duration: float  # Seconds
+    thread_id: int
+    args: dict[str, Any]
+
+
+class Tracer:
+    """Collects span totals and counters. Safe to use from several threads.
+
+    Args:
+        keep_spans: Also keep every span, e.g. for chrome_trace().
+    """
+
+    def __init__(self, keep_spans: bool = False):
+        self._lock = threading.Lock()
+        self.reset(keep_spans)
+
+    def reset(self, keep_spans: bool = False) -> None:
+        with self._lock:
+            self.keep_spans = keep_spans
+            self._origin = time.perf_counter()
+            self.spans: list[Span] = []
+            self.totals: dict[str, SpanTotals] = {}
+            self.counters: collections.Counter[str] = collections.Counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                totals = self.totals.setdefault(name, SpanTotals())
+                totals.count += 1
+                totals.seconds += duration
+                totals.max_seconds = max(totals.max_seconds, duration)
+                if self.keep_spans:
+                    self.spans.append(Span(
+                            name=name,
+                            start=start,
+                            duration=duration,
+                            thread_id=threading.get_ident(),
+                            args=args,
+                    ))
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def chrome_trace(self) -> dict:
+        """The kept spans as Chrome trace events, with the counters as metadata."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+            origin = self._origin
+        events = [
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": (span.start - origin) * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": {key: _jsonable(value) for key, value in span.args.items()},
+                }
+                for span in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": counters}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
+    def summary(self) -> str:
+        """A table of time per span name, then the counters."""
+        with self._lock:
+            totals = {name: dataclasses.replace(t) for name, t in self.totals.items()}
+            counters = dict(self.counters)
+
+        lines = [f"{'span':32} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, t in sorted(totals.items(), key=lambda item: -item[1].seconds):
+            lines.append(
+                    f"{name:32} {t.count:>6} {t.seconds * 1000:>10.1f} "
+                    f"{t.seconds / t.count * 1000:>9.1f} {t.max_seconds * 1000:>9.1f}"
+            )
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:32} {value:>6}")
+        return "\n".join(lines)
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+_tracer = Tracer()
+
+
+def tracer() -> Tracer:
+    """The process-wide Tracer used by span() and count()."""
+    return _tracer
+
+
+def reset(keep_spans: bool = False) -> None:
+    """Forget the process-wide Tracer's spans and counters, e.g. before a new run.
+
+    Args:
+        keep_spans: Keep every span of the run, for write_chrome_trace().
+    """
+    _tracer.reset(keep_spans)
+
+
+def span(name: str, **args: Any):
+    """Time a block on the process-wide Tracer. See Tracer.span."""
+    return _tracer.span(name, **args)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add to a counter on the process-wide Tracer."""
+    _tracer.count(name, value)
@@ -0,0 +1,89 @@
+import threading
+
+import bench
+import tracing
+from tracing import Tracer
+
+
+def test_spans_nest():
+    tracer = Tracer(keep_spans=True)
+    with tracer.span("outer", set="TST") as args:
+        with tracer.span("inner"):
+            pass
+        with tracer.span("inner"):
+            pass
+        args["cards"] = 3
+    inner, _, outer = tracer.spans
+    assert [span.name for span in tracer.spans] == ["inner", "inner", "outer"]
+    assert outer.args == {"set": "TST", "cards": 3}
+    assert outer.start <= inner.start
+    assert inner.start + inner.duration <= outer.start + outer.duration
+    assert inner.thread_id == outer.thread_id == threading.get_ident()
+
+    events = tracer.chrome_trace()["traceEvents"]
+    assert [event["name"] for event in events] == ["inner", "inner", "outer"]
+    assert events[2]["ts"] <= events[0]["ts"]
+    assert events[0]["ts"] + events[0]["dur"] <= events[2]["ts"] + events[2]["dur"]
+
+
+def test_span_recorded_on_error():
+    tracer = Tracer(keep_spans=True)
+    try:
+        with tracer.span("failing"):
+            raise ValueError
+    except ValueError:
+        pass
+    assert [span.name for span in tracer.spans] == ["failing"]
+    assert tracer.totals["failing"].count == 1
+
+
+def test_summary():
+    tracer = Tracer()
+    with tracer.span("outer"):
+        with tracer.span("inner"):
+            pass
+        with tracer.span("inner"):
+            pass
+    tracer.count("http.requests")
+    tracer.count("http.requests", 2)
+    lines = tracer.summary().splitlines()
+    assert lines[0].split() == ["span", "count", "total", "ms", "mean", "ms", "max", "ms"]
+    # Sorted by total time, so the outer span comes first.
+    assert [line.split()[:2] for line in lines[1:]] == [["outer", "1"], ["inner", "2"], ["http.requests", "3"]]
+
+
+def test_spans_not_kept_by_default():
+    tracer = Tracer()
+    for _ in range(3):
+        with tracer.span("step"):
+            pass
+    assert tracer.spans == []
+    assert tracer.chrome_trace()["traceEvents"] == []
+    assert tracer.totals["step"].count == 3
+    assert tracer.summary().splitlines()[1].split()[:2] == ["step", "3"]
+
+
+def test_reset():
+    with tracing.span("old run"):
+        tracing.count("cards", 5)
+    tracing.reset(keep_spans=True)
+    with tracing.span("new run"):
+        pass
+    assert [span.name for span in tracing.tracer().spans] == ["new run"]
+    assert tracing.tracer().counters == {}
+    tracing.reset()
+
+
+def test_bench_measure_resets_tracer():
+    with tracing.span("earlier run"):
+        pass
+
+    def traced():
+        with tracing.span("benchmark"):
+            pass
+
+    bench.measure("traced", 1, traced, repeat=3)
+    assert list(tracing.tracer().totals) == ["benchmark"]
+    assert tracing.tracer().totals["benchmark"].count == 1
+    assert tracing.tracer().spans == []
+    tracing.reset()
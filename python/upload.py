@@ -1,13 +1,8 @@
-import re
-
-import sqlalchemy as sa
-import sqlalchemy.orm as orm
-
-import magichack.gsheets as gsheets
-import magichack.models as models
-import magichack.util as util
-
-from magichack.models import COLORS
+import bulkload
+import core
+import gsheets
+import sheetcolumns
+import sqlalchemy_models as models
 
 
 def get_cards_from_sheet(session, sheet_id, tab):
@@ -52,13 +47,9 @@ def get_cards_from_sheet(session, sheet_id, tab):
 
         card = card_factory(**constructor_kwargs)
 
-        cost = util.parse_cost(row['COST'])
-        if cost is not None:
-            for k, v in cost.items():
-                if k == 'colorless':
-                    card.mana_colorless = v
-                else:
-                    setattr(card, 'mana_{}'.format(k.lower()), v)
+        cost = core.Cost.from_str(row['COST'])
+        for column, value in bulkload.cost_columns(cost).items():
+            setattr(card, column, value)
         cards.append(card)
         session.add(card)
     return cards
@@ -72,3 +63,15 @@ def parse_type(t):
         major = t
         minors = []
     return major, minors
+
+
+def load_cards_from_sheet(engine, sheet_id, tab):
+    """Vectorized get_cards_from_sheet: read a tab and insert its cards.
+
+    Returns (numpy.ndarray): The new card ids.
+    """
+    sheet = gsheets.SingleSheet(sheet_id)
+    data = sheet.read_range_as_DataFrame('{}!A1:F'.format(tab))
+    columns = sheetcolumns.parse_sheet_columns(data)
+    with engine.begin() as connection:
+        return sheetcolumns.insert_sheet_columns(connection, columns)